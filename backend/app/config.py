@@ -7,8 +7,9 @@ class Settings(BaseSettings):
     supabase_key: str
     supabase_jwt_secret: str
 
-    # OpenAI
+    # OpenAI (Groq's OpenAI-compatible API)
     openai_api_key: str
+    llm_base_url: str = "https://api.groq.com/openai/v1"
 
     # FCM
     fcm_project_id: str = ""
@@ -19,6 +20,105 @@ class Settings(BaseSettings):
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Comma-separated routers to serve, or "all":
+    # auth, visitors, passes, gate, chat, notifications, households, analytics, exports, admin
+    enabled_routers: str = "all"
+    # Time zone of the community; visitor pass days and hours are local time
+    community_timezone: str = "Asia/Kolkata"
+    # Signed gate passes (QR): base64 32-byte Ed25519 seed; derived from secret_key when empty
+    gate_pass_signing_key: str = ""
+    gate_pass_ttl_hours: int = 24
+    # Delta sync only hands out changes at least this old, so a transaction that commits late
+    # is never behind a device's cursor
+    sync_safety_lag_seconds: float = 5.0
+
+    # Storage ("supabase", or "sqlite" for a gate-local database replicated to Supabase)
+    storage_backend: str = "supabase"
+    sqlite_path: str = "community.db"
+    sqlite_replication_enabled: bool = True
+    sqlite_replication_interval_seconds: float = 2.0
+    sqlite_replication_batch_size: int = 500
+    # Pull visitors changed centrally (residents approving or revoking) this often
+    sqlite_pull_interval_seconds: float = 30.0
+
+    # Caches
+    directory_ttl_seconds: float = 300.0
+    pass_index_ttl_seconds: float = 300.0
+    occupancy_reconcile_seconds: float = 60.0
+    # Cross-worker cache invalidation: "local" (single worker), "redis" or "postgres" with INVALIDATION_URL;
+    # while the bus is down caches are trusted for at most the fallback TTL
+    invalidation_backend: str = "local"
+    invalidation_url: str = ""
+    invalidation_channel: str = "cache_invalidation"
+    invalidation_fallback_ttl_seconds: float = 5.0
+    invalidation_reconnect_seconds: float = 5.0
+    # Identical visitor list / chat context reads reuse a result for this long (0: only share in-flight reads)
+    read_coalesce_window_seconds: float = 0.5
+
+    # Visitor analytics rollup (Supabase storage only)
+    analytics_rollup_enabled: bool = True
+    analytics_rollup_interval_seconds: float = 60.0
+    analytics_rollup_batch_size: int = 1000
+    # Events inserted less than this long ago wait for the next run: events.seq is taken at insert,
+    # so a slow transaction can commit a lower seq after a higher one
+    analytics_rollup_lag_seconds: float = 30.0
+
+    # Audit event archival (python -m app.utils.event_archive archive)
+    event_retention_days: int = 365
+    event_archive_dir: str = "event_archive"
+    event_archive_batch_size: int = 1000
+
+    # Committee CSV/XLSX exports: rows per query, and where background export jobs write (kept for TTL hours)
+    export_page_size: int = 1000
+    export_dir: str = "exports"
+    export_job_ttl_hours: int = 24
+
+    # Visitor retention: move checked-out/denied visitors to visitors_archive (Supabase storage only)
+    visitor_compaction_enabled: bool = True
+    visitor_retention_days: int = 90
+    visitor_compaction_batch_size: int = 500
+    visitor_compaction_interval_seconds: float = 3600.0
+
+    # Live occupancy stream: check for changes this often, close after max seconds (clients reconnect)
+    occupancy_stream_interval_seconds: float = 1.0
+    occupancy_stream_max_seconds: float = 300.0
+
+    # Admission control (per worker): concurrency slots, with some kept for gate check-in/out,
+    # /chat refused once a fraction of the shared slots is busy, and per-user request rates
+    admission_enabled: bool = True
+    admission_max_concurrent: int = 64
+    admission_priority_reserved: int = 8
+    admission_llm_max_concurrent: int = 8
+    admission_llm_shed_at: float = 0.5
+    admission_user_rate: float = 10.0
+    admission_user_burst: float = 30.0
+    admission_llm_user_rate: float = 0.2
+    admission_llm_user_burst: float = 5.0
+    admission_retry_after_seconds: float = 1.0
+
+    # Performance
+    fast_json: bool = False
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1000
+    compression_level: int = 5
+
+    # Health probe
+    health_probe_interval_seconds: float = 10.0
+    health_probe_timeout_seconds: float = 3.0
+    health_llm_probe_interval_seconds: float = 60.0
+    health_db_latency_threshold_ms: float = 500.0
+    health_replication_lag_threshold_seconds: float = 300.0
+    health_failure_threshold: int = 3
+    health_stale_after_seconds: float = 60.0
+
+    # Observability
+    tracing_enabled: bool = True
+    trace_export_path: str = ""
+    profiler_enabled: bool = False
+    profiler_route: str = ""
+    profiler_sample_rate: float = 0.0
+    profiler_max_per_minute: int = 5
+    profiler_interval_ms: int = 5
 
     class Config:
         env_file = ".env"
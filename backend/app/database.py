@@ -1,12 +1,106 @@
-from supabase import create_client, Client
+import time
+from typing import TYPE_CHECKING, Callable, List
 from app.config import get_settings
+from app.storage.sqlite import get_sqlite_client
+from app.utils.metrics import DB_REQUESTS, DB_REQUEST_DURATION, DB_ROWS
+from app.utils.tracing import record_db_call
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 settings = get_settings()
 
-def get_supabase(service: bool = False) -> Client:
+OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+def describe_postgrest_request(request) -> tuple:
+    """Map a PostgREST HTTP request to (table, operation)"""
+    segments = request.url.path.rstrip("/").split("/")
+    if len(segments) >= 2 and segments[-2] == "rpc":
+        return f"rpc:{segments[-1]}", "rpc"
+
+    operation = OPERATIONS.get(request.method, request.method.lower())
+    if operation == "insert" and "merge-duplicates" in request.headers.get("prefer", ""):
+        operation = "upsert"
+    return segments[-1], operation
+
+
+def count_rows(response) -> int:
+    """Row count from PostgREST's Content-Range header ("0-24/*" -> 25)"""
+    content_range = response.headers.get("content-range", "")
+    span = content_range.split("/")[0]
+    if "-" not in span:
+        return 0
+    start, end = span.split("-", 1)
+    try:
+        return int(end) - int(start) + 1
+    except ValueError:
+        return 0
+
+
+def _on_request(request):
+    request.extensions["started_at"] = time.perf_counter()
+
+
+def _on_response(response):
+    started_at = response.request.extensions.get("started_at")
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    table, operation = describe_postgrest_request(response.request)
+
+    rows = count_rows(response)
+
+    DB_REQUESTS.inc(table, operation, str(response.status_code))
+    DB_REQUEST_DURATION.observe(elapsed, table, operation)
+    DB_ROWS.inc(table, operation, amount=rows)
+    record_db_call(table, operation, elapsed, rows, response.status_code)
+
+
+def get_supabase(service: bool = False) -> "Client":
+    """
+    Database client for the configured storage backend
+
+    With STORAGE_BACKEND=sqlite this is the local SQLiteClient, which offers
+    the same query builder API; `service` has no effect there.
+    """
+    if settings.storage_backend == "sqlite":
+        return get_sqlite_client()
+    return get_remote_supabase(service)
+
+
+def get_remote_supabase(service: bool = False) -> "Client":
+    # supabase-py takes ~0.2s to import; gate-local (SQLite) workers may never need it
+    from supabase import create_client
+
     key = (
         settings.supabase_jwt_secret
         if service
         else settings.supabase_key
     )
-    return create_client(settings.supabase_url, key)
\ No newline at end of file
+    client = create_client(settings.supabase_url, key)
+
+    # Time and trace every PostgREST call made through this client
+    hooks = client.postgrest.session.event_hooks
+    hooks["request"].append(_on_request)
+    hooks["response"].append(_on_response)
+    return client
+
+
+def fetch_all(query_factory: Callable, page_size: int = 1000) -> List[dict]:
+    """
+    Read every row of a query in pages (PostgREST caps a response at 1000 rows)
+
+    Args:
+        query_factory: Returns a fresh, ordered query builder for each page
+        page_size: Rows per request
+
+    Returns:
+        All matching rows
+    """
+    rows = []
+    while True:
+        page = query_factory().range(len(rows), len(rows) + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
@@ -1,6 +1,11 @@
-from fastapi import Depends
-from app.auth import get_current_user, has_role
+from typing import Callable, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.auth import get_current_user, has_role, decode_token
 from app.models import UserRole
+from app.utils.versions import make_etag, etag_matches
+
+optional_security = HTTPBearer(auto_error=False)
 
 # Dependency for resident access
 async def get_current_resident(current_user: dict = Depends(has_role([UserRole.RESIDENT, UserRole.ADMIN]))):
@@ -12,4 +17,38 @@ async def get_current_guard(current_user: dict = Depends(has_role([UserRole.GUAR
 
 # Dependency for admin access
 async def get_current_admin(current_user: dict = Depends(has_role([UserRole.ADMIN, UserRole.COMMITTEE]))):
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+def conditional_get(resolve_scope: Callable[[dict, Request], Optional[Tuple[str, str, str]]]):
+    """
+    Dependency factory for ETag / If-None-Match handling on read endpoints
+
+    `resolve_scope(claims, request)` maps the caller's token claims to
+    (version scope, ETag key, Cache-Control value), or None to skip
+    conditional handling. It must not touch the database: when the client's
+    ETag still matches, a 304 is returned before `get_current_user` runs,
+    so list this dependency before any that query the database.
+    """
+    async def checker(
+            request: Request,
+            response: Response,
+            credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+    ):
+        claims = decode_token(credentials.credentials) if credentials else None
+        resolved = resolve_scope(claims or {}, request)
+        if resolved is None:
+            return
+
+        scope, key, cache_control = resolved
+        etag = make_etag(scope, key)
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+
+        # Only trust a match for callers holding a valid token; anything
+        # else falls through to the normal auth error
+        if claims and etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        response.headers.update(headers)
+
+    return checker
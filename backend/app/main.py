@@ -1,47 +1,211 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, APIRouter, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, visitors, chat, notifications
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.config import Settings, get_settings
 from app.database import get_supabase
-
-app = FastAPI(
-    title="Community Management API",
-    description="MyGate-style community management system",
-    version="1.0.0"
+from app.dependencies import conditional_get
+from app.utils.health import monitor as health_monitor
+from app.utils.invalidation import bus as invalidation_bus
+from app.utils.metrics import (
+    HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_IN_FLIGHT, render_metrics
 )
+from app.utils.admission import AdmissionMiddleware
+from app.utils.profiler import ProfilerMiddleware
+from app.utils.serialization import default_response_class
+from app.utils.tracing import start_trace, finish_trace
+from app.utils.versions import EVENTS_SCOPE
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import importlib
+import time
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+# Router modules by name, for ENABLED_ROUTERS. Only enabled ones are imported.
+ROUTERS = {
+    "auth": "app.routers.auth",
+    "visitors": "app.routers.visitors",
+    "passes": "app.routers.passes",
+    "gate": "app.routers.gate",
+    "chat": "app.routers.chat",
+    "notifications": "app.routers.notifications",
+    "households": "app.routers.households",
+    "analytics": "app.routers.analytics",
+    "exports": "app.routers.exports",
+    "admin": "app.routers.admin",
+}
+
+
+def enabled_routers(settings: Settings) -> List[str]:
+    value = settings.enabled_routers.strip()
+    if value in ("", "all", "*"):
+        return list(ROUTERS)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in ROUTERS]
+    if unknown:
+        raise ValueError(f"Unknown router(s) in ENABLED_ROUTERS: {', '.join(unknown)}")
+    return names
+
+
+core = APIRouter()
 
-# Include routers
-app.include_router(auth.router)
-app.include_router(visitors.router)
-app.include_router(chat.router)
-app.include_router(notifications.router)
 
-@app.get("/")
+@core.get("/")
 async def root():
     return {"message": "Community Management API", "status": "running"}
 
-@app.get("/health")
+@core.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@core.get("/health")
 async def health_check():
-    try:
-        supabase = get_supabase()
-        # Try a simple query to check database connection
-        result = supabase.table("users").select("count").execute()
-        return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
+    """Cached dependency status from the background probe (no database call)"""
+    snapshot = health_monitor.snapshot()
+    database = snapshot["checks"]["database"]
+    return {
+        **snapshot,
+        "database": "connected" if database["status"] in ("ok", "degraded") else "disconnected",
+    }
+
+@core.get("/health/live")
+async def liveness_check():
+    """Liveness: the process is serving requests"""
+    return {"status": "alive"}
+
+@core.get("/health/ready")
+async def readiness_check():
+    """Readiness: 503 until the database probe passes, or when it is down or stale"""
+    snapshot = health_monitor.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+def events_scope(claims: dict, request: Request):
+    return EVENTS_SCOPE, "", "private, no-cache"
+
 
 # Events endpoint for audit logs
-@app.get("/events")
-async def get_events():
+@core.get("/events")
+async def get_events(_: None = Depends(conditional_get(events_scope))):
     """Get audit log events"""
     supabase = get_supabase()
     result = supabase.table("events").select("*").order("occurred_at", desc=True).limit(50).execute()
-    return {"events": result.data}
\ No newline at end of file
+    return {"events": result.data}
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the API application
+
+    Args:
+        settings: Settings to build the app with (defaults to get_settings())
+
+    Returns:
+        FastAPI app with the routers listed in ENABLED_ROUTERS
+    """
+    settings = settings or get_settings()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Push local SQLite writes to Supabase in the background
+        replicator = None
+        if settings.storage_backend == "sqlite" and settings.sqlite_replication_enabled:
+            from app.storage.replication import start_replicator
+            replicator = start_replicator()
+        # Gate-local SQLite databases replicate their events to Supabase, where they are rolled up
+        jobs = []
+        if settings.storage_backend != "sqlite" and settings.analytics_rollup_enabled:
+            from app.utils.analytics import rollup
+            jobs.append(rollup)
+        # Compaction deletes visitors; a gate-local database would replicate that
+        if settings.storage_backend != "sqlite" and settings.visitor_compaction_enabled:
+            from app.utils.compaction import compactor
+            jobs.append(compactor)
+        # Apply other workers' cache invalidations (INVALIDATION_BACKEND)
+        invalidation_bus.start()
+        for job in jobs:
+            job.start()
+        health_monitor.start()
+        yield
+        await health_monitor.stop()
+        for job in jobs:
+            await job.stop()
+        invalidation_bus.stop()
+        if replicator is not None:
+            replicator.stop()
+
+    app = FastAPI(
+        title="Community Management API",
+        description="MyGate-style community management system",
+        version="1.0.0",
+        default_response_class=default_response_class(),
+        lifespan=lifespan
+    )
+
+    # Response compression; brotli when brotli-asgi is installed, gzip otherwise
+    if settings.compression_enabled:
+        if BrotliMiddleware is not None:
+            app.add_middleware(
+                BrotliMiddleware,
+                minimum_size=settings.compression_minimum_size,
+                gzip_fallback=True
+            )
+        else:
+            # Level 5 is ~3x cheaper than the default 9 for a ~3% larger payload
+            app.add_middleware(
+                GZipMiddleware,
+                minimum_size=settings.compression_minimum_size,
+                compresslevel=settings.compression_level
+            )
+
+    # Statistical profiler for selected requests (configured via /admin/profiler)
+    app.add_middleware(ProfilerMiddleware)
+
+    # Lanes, concurrency slots and per-user rate limits; inside observe_request so 429s are counted
+    app.add_middleware(AdmissionMiddleware)
+
+    # CORS middleware; outside admission control so 429s carry the CORS headers too
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, specify exact origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.middleware("http")
+    async def observe_request(request: Request, call_next):
+        HTTP_IN_FLIGHT.inc(request.method)
+        trace = start_trace(request.method, request.url.path) if settings.tracing_enabled else None
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            if trace is not None:
+                response.headers["Server-Timing"] = trace.server_timing()
+            return response
+        finally:
+            HTTP_IN_FLIGHT.dec(request.method)
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.inc(request.method, route_path, str(status_code))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, request.method, route_path)
+            if trace is not None:
+                finish_trace(trace, status_code, route_path)
+
+    # Include routers
+    app.include_router(core)
+    for name in enabled_routers(settings):
+        app.include_router(importlib.import_module(ROUTERS[name]).router)
+
+    return app
+
+
+app = create_app()
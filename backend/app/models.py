@@ -21,4 +21,8 @@ class EventType(str, Enum):
     VISITOR_DENIED = "visitor_denied"
     VISITOR_CHECKED_IN = "visitor_checked_in"
     VISITOR_CHECKED_OUT = "visitor_checked_out"
+    VISITORS_IMPORTED = "visitors_imported"
+    PASS_CREATED = "pass_created"
+    PASS_REVOKED = "pass_revoked"
+    GATE_PASS_REVOKED = "gate_pass_revoked"
     ROLE_CHANGED = "role_changed"
\ No newline at end of file
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from app.schemas import ProfilerConfigUpdate
+from app.config import get_settings
+from app.dependencies import get_current_admin
+from app.utils import profiler
+from app.utils.event_archive import read_archive, read_manifest
+import logging
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+logger = logging.getLogger(__name__)
+
+
+@router.get("/profiler")
+async def get_profiler_config(current_user: dict = Depends(get_current_admin)):
+    """Current profiler settings and how many profiles are stored"""
+    return {**profiler.config.as_dict(), "stored_profiles": len(profiler.profiles)}
+
+
+@router.put("/profiler")
+async def update_profiler_config(
+        update: ProfilerConfigUpdate,
+        current_user: dict = Depends(get_current_admin)
+):
+    """
+    Change profiler settings at runtime (this worker only)
+
+    - **enabled**: Turn profiling on or off
+    - **route**: Path prefix to profile on every request, e.g. `/visitors/checkin`
+    - **sample_rate**: Fraction (0-1) of all other requests to profile
+    - **max_per_minute**: Hard cap on profiled requests per minute
+    - **interval_ms**: Sampling interval
+    """
+    for field, value in update.model_dump(exclude_unset=True).items():
+        if value is not None:
+            setattr(profiler.config, field, value)
+
+    logger.info(f"Profiler settings changed by {current_user['id']}: {profiler.config.as_dict()}")
+    return profiler.config.as_dict()
+
+
+@router.get("/profiles")
+async def list_profiles(current_user: dict = Depends(get_current_admin)):
+    """Stored profiles, newest first"""
+    return {"profiles": [profiler.profile_summary(p) for p in reversed(profiler.profiles)]}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+        profile_id: str,
+        format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+        current_user: dict = Depends(get_current_admin)
+):
+    """
+    Download a profile
+
+    - **format**: `speedscope` (JSON for speedscope.app) or `collapsed`
+      (folded stacks for flamegraph.pl / inferno)
+    """
+    profile = profiler.find_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "collapsed":
+        return PlainTextResponse(profiler.to_collapsed(profile))
+    return profiler.to_speedscope(profile)
+
+
+@router.get("/events/archive")
+async def get_archived_events(
+        start: Optional[datetime] = Query(None, description="Inclusive"),
+        end: Optional[datetime] = Query(None, description="Exclusive"),
+        type: Optional[str] = Query(None, description="Event type, e.g. visitor_checked_in"),
+        subject_id: Optional[str] = Query(None, description="Visitor, household or pass id"),
+        limit: int = Query(50, ge=1, le=500),
+        current_user: dict = Depends(get_current_admin)
+):
+    """
+    Audit events older than the retention window, newest first, read from
+    this server's archive files (see `python -m app.utils.event_archive`)
+    """
+    archive_dir = Path(get_settings().event_archive_dir)
+    events = await run_in_threadpool(read_archive, archive_dir, start, end, type, subject_id, limit)
+    return {"events": events, "archive_files": len(read_manifest(archive_dir))}
@@ -0,0 +1,131 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from app.schemas import AnalyticsHourlyResponse, AnalyticsHouseholdsResponse, AnalyticsSummaryResponse
+from app.config import get_settings
+from app.database import fetch_all, get_supabase
+from app.dependencies import get_current_admin
+from app.utils.analytics import COUNTERS, read_watermark
+from app.utils.directory import directory
+import logging
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DEFAULT_DAYS = 7
+ANALYTICS_MAX_DAYS = 92
+
+
+async def require_rollups():
+    # The rollup tables live in Supabase; gate-local SQLite databases only replicate events
+    if get_settings().storage_backend == "sqlite":
+        raise HTTPException(status_code=503, detail="Analytics are served by the central API")
+
+
+def time_range(start: Optional[datetime], end: Optional[datetime]) -> tuple:
+    """Default to the last week, at most ANALYTICS_MAX_DAYS long"""
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS)
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > timedelta(days=ANALYTICS_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Time range is limited to {ANALYTICS_MAX_DAYS} days")
+    return start, end
+
+
+def stats_rows(start: datetime, end: datetime, household_id: Optional[str] = None) -> List[dict]:
+    supabase = get_supabase(True)
+
+    def query():
+        q = supabase.table("visitor_stats_hourly").select("*").gte(
+            "bucket", start.isoformat()
+        ).lt("bucket", end.isoformat())
+        if household_id:
+            q = q.eq("host_household_id", household_id)
+        return q.order("bucket").order("host_household_id")
+
+    return fetch_all(query)
+
+
+def summarize(rows: Iterable[dict]) -> dict:
+    """Sum rollup rows into counters plus the average dwell time"""
+    totals = dict.fromkeys(COUNTERS, 0)
+    dwell = 0
+    for row in rows:
+        for counter in COUNTERS:
+            totals[counter] += row[counter]
+        dwell += row["dwell_seconds"]
+    totals["avg_dwell_seconds"] = round(dwell / totals["checked_out"], 1) if totals["checked_out"] else None
+    return totals
+
+
+def group_by(rows: Iterable[dict], column: str) -> Dict[str, List[dict]]:
+    groups = defaultdict(list)
+    for row in rows:
+        groups[row[column]].append(row)
+    return groups
+
+
+@router.get("/hourly", response_model=AnalyticsHourlyResponse)
+async def get_hourly_stats(
+        start: Optional[datetime] = Query(None, description="Inclusive, defaults to a week before end"),
+        end: Optional[datetime] = Query(None, description="Exclusive, defaults to now"),
+        household_id: Optional[str] = Query(None, description="One household instead of the whole community"),
+        _: None = Depends(require_rollups),
+        current_user: dict = Depends(get_current_admin)
+):
+    """
+    Visitors created, approved, denied, checked in and out per hour, with the
+    average dwell time of the visits that ended in that hour (hours without
+    visitors are left out)
+    """
+    print("Getting hourly visitor stats...")
+    start, end = time_range(start, end)
+    rows = stats_rows(start, end, household_id)
+    items = [{"bucket": bucket, **summarize(group)} for bucket, group in group_by(rows, "bucket").items()]
+    return {"start": start, "end": end, "household_id": household_id, "items": items}
+
+
+@router.get("/households", response_model=AnalyticsHouseholdsResponse)
+async def get_household_stats(
+        start: Optional[datetime] = Query(None, description="Inclusive, defaults to a week before end"),
+        end: Optional[datetime] = Query(None, description="Exclusive, defaults to now"),
+        _: None = Depends(require_rollups),
+        current_user: dict = Depends(get_current_admin)
+):
+    """Visitor counts and average dwell time per household, busiest first"""
+    print("Getting visitor stats per household...")
+    start, end = time_range(start, end)
+    items = []
+    for household_id, group in group_by(stats_rows(start, end), "host_household_id").items():
+        household = directory.get(household_id)
+        items.append({
+            "host_household_id": household_id,
+            "flat_no": household["flat_no"] if household else None,
+            **summarize(group)
+        })
+    items.sort(key=lambda item: -item["created"])
+    return {"start": start, "end": end, "items": items}
+
+
+@router.get("/summary", response_model=AnalyticsSummaryResponse)
+async def get_stats_summary(
+        start: Optional[datetime] = Query(None, description="Inclusive, defaults to a week before end"),
+        end: Optional[datetime] = Query(None, description="Exclusive, defaults to now"),
+        _: None = Depends(require_rollups),
+        current_user: dict = Depends(get_current_admin)
+):
+    """Community-wide totals for the range, and how current the rollup is"""
+    print("Getting visitor stats summary...")
+    start, end = time_range(start, end)
+    watermark = read_watermark(get_supabase(True))
+    return {
+        "start": start,
+        "end": end,
+        "totals": summarize(stats_rows(start, end)),
+        "rolled_up_to_seq": watermark["last_seq"],
+        "rolled_up_at": watermark["updated_at"]
+    }
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from app.schemas import UserCreate, UserResponse, LoginRequest, Token
 from app.database import get_supabase
 from app.auth import create_access_token, get_current_user
+from app.utils.directory import directory
+from app.utils.versions import content_etag, etag_matches
 # from app.auth import get_password_hash, verify_password,
 from datetime import timedelta
 from app.config import get_settings
@@ -39,6 +41,9 @@ async def register(user: UserCreate):
     if not result.data:
         raise HTTPException(status_code=500, detail="Failed to create user")
 
+    if user.household_id:
+        directory.invalidate()
+
     # Store hashed password separately (you might want a separate table for this)
     # For simplicity, we're not storing it here, but in production you should
 
@@ -68,7 +73,7 @@ async def login(login_data: LoginRequest):
     # Create access token
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user["id"], "roles": user["roles"]},
+        data={"sub": user["id"], "roles": user["roles"], "household_id": user.get("household_id")},
         expires_delta=access_token_expires
     )
 
@@ -80,5 +85,21 @@ async def login(login_data: LoginRequest):
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: dict = Depends(get_current_user)):
+async def get_me(
+        request: Request,
+        response: Response,
+        current_user: dict = Depends(get_current_user)
+):
+    """
+    The signed-in user
+
+    The ETag is a hash of the user row, so it changes with any edit to the
+    user (roles, household), whichever worker or tool made it. The row is
+    loaded for authentication anyway; a match only saves the body.
+    """
+    etag = content_etag(current_user)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=60"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return current_user
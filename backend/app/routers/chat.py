@@ -1,7 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from app.schemas import ChatMessage, ChatResponse
 from app.auth import get_current_user
-from app.utils.openai_tools import process_chat_message
 import logging
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
@@ -34,6 +33,9 @@ async def chat(
     - **action_taken**: Name of action performed (if any)
     - **details**: Details of the action result (if any)
     """
+    # Imported on first use so workers without chat traffic never load the LLM stack
+    from app.utils.openai_tools import process_chat_message
+
     try:
         logger.info(f"Chat message from user {current_user['id']}: {message.message}")
         print(current_user["household_id"])
@@ -0,0 +1,122 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timezone
+from typing import Optional
+from app.schemas import ExportJobCreate, ExportJobResponse
+from app.dependencies import get_current_admin
+from app.utils.exports import (
+    MEDIA_TYPES, ExportFilters, create_job, export_filename, export_stream, get_job, job_file, job_view, run_job
+)
+import logging
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+logger = logging.getLogger(__name__)
+
+FORMAT_PATTERN = "^(csv|xlsx)$"
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def export_filters(start: Optional[datetime], end: Optional[datetime], household_id: Optional[str],
+                   event_type: Optional[str] = None, include_archived: bool = True) -> ExportFilters:
+    start, end = _utc(start), _utc(end)
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return ExportFilters(start, end, household_id, event_type, include_archived)
+
+
+def stream_export(kind: str, export_format: str, filters: ExportFilters) -> StreamingResponse:
+    # Rows are read page by page while the response is being sent
+    return StreamingResponse(
+        export_stream(kind, export_format, filters),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(kind, export_format)}"'}
+    )
+
+
+@router.get("/visitors")
+async def export_visitors(
+        format: str = Query("csv", pattern=FORMAT_PATTERN),
+        start: Optional[datetime] = Query(None, description="Created at or after (inclusive)"),
+        end: Optional[datetime] = Query(None, description="Created before (exclusive)"),
+        household_id: Optional[str] = Query(None, description="Host household"),
+        include_archived: bool = Query(True, description="Include visitors compacted into visitors_archive"),
+        current_user: dict = Depends(get_current_admin)
+):
+    """
+    Download visitors as CSV or XLSX, oldest first (committee/admin only)
+
+    The file is streamed as it is read, so there is no row limit. Archived
+    visitors follow the active ones.
+    """
+    print("Exporting visitors...")
+    filters = export_filters(start, end, household_id, include_archived=include_archived)
+    logger.info(f"Visitor export ({format}) by {current_user['id']}: {filters.as_dict()}")
+    return stream_export("visitors", format, filters)
+
+
+@router.get("/events")
+async def export_events(
+        format: str = Query("csv", pattern=FORMAT_PATTERN),
+        start: Optional[datetime] = Query(None, description="Occurred at or after (inclusive)"),
+        end: Optional[datetime] = Query(None, description="Occurred before (exclusive)"),
+        household_id: Optional[str] = Query(None, description="Events about this household or its visitors"),
+        type: Optional[str] = Query(None, description="Event type, e.g. visitor_checked_in"),
+        current_user: dict = Depends(get_current_admin)
+):
+    """
+    Download audit events as CSV or XLSX, oldest first (committee/admin only)
+
+    Events past the retention window are in the archive, see GET /admin/events/archive.
+    """
+    print("Exporting events...")
+    filters = export_filters(start, end, household_id, event_type=type)
+    logger.info(f"Event export ({format}) by {current_user['id']}: {filters.as_dict()}")
+    return stream_export("events", format, filters)
+
+
+@router.post("/jobs", response_model=ExportJobResponse, status_code=202)
+async def create_export_job(
+        request: ExportJobCreate,
+        background_tasks: BackgroundTasks,
+        current_user: dict = Depends(get_current_admin)
+):
+    """
+    Export in the background instead of streaming (for very large exports)
+
+    Poll GET /exports/jobs/{job_id} until the status is `done`, then
+    download the file. Files are deleted after EXPORT_JOB_TTL_HOURS.
+    """
+    print("Creating export job...")
+    filters = export_filters(request.start, request.end, request.household_id, request.type, request.include_archived)
+    job = await run_in_threadpool(create_job, request.kind, request.format, filters, current_user["id"])
+    background_tasks.add_task(run_job, job["id"])
+
+    logger.info(f"Export job {job['id']} ({request.kind}, {request.format}) created by {current_user['id']}")
+    return job_view(job)
+
+
+@router.get("/jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(job_id: str, current_user: dict = Depends(get_current_admin)):
+    """Status of a background export"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job_view(job)
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_export(job_id: str, current_user: dict = Depends(get_current_admin)):
+    """The file written by a finished background export"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job['status']}")
+
+    return FileResponse(job_file(job), media_type=MEDIA_TYPES[job["format"]], filename=job["filename"])
@@ -0,0 +1,230 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+from app.schemas import (
+    GatePassRevoke, GateCheckinBatch, GateCheckinBatchResponse, GateRevocationsResponse
+)
+from app.database import get_supabase
+from app.dependencies import get_current_resident, get_current_guard, conditional_get
+from app.models import VisitorStatus, EventType
+from app.routers.visitors import log_event
+from app.utils.fcm import send_notification
+from app.utils.gate_pass import (
+    GatePassError, as_utc, public_keys, verify_gate_pass, visitor_pass_window
+)
+from app.utils.occupancy import occupancy
+from app.utils.versions import GATE_REVOCATIONS_SCOPE, bump, bump_visitors, bump_events
+import logging
+import time
+
+router = APIRouter(prefix="/gate", tags=["Gate"])
+logger = logging.getLogger(__name__)
+
+# After the RPC fails, update visitors one by one for this long before trying it again
+RPC_RETRY_SECONDS = 300.0
+
+_rpc_unavailable_until = 0.0
+
+
+def check_in_approved(supabase, checked_in_at: Dict[str, str]) -> List[dict]:
+    """
+    Move visitors that are still approved to checked_in
+
+    Each update is conditional on the visitor still being approved, so a
+    revocation that lands while the batch is being committed wins. The
+    commit_gate_checkins RPC (migrations/004_gate_passes.sql) does the whole
+    batch in one statement; without it every visitor is its own update.
+
+    Args:
+        supabase: Database client (service role)
+        checked_in_at: Check-in time (ISO 8601) by visitor id
+
+    Returns:
+        The visitors that were checked in
+    """
+    global _rpc_unavailable_until
+
+    if time.monotonic() >= _rpc_unavailable_until:
+        try:
+            return supabase.rpc("commit_gate_checkins", {"checkins": [
+                {"id": visitor_id, "checked_in_at": at} for visitor_id, at in checked_in_at.items()
+            ]}).execute().data
+        except Exception as e:
+            _rpc_unavailable_until = time.monotonic() + RPC_RETRY_SECONDS
+            logger.warning(f"commit_gate_checkins RPC unavailable, updating visitors one by one: {str(e)}")
+
+    committed = []
+    for visitor_id, at in checked_in_at.items():
+        committed.extend(supabase.table("visitors").update({
+            "status": VisitorStatus.CHECKED_IN.value,
+            "checked_in_at": at
+        }).eq("id", visitor_id).eq("status", VisitorStatus.APPROVED.value).execute().data)
+    return committed
+
+
+def revocations_scope(claims: dict, request: Request):
+    return GATE_REVOCATIONS_SCOPE, "", "private, no-cache"
+
+
+@router.get("/keys")
+async def get_gate_keys(current_user: dict = Depends(get_current_guard)):
+    """Public keys guard devices verify gate passes with, by key id"""
+    return {"algorithm": "Ed25519", "keys": public_keys()}
+
+
+@router.get("/revocations", response_model=GateRevocationsResponse)
+async def get_revocations(
+        _: None = Depends(conditional_get(revocations_scope)),
+        current_user: dict = Depends(get_current_guard)
+):
+    """
+    Revoked gate passes that have not expired yet
+
+    Devices poll this with If-None-Match (304 while nothing changed) and
+    also get a push notification when a pass is revoked.
+    """
+    print("Getting gate pass revocations...")
+    supabase = get_supabase(True)
+    result = supabase.table("gate_pass_revocations").select("visitor_id, expires_at").gt(
+        "expires_at", datetime.now(timezone.utc).isoformat()
+    ).order("expires_at").execute()
+    return {"revoked": result.data}
+
+
+@router.post("/revoke")
+async def revoke_gate_pass(
+        revocation: GatePassRevoke,
+        current_user: dict = Depends(get_current_resident)
+):
+    """Cancel an approved visit: the visitor is denied and the pass goes on the revocation list"""
+    print("Revoking gate pass...")
+
+    supabase = get_supabase(True)
+
+    result = supabase.table("visitors").select("*").eq("id", revocation.visitor_id).execute()
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Visitor not found")
+
+    visitor = result.data[0]
+
+    is_admin = "admin" in current_user.get("roles", [])
+    is_host = visitor["host_household_id"] == current_user.get("household_id")
+    if not (is_admin or is_host):
+        raise HTTPException(status_code=403, detail="Not authorized to revoke this visitor's pass")
+
+    if visitor["status"] != VisitorStatus.APPROVED.value:
+        raise HTTPException(status_code=400, detail=f"Cannot revoke pass of visitor with status {visitor['status']}")
+
+    _, expires_at = visitor_pass_window(visitor)
+    # Only while still approved: a check-in that lands first must not be undone
+    denied = supabase.table("visitors").update({"status": VisitorStatus.DENIED.value}).eq("id", visitor["id"]).eq(
+        "status", VisitorStatus.APPROVED.value
+    ).execute()
+    if not denied.data:
+        raise HTTPException(status_code=409, detail="Visitor is no longer approved")
+    supabase.table("gate_pass_revocations").insert({
+        "visitor_id": visitor["id"],
+        "host_household_id": visitor["host_household_id"],
+        "revoked_by": current_user["id"],
+        "reason": revocation.reason,
+        "expires_at": expires_at.isoformat()
+    }).execute()
+    bump_visitors(visitor["host_household_id"])
+    bump(GATE_REVOCATIONS_SCOPE)
+
+    await log_event(
+        EventType.GATE_PASS_REVOKED,
+        current_user["id"],
+        visitor["id"],
+        {"visitor_name": visitor["name"], "reason": revocation.reason}
+    )
+
+    # Data push so devices refresh their revocation list right away
+    await send_notification(
+        "guards",
+        "Gate Pass Revoked",
+        f"{visitor['name']}'s gate pass has been revoked",
+        {"type": "gate_pass_revoked", "visitor_id": visitor["id"]}
+    )
+
+    return {"message": "Gate pass revoked successfully"}
+
+
+@router.post("/checkins", response_model=GateCheckinBatchResponse)
+async def commit_checkins(
+        batch: GateCheckinBatch,
+        current_user: dict = Depends(get_current_guard)
+):
+    """
+    Record check-ins that a guard device already let through offline
+
+    Each pass is verified again and must have been valid when the device
+    checked it. Visitors that are still approved are moved to checked_in
+    with the device's time; re-uploads of a committed check-in come back as
+    "duplicate", so a device can safely retry the whole batch. One
+    conditional update for the batch, one read for the visitors it did not
+    check in, and one write for the events.
+    """
+    print("Committing gate check-ins...")
+
+    results = [None] * len(batch.checkins)
+    verified = {}
+    for index, checkin in enumerate(batch.checkins):
+        try:
+            gate_pass = verify_gate_pass(checkin.gate_pass)
+        except GatePassError as e:
+            results[index] = {"visitor_id": None, "result": "invalid", "detail": str(e)}
+            continue
+        if not gate_pass.valid_at(as_utc(checkin.checked_in_at)):
+            results[index] = {"visitor_id": gate_pass.visitor_id, "result": "expired"}
+            continue
+        if gate_pass.visitor_id in verified:
+            results[index] = {"visitor_id": gate_pass.visitor_id, "result": "duplicate"}
+            continue
+        verified[gate_pass.visitor_id] = index, as_utc(checkin.checked_in_at).isoformat()
+
+    supabase = get_supabase(True)
+    committed = []
+    if verified:
+        committed = check_in_approved(supabase, {visitor_id: at for visitor_id, (_, at) in verified.items()})
+    for visitor in committed:
+        results[verified.pop(visitor["id"])[0]] = {"visitor_id": visitor["id"], "result": "committed"}
+
+    if verified:
+        result = supabase.table("visitors").select("id, status").in_("id", list(verified)).execute()
+        statuses = {visitor["id"]: visitor["status"] for visitor in result.data}
+        for visitor_id, (index, _) in verified.items():
+            status = statuses.get(visitor_id)
+            if status is None:
+                results[index] = {"visitor_id": visitor_id, "result": "not_found"}
+            elif status in (VisitorStatus.CHECKED_IN.value, VisitorStatus.CHECKED_OUT.value):
+                results[index] = {"visitor_id": visitor_id, "result": "duplicate"}
+            else:
+                # Denied or revoked after the device last synced
+                results[index] = {"visitor_id": visitor_id, "result": "rejected", "detail": status}
+
+    if committed:
+        occurred_at = datetime.utcnow().isoformat()
+        supabase.table("events").insert([{
+            "type": EventType.VISITOR_CHECKED_IN.value,
+            "actor_user_id": current_user["id"],
+            "subject_id": visitor["id"],
+            "payload": {"visitor_name": visitor["name"], "guard": current_user["display_name"], "offline": True},
+            "occurred_at": occurred_at
+        } for visitor in committed]).execute()
+        bump_events()
+
+        by_household = defaultdict(list)
+        for visitor in committed:
+            by_household[visitor["host_household_id"]].append(visitor["name"])
+        for household_id, names in by_household.items():
+            bump_visitors(household_id)
+            occupancy.checked_in(household_id, len(names))
+            await send_notification(
+                f"household_{household_id}",
+                "Visitor Checked In",
+                f"{', '.join(names)} {'has' if len(names) == 1 else 'have'} checked in"
+            )
+
+    return {"committed": len(committed), "results": results}
@@ -1,20 +1,75 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 
 from app.database import get_supabase
-from app.schemas import HouseholdResponse
+from app.schemas import HouseholdCreate, HouseholdResponse, HouseholdListResponse
 from app.auth import get_current_user
+from app.dependencies import get_current_admin
+from app.utils.directory import directory
+import logging
 
 router = APIRouter(prefix="/households", tags=["HouseHolds"])
+logger = logging.getLogger(__name__)
+
+HOUSEHOLDS_DEFAULT_LIMIT = 50
+HOUSEHOLDS_MAX_LIMIT = 200
+
+
+@router.get("/", response_model=HouseholdListResponse)
+async def list_households(
+        offset: int = Query(0, ge=0),
+        limit: int = Query(HOUSEHOLDS_DEFAULT_LIMIT, ge=1, le=HOUSEHOLDS_MAX_LIMIT),
+        current_user: dict = Depends(get_current_user)
+):
+    """
+    List households ordered by flat number, with their member ids
+
+    - **offset**: Number of households to skip
+    - **limit**: Page size (max 200)
+    """
+    print("Listing households...")
+    items, total = directory.page(offset, limit)
+    return {"items": items, "total": total, "offset": offset, "limit": limit}
+
+
+@router.get("/by-flat/{flat_no}", response_model=HouseholdResponse)
+async def get_household_by_flat(
+        flat_no: str,
+        current_user: dict = Depends(get_current_user)
+):
+    """Look up a household by flat number ('A-101', 'a101' and 'A101' all match)"""
+    print("Looking up household by flat...")
+    household = directory.by_flat(flat_no)
+    if not household:
+        raise HTTPException(status_code=404, detail="Household not found")
+    return household
+
+
+@router.get("/{household_id}", response_model=HouseholdResponse)
+async def get_household(
+        household_id: str,
+        current_user: dict = Depends(get_current_user)
+):
+    print("Getting household...")
+    household = directory.get(household_id)
+    if not household:
+        raise HTTPException(status_code=404, detail="Household not found")
+    return household
+
 
 @router.post("/", response_model=HouseholdResponse)
-async def get_house_holds(
-    message: HouseholdResponse,
-    current_user: dict = Depends(get_current_user)
+async def create_household(
+        household: HouseholdCreate,
+        current_user: dict = Depends(get_current_admin)
 ):
-    try:
-        supabase = get_supabase()
-        response = supabase.table("households").select("*").execute()
-        return response
-    except Exception as e:
-        print(e)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+    """Create a household (admin/committee only)"""
+    print("Creating household...")
+    if directory.by_flat(household.flat_no):
+        raise HTTPException(status_code=400, detail="A household with this flat number already exists")
+
+    supabase = get_supabase(True)
+    result = supabase.table("households").insert(household.model_dump()).execute()
+    if not result.data:
+        raise HTTPException(status_code=500, detail="Failed to create household")
+
+    directory.invalidate()
+    return {**result.data[0], "members": []}
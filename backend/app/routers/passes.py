@@ -0,0 +1,180 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import List
+from app.schemas import VisitorPassCreate, VisitorPassResponse, PassCheckin
+from app.database import get_supabase
+from app.auth import get_current_user
+from app.dependencies import get_current_resident, get_current_guard
+from app.models import VisitorStatus, EventType
+from app.routers.visitors import log_event
+from app.utils.fcm import send_notification
+from app.utils.occupancy import occupancy
+from app.utils.passes import passes, pass_allows, community_now
+from app.utils.versions import bump_visitors
+from datetime import datetime
+import logging
+
+router = APIRouter(prefix="/passes", tags=["Passes"])
+logger = logging.getLogger(__name__)
+
+
+def _can_manage(current_user: dict, visitor_pass: dict) -> bool:
+    return "admin" in current_user.get("roles", []) or (
+        visitor_pass["host_household_id"] == current_user.get("household_id")
+    )
+
+
+@router.get("/", response_model=List[VisitorPassResponse])
+async def list_passes(current_user: dict = Depends(get_current_user)):
+    """Active passes: every household's for guards and admins, the caller's household's for residents"""
+    print("Listing passes...")
+    if any(role in current_user.get("roles", []) for role in ["admin", "guard"]):
+        return passes.all()
+    if not current_user.get("household_id"):
+        return []
+    return passes.for_household(current_user["household_id"])
+
+
+@router.post("/", response_model=VisitorPassResponse)
+async def create_pass(
+        visitor_pass: VisitorPassCreate,
+        current_user: dict = Depends(get_current_resident)
+):
+    """
+    Register a recurring pass for daily staff
+
+    - **days_of_week**: 0 = Monday ... 6 = Sunday
+    - **start_time** / **end_time**: Daily window in the community's local time
+    - **valid_from** / **valid_until**: Optional first and last day
+    """
+    print("Creating pass...")
+
+    if not current_user.get("household_id"):
+        raise HTTPException(status_code=400, detail="User must belong to a household")
+
+    supabase = get_supabase(True)
+    pass_data = {
+        "host_household_id": current_user["household_id"],
+        "name": visitor_pass.name,
+        "phone": visitor_pass.phone,
+        "purpose": visitor_pass.purpose,
+        "days_of_week": visitor_pass.days_of_week,
+        "start_time": visitor_pass.start_time.isoformat(),
+        "end_time": visitor_pass.end_time.isoformat(),
+        "valid_from": visitor_pass.valid_from.isoformat() if visitor_pass.valid_from else None,
+        "valid_until": visitor_pass.valid_until.isoformat() if visitor_pass.valid_until else None,
+        "active": True,
+        "created_by": current_user["id"]
+    }
+
+    result = supabase.table("visitor_passes").insert(pass_data).execute()
+    if not result.data:
+        raise HTTPException(status_code=500, detail="Failed to create pass")
+
+    created_pass = result.data[0]
+    passes.invalidate()
+
+    await log_event(
+        EventType.PASS_CREATED,
+        current_user["id"],
+        created_pass["id"],
+        {"name": visitor_pass.name, "purpose": visitor_pass.purpose, "days_of_week": visitor_pass.days_of_week}
+    )
+
+    return created_pass
+
+
+@router.delete("/{pass_id}")
+async def revoke_pass(
+        pass_id: str,
+        current_user: dict = Depends(get_current_resident)
+):
+    print("Revoking pass...")
+
+    visitor_pass = passes.get(pass_id)
+    if not visitor_pass:
+        raise HTTPException(status_code=404, detail="Pass not found")
+    if not _can_manage(current_user, visitor_pass):
+        raise HTTPException(status_code=403, detail="Not authorized to revoke this pass")
+
+    supabase = get_supabase(True)
+    supabase.table("visitor_passes").update({"active": False}).eq("id", pass_id).execute()
+    passes.invalidate()
+
+    await log_event(EventType.PASS_REVOKED, current_user["id"], pass_id, {"name": visitor_pass["name"]})
+
+    return {"message": "Pass revoked successfully"}
+
+
+@router.post("/checkin")
+async def checkin_pass(
+        checkin: PassCheckin,
+        current_user: dict = Depends(get_current_guard)
+):
+    """
+    Check in a pass holder by pass id or phone number
+
+    The pass is looked up in the in-memory index and checked against its
+    days and hours; the visit is recorded as an already-approved,
+    checked-in visitor (check out with POST /visitors/checkout as usual).
+    """
+    print("Check-in pass holder...")
+
+    if checkin.pass_id:
+        candidates = [p for p in [passes.get(checkin.pass_id)] if p]
+    else:
+        candidates = passes.for_phone(checkin.phone)
+    if not candidates:
+        raise HTTPException(status_code=404, detail="Pass not found")
+
+    now = community_now()
+    valid = [p for p in candidates if pass_allows(p, now)]
+    if not valid:
+        raise HTTPException(status_code=403, detail="Pass is not valid at this time")
+    if len(valid) > 1:
+        # Same person working for two households in overlapping hours
+        raise HTTPException(status_code=409, detail={
+            "message": "Multiple passes match this phone number, check in by pass_id",
+            "pass_ids": [p["id"] for p in valid]
+        })
+    visitor_pass = valid[0]
+
+    checked_in_at = datetime.utcnow().isoformat()
+    visitor_data = {
+        "name": visitor_pass["name"],
+        "phone": visitor_pass["phone"],
+        "purpose": visitor_pass["purpose"],
+        "host_household_id": visitor_pass["host_household_id"],
+        "status": VisitorStatus.CHECKED_IN.value,
+        "approved_by": visitor_pass["created_by"],
+        "approved_at": checked_in_at,
+        "checked_in_at": checked_in_at,
+        "pass_id": visitor_pass["id"]
+    }
+
+    supabase = get_supabase(True)
+    try:
+        result = supabase.table("visitors").insert(visitor_data).execute()
+    except Exception as e:
+        # idx_visitors_pass_checked_in: one open visit per pass
+        if "unique" in str(e).lower():
+            raise HTTPException(status_code=409, detail=f"{visitor_pass['name']} is already checked in")
+        raise
+
+    visitor = result.data[0]
+    bump_visitors(visitor["host_household_id"])
+    occupancy.checked_in(visitor["host_household_id"])
+
+    await log_event(
+        EventType.VISITOR_CHECKED_IN,
+        current_user["id"],
+        visitor["id"],
+        {"visitor_name": visitor["name"], "guard": current_user["display_name"], "pass_id": visitor_pass["id"]}
+    )
+
+    await send_notification(
+        f"household_{visitor['host_household_id']}",
+        "Visitor Checked In",
+        f"{visitor['name']} has checked in"
+    )
+
+    return {"message": "Pass holder checked in successfully", "visitor": visitor}
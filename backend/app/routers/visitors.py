@@ -1,19 +1,47 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from app.schemas import (
     VisitorCreate, VisitorResponse, VisitorApproval,
-    VisitorDenial, VisitorCheckin, VisitorCheckout
+    VisitorDenial, VisitorCheckin, VisitorCheckout,
+    VisitorImportResponse, VisitorSyncResponse, GatePassResponse, OccupancyResponse
 )
+from app.config import get_settings
 from app.database import get_supabase
 from app.auth import get_current_user
-from app.dependencies import get_current_resident, get_current_guard
+from app.dependencies import get_current_resident, get_current_guard, conditional_get
 from app.models import VisitorStatus, EventType
 from datetime import datetime
+from app.utils.coalesce import reads
+from app.utils.compaction import get_archived_visitor
 from app.utils.fcm import send_notification
+from app.utils.gate_pass import gate_pass_for
+from app.utils.occupancy import occupancy
+from app.utils.visitor_import import (
+    IMPORT_CHUNK_SIZE, IMPORT_MAX_ROWS, IMPORT_MAX_REPORTED_ERRORS,
+    detect_import_format, iter_import_rows
+)
+from app.utils.sync import (
+    SYNC_ACTIVE_STATUSES, SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT,
+    capped, encode_cursor, decode_cursor, keyset_filter, sync_horizon
+)
+from app.utils.serialization import prevalidated
+from app.utils.visitor_search import (
+    SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_MIN_QUERY_LENGTH, search_visitors as run_visitor_search
+)
+from app.utils.versions import (
+    VISITORS_SCOPE, household_visitors_scope, bump_visitors, bump_events, get_version
+)
+import asyncio
+import time
 import uuid
 
 router = APIRouter(prefix="/visitors", tags=["Visitors"])
 
+# Exactly the VisitorResponse fields, so list rows can skip re-validation
+VISITOR_COLUMNS = ", ".join(VisitorResponse.model_fields)
+
 
 async def log_event(event_type: EventType, actor_user_id: str, subject_id: str, payload: dict = None):
     supabase = get_supabase(True)
@@ -25,6 +53,33 @@ async def log_event(event_type: EventType, actor_user_id: str, subject_id: str,
         "occurred_at": datetime.utcnow().isoformat()
     }
     supabase.table("events").insert(event_data).execute()
+    bump_events()
+
+
+def visitors_list_scope(claims: dict, request: Request):
+    # Admins and guards share one list, residents get their household's
+    if any(role in claims.get("roles", []) for role in ["admin", "guard"]):
+        return VISITORS_SCOPE, "all", "private, no-cache"
+    if claims.get("household_id"):
+        household_id = claims["household_id"]
+        return household_visitors_scope(household_id), f"household:{household_id}", "private, no-cache"
+    return None
+
+
+def visitors_read_key(current_user: dict) -> tuple:
+    """Coalescing key of a visitor read: the caller's role scope and that scope's version"""
+    if any(role in current_user.get("roles", []) for role in ["admin", "guard"]):
+        return VISITORS_SCOPE, get_version(VISITORS_SCOPE)
+    scope = household_visitors_scope(current_user.get("household_id"))
+    return scope, get_version(scope)
+
+
+def visitor_detail_scope(claims: dict, request: Request):
+    list_scope = visitors_list_scope(claims, request)
+    if list_scope is None:
+        return None
+    _, key, cache_control = list_scope
+    return VISITORS_SCOPE, f"{key}:{request.path_params['visitor_id']}", cache_control
 
 
 @router.post("/", response_model=VisitorResponse)
@@ -55,6 +110,7 @@ async def create_visitor(
         raise HTTPException(status_code=500, detail="Failed to create visitor")
 
     created_visitor = result.data[0]
+    bump_visitors(created_visitor["host_household_id"])
 
     # Log event
     await log_event(
@@ -74,45 +130,365 @@ async def create_visitor(
     return created_visitor
 
 
+@router.post("/import", response_model=VisitorImportResponse)
+async def import_visitors(
+        file: UploadFile = File(...),
+        current_user: dict = Depends(get_current_resident)
+):
+    """
+    Pre-register a guest list for a large gathering
+
+    Accepts a CSV (header: name, phone, purpose, scheduled_time) or JSONL
+    file. Rows are validated as they are read and inserted in chunks; rows
+    that fail validation or insertion are reported without aborting the
+    rest of the import. One audit event and one guard notification are
+    sent for the whole import.
+    """
+    print("Importing visitors...")
+
+    if not current_user.get("household_id"):
+        raise HTTPException(status_code=400, detail="User must belong to a household")
+
+    fmt = detect_import_format(file.filename, file.content_type)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unsupported file format, upload a .csv or .jsonl file")
+
+    supabase = get_supabase(True)
+
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+
+    def record_error(row_no: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({"row": row_no, "error": message})
+
+    def flush():
+        nonlocal imported
+        if not batch:
+            return
+        try:
+            result = supabase.table("visitors").insert([data for _, data in batch]).execute()
+            imported += len(result.data)
+        except Exception as e:
+            for row_no, _ in batch:
+                record_error(row_no, f"Failed to insert: {str(e)}")
+        batch.clear()
+
+    seen = 0
+    for row_no, visitor, error in iter_import_rows(file.file, fmt):
+        if error:
+            record_error(row_no, error)
+            continue
+
+        seen += 1
+        if seen > IMPORT_MAX_ROWS:
+            record_error(row_no, f"Import is limited to {IMPORT_MAX_ROWS} visitors")
+            break
+
+        batch.append((row_no, {
+            "name": visitor.name,
+            "phone": visitor.phone,
+            "purpose": visitor.purpose,
+            "host_household_id": current_user["household_id"],
+            "status": VisitorStatus.PENDING.value,
+            "scheduled_time": visitor.scheduled_time.isoformat() if visitor.scheduled_time else None
+        }))
+        if len(batch) >= IMPORT_CHUNK_SIZE:
+            flush()
+
+    flush()
+
+    if imported:
+        bump_visitors(current_user["household_id"])
+
+        # One event and one notification for the whole guest list
+        await log_event(
+            EventType.VISITORS_IMPORTED,
+            current_user["id"],
+            current_user["household_id"],
+            {"imported": imported, "failed": failed, "source": file.filename}
+        )
+
+        await send_notification(
+            "guards",
+            "Visitors Pre-registered",
+            f"{imported} visitors are pending approval at {current_user.get('display_name')}'s home"
+        )
+
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors)
+    }
+
+
 @router.get("/", response_model=List[VisitorResponse])
-async def get_visitors(current_user: dict = Depends(get_current_user)):
+async def get_visitors(
+        response: Response,
+        _: None = Depends(conditional_get(visitors_list_scope)),
+        current_user: dict = Depends(get_current_user)
+):
     print("Getting All visitor...")
 
     supabase = get_supabase(True)
 
     # Admins and guards see all visitors
     if any(role in current_user.get("roles", []) for role in ["admin", "guard"]):
-        result = supabase.table("visitors").select("*").order("created_at", desc=True).execute()
+        query = supabase.table("visitors").select(VISITOR_COLUMNS).order("created_at", desc=True)
     else:
         # Residents see only their household visitors
-        result = supabase.table("visitors").select("*").eq(
+        query = supabase.table("visitors").select(VISITOR_COLUMNS).eq(
             "host_household_id", current_user.get("household_id")
+        ).order("created_at", desc=True)
+
+    # Guard screens poll this all at once; identical reads share one query
+    rows = await reads.run("visitors_list", visitors_read_key(current_user), lambda: query.execute().data)
+    return prevalidated(rows, response)
+
+
+@router.get("/sync", response_model=VisitorSyncResponse)
+async def sync_visitors(
+        response: Response,
+        since: Optional[str] = Query(None, description="Cursor returned by the previous sync"),
+        limit: int = Query(SYNC_DEFAULT_LIMIT, ge=1, le=SYNC_MAX_LIMIT),
+        current_user: dict = Depends(get_current_guard)
+):
+    """
+    Delta sync for guard devices
+
+    Without `since`, returns every approved/checked-in visitor (full sync).
+    With `since`, returns only visitors changed after the cursor: rows that
+    are still approved/checked-in come back in `upserts`, rows that left
+    that set or were deleted come back in `removed`. Keep calling with the
+    returned cursor while `has_more` is true. Retrying with the same cursor
+    after a dropped connection is always safe.
+
+    Changes from the last SYNC_SAFETY_LAG_SECONDS are held back until a
+    later sync, so one committed late is never skipped.
+    """
+    print("Syncing visitors...")
+
+    supabase = get_supabase(True)
+    horizon = sync_horizon(get_settings().sync_safety_lag_seconds)
+
+    if since is None:
+        # Take the watermark before reading so changes made while we read
+        # are picked up by the next delta sync; rows newer than the horizon
+        # come again in the next delta
+        latest_visitor = supabase.table("visitors").select("updated_at").order(
+            "updated_at", desc=True
+        ).limit(1).execute()
+        latest_tombstone = supabase.table("visitor_tombstones").select("deleted_at").order(
+            "deleted_at", desc=True
+        ).limit(1).execute()
+
+        result = supabase.table("visitors").select(VISITOR_COLUMNS).in_(
+            "status", SYNC_ACTIVE_STATUSES
         ).order("created_at", desc=True).execute()
 
-    return result.data
+        cursor = {
+            "u": capped(latest_visitor.data[0]["updated_at"] if latest_visitor.data else None, horizon),
+            "i": "",
+            "t": capped(latest_tombstone.data[0]["deleted_at"] if latest_tombstone.data else None, horizon),
+            "ti": ""
+        }
+
+        return prevalidated({
+            "upserts": result.data,
+            "removed": [],
+            "cursor": encode_cursor(cursor),
+            "has_more": False,
+            "full": True
+        }, response)
+
+    cursor = decode_cursor(since)
+    if cursor is None:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+
+    changed = supabase.table("visitors").select(f"{VISITOR_COLUMNS}, updated_at").or_(
+        keyset_filter("updated_at", cursor["u"], "id", cursor.get("i"))
+    ).lt("updated_at", horizon).order("updated_at").order("id").limit(limit + 1).execute()
+
+    tombstones = supabase.table("visitor_tombstones").select("visitor_id, deleted_at").or_(
+        keyset_filter("deleted_at", cursor["t"], "visitor_id", cursor.get("ti"))
+    ).lt("deleted_at", horizon).order("deleted_at").order("visitor_id").limit(limit + 1).execute()
+
+    changed_rows = changed.data[:limit]
+    tombstone_rows = tombstones.data[:limit]
+
+    upserts = []
+    removed = []
+    for row in changed_rows:
+        if row["status"] in SYNC_ACTIVE_STATUSES:
+            upserts.append({column: row[column] for column in VisitorResponse.model_fields})
+        else:
+            removed.append(row["id"])
+    removed.extend(row["visitor_id"] for row in tombstone_rows)
+
+    if changed_rows:
+        cursor["u"] = changed_rows[-1]["updated_at"]
+        cursor["i"] = changed_rows[-1]["id"]
+    if tombstone_rows:
+        cursor["t"] = tombstone_rows[-1]["deleted_at"]
+        cursor["ti"] = tombstone_rows[-1]["visitor_id"]
+
+    return prevalidated({
+        "upserts": upserts,
+        "removed": removed,
+        "cursor": encode_cursor(cursor),
+        "has_more": len(changed.data) > limit or len(tombstones.data) > limit,
+        "full": False
+    }, response)
+
+
+@router.get("/search", response_model=List[VisitorResponse])
+async def search_visitors(
+        response: Response,
+        q: str = Query(..., min_length=SEARCH_MIN_QUERY_LENGTH, max_length=64,
+                       description="Part of the visitor's name or phone number"),
+        limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+        current_user: dict = Depends(get_current_user)
+):
+    """
+    Find visitors by partial name or phone number, best match first
+
+    Name prefixes rank first, then word prefixes, then substrings. Phone
+    numbers match on 3 or more consecutive digits, ignoring spaces and
+    dashes. Guards and admins search every household, residents only
+    their own.
+    """
+    print("Searching visitors...")
+
+    supabase = get_supabase(True)
+
+    if any(role in current_user.get("roles", []) for role in ["admin", "guard"]):
+        household_id = None
+    else:
+        household_id = current_user.get("household_id")
+        if not household_id:
+            raise HTTPException(status_code=400, detail="User must belong to a household")
+
+    return prevalidated(run_visitor_search(supabase, q, household_id, limit), response)
+
+
+def occupancy_household(current_user: dict) -> Optional[str]:
+    # Gate staff and the committee see the whole community, residents their household
+    if any(role in current_user.get("roles", []) for role in ["admin", "committee", "guard"]):
+        return None
+    if not current_user.get("household_id"):
+        raise HTTPException(status_code=400, detail="User must belong to a household")
+    return current_user["household_id"]
+
+
+@router.get("/occupancy", response_model=OccupancyResponse)
+async def get_occupancy(current_user: dict = Depends(get_current_user)):
+    """
+    Visitors inside right now, in total, per household and per tower
+
+    Served from the in-memory occupancy counter; `reconciled_at` is when it
+    was last checked against the database.
+    """
+    print("Getting occupancy...")
+    household_id = occupancy_household(current_user)
+    if occupancy.due:
+        await run_in_threadpool(occupancy.reconcile)
+    return occupancy.snapshot(household_id)
+
+
+@router.get("/occupancy/stream")
+async def stream_occupancy(request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Server-sent events: an `occupancy` event with the current counts, then
+    one whenever they change. The server closes the stream after
+    OCCUPANCY_STREAM_MAX_SECONDS; clients reconnect.
+    """
+    print("Streaming occupancy...")
+    household_id = occupancy_household(current_user)
+    settings = get_settings()
+
+    async def events():
+        closes_at = time.monotonic() + settings.occupancy_stream_max_seconds
+        sent = None
+        while True:
+            if occupancy.due:
+                await run_in_threadpool(occupancy.reconcile)
+            snapshot = occupancy.snapshot(household_id)
+            counts = (snapshot["total"], snapshot["by_household"])
+            if counts != sent:
+                sent = counts
+                yield f"event: occupancy\ndata: {OccupancyResponse(**snapshot).model_dump_json()}\n\n"
+            if time.monotonic() >= closes_at or await request.is_disconnected():
+                return
+            await asyncio.sleep(settings.occupancy_stream_interval_seconds)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/{visitor_id}", response_model=VisitorResponse)
-async def get_visitor(visitor_id: str, current_user: dict = Depends(get_current_user)):
+async def get_visitor(
+        visitor_id: str,
+        _: None = Depends(conditional_get(visitor_detail_scope)),
+        current_user: dict = Depends(get_current_user)
+):
     print("Get a visitor...")
 
     supabase = get_supabase()
 
     result = supabase.table("visitors").select("*").eq("id", visitor_id).execute()
 
+    # Checked out / denied long ago: moved by the retention compaction
+    visitor = result.data[0] if result.data else get_archived_visitor(supabase, visitor_id)
+    if visitor is None:
+        raise HTTPException(status_code=404, detail="Visitor not found")
+
+    # Check permissions
+    is_admin_or_guard = any(role in current_user.get("roles", []) for role in ["admin", "guard"])
+    is_host = visitor["host_household_id"] == current_user.get("household_id")
+
+    if not (is_admin_or_guard or is_host):
+        raise HTTPException(status_code=403, detail="Not authorized to view this visitor")
+
+    return visitor
+
+
+@router.get("/{visitor_id}/gate-pass", response_model=GatePassResponse)
+async def get_gate_pass(
+        visitor_id: str,
+        current_user: dict = Depends(get_current_user)
+):
+    """Signed gate pass (QR payload) of an approved visitor, for the host to share"""
+    print("Getting gate pass...")
+
+    supabase = get_supabase()
+
+    result = supabase.table("visitors").select(
+        "id, host_household_id, status, approved_at, scheduled_time"
+    ).eq("id", visitor_id).execute()
+
     if not result.data:
         raise HTTPException(status_code=404, detail="Visitor not found")
 
     visitor = result.data[0]
 
-    # Check permissions
     is_admin_or_guard = any(role in current_user.get("roles", []) for role in ["admin", "guard"])
     is_host = visitor["host_household_id"] == current_user.get("household_id")
 
     if not (is_admin_or_guard or is_host):
         raise HTTPException(status_code=403, detail="Not authorized to view this visitor")
 
-    return visitor
+    if visitor["status"] != VisitorStatus.APPROVED.value:
+        raise HTTPException(status_code=400, detail=f"No gate pass for visitor with status {visitor['status']}")
+
+    return {"visitor_id": visitor["id"], "gate_pass": gate_pass_for(visitor)}
 
 
 @router.post("/approve")
@@ -151,6 +527,7 @@ async def approve_visitor(
     }
 
     result = supabase.table("visitors").update(update_data).eq("id", approval.visitor_id).execute()
+    bump_visitors(visitor["host_household_id"])
 
     # Log event
     await log_event(
@@ -167,7 +544,12 @@ async def approve_visitor(
         f"{visitor['name']} has been approved for entry"
     )
 
-    return {"message": "Visitor approved successfully", "visitor": result.data[0]}
+    # Signed pass the visitor shows at the gate; guard devices verify it offline
+    return {
+        "message": "Visitor approved successfully",
+        "visitor": result.data[0],
+        "gate_pass": gate_pass_for(result.data[0])
+    }
 
 
 @router.post("/deny")
@@ -206,6 +588,7 @@ async def deny_visitor(
     }
 
     result = supabase.table("visitors").update(update_data).eq("id", denial.visitor_id).execute()
+    bump_visitors(visitor["host_household_id"])
 
     # Log event
     await log_event(
@@ -254,6 +637,8 @@ async def checkin_visitor(
     }
 
     result = supabase.table("visitors").update(update_data).eq("id", checkin.visitor_id).execute()
+    bump_visitors(visitor["host_household_id"])
+    occupancy.checked_in(visitor["host_household_id"])
 
     # Log event
     await log_event(
@@ -301,6 +686,8 @@ async def checkout_visitor(
     }
 
     result = supabase.table("visitors").update(update_data).eq("id", checkout.visitor_id).execute()
+    bump_visitors(visitor["host_household_id"])
+    occupancy.checked_out(visitor["host_household_id"])
 
     # Log event
     await log_event(
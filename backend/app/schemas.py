@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import Dict, Optional, List
+from datetime import date, datetime, time
 from app.models import UserRole, VisitorStatus, EventType
 
 
@@ -53,6 +53,13 @@ class HouseholdResponse(BaseModel):
     created_at: datetime
 
 
+class HouseholdListResponse(BaseModel):
+    items: List[HouseholdResponse]
+    total: int
+    offset: int
+    limit: int
+
+
 # Visitor Schemas
 class VisitorCreate(BaseModel):
     name: str
@@ -83,6 +90,26 @@ class VisitorResponse(BaseModel):
     created_at: datetime
 
 
+class VisitorImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class VisitorImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[VisitorImportRowError]
+    errors_truncated: bool = False
+
+
+class VisitorSyncResponse(BaseModel):
+    upserts: List[VisitorResponse]
+    removed: List[str]
+    cursor: str
+    has_more: bool
+    full: bool
+
+
 class VisitorApproval(BaseModel):
     visitor_id: str
 
@@ -100,6 +127,178 @@ class VisitorCheckout(BaseModel):
     visitor_id: str
 
 
+class OccupancyResponse(BaseModel):
+    # Visitors checked in and not yet checked out
+    total: int
+    by_household: Dict[str, int]
+    by_tower: Dict[str, int]
+    # Changes whenever the counts do
+    version: int
+    reconciled_at: Optional[datetime] = None
+
+
+# Gate Pass Schemas
+class GatePassResponse(BaseModel):
+    visitor_id: str
+    gate_pass: str
+
+
+class GatePassRevoke(BaseModel):
+    visitor_id: str
+    reason: Optional[str] = None
+
+
+class GateCheckin(BaseModel):
+    gate_pass: str
+    # When the device let the visitor in
+    checked_in_at: datetime
+
+
+class GateCheckinBatch(BaseModel):
+    checkins: List[GateCheckin] = Field(..., min_length=1, max_length=500)
+
+
+class GateCheckinResult(BaseModel):
+    visitor_id: Optional[str]
+    # committed, duplicate, invalid, expired, not_found or rejected
+    result: str
+    detail: Optional[str] = None
+
+
+class GateCheckinBatchResponse(BaseModel):
+    committed: int
+    results: List[GateCheckinResult]
+
+
+class GateRevocation(BaseModel):
+    visitor_id: str
+    expires_at: datetime
+
+
+class GateRevocationsResponse(BaseModel):
+    revoked: List[GateRevocation]
+
+
+# Analytics Schemas
+class VisitorStats(BaseModel):
+    created: int = 0
+    approved: int = 0
+    denied: int = 0
+    checked_in: int = 0
+    checked_out: int = 0
+    # Mean of checked_out_at - checked_in_at over the visits that ended
+    avg_dwell_seconds: Optional[float] = None
+
+
+class HourlyVisitorStats(VisitorStats):
+    bucket: datetime
+
+
+class HouseholdVisitorStats(VisitorStats):
+    host_household_id: str
+    flat_no: Optional[str] = None
+
+
+class AnalyticsHourlyResponse(BaseModel):
+    start: datetime
+    end: datetime
+    household_id: Optional[str] = None
+    items: List[HourlyVisitorStats]
+
+
+class AnalyticsHouseholdsResponse(BaseModel):
+    start: datetime
+    end: datetime
+    items: List[HouseholdVisitorStats]
+
+
+class AnalyticsSummaryResponse(BaseModel):
+    start: datetime
+    end: datetime
+    totals: VisitorStats
+    # Rollup freshness: last event (events.seq) included, and when
+    rolled_up_to_seq: int
+    rolled_up_at: Optional[datetime] = None
+
+
+# Export Schemas
+class ExportJobCreate(BaseModel):
+    kind: str = Field(..., pattern="^(visitors|events)$")
+    format: str = Field("csv", pattern="^(csv|xlsx)$")
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    household_id: Optional[str] = None
+    # Events only
+    type: Optional[str] = None
+    # Visitors only: include visitors compacted into visitors_archive
+    include_archived: bool = True
+
+
+class ExportJobResponse(BaseModel):
+    id: str
+    kind: str
+    format: str
+    filters: dict
+    # pending, running, done or failed
+    status: str
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
+    filename: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+# Recurring Pass Schemas
+class VisitorPassCreate(BaseModel):
+    name: str
+    phone: str
+    purpose: Optional[str] = None
+    # 0 = Monday ... 6 = Sunday
+    days_of_week: List[int] = Field(..., min_length=1, max_length=7)
+    start_time: time
+    end_time: time
+    valid_from: Optional[date] = None
+    valid_until: Optional[date] = None
+
+    @model_validator(mode="after")
+    def check_rule(self):
+        if any(day < 0 or day > 6 for day in self.days_of_week):
+            raise ValueError("days_of_week must be between 0 (Monday) and 6 (Sunday)")
+        self.days_of_week = sorted(set(self.days_of_week))
+        if self.start_time >= self.end_time:
+            raise ValueError("start_time must be before end_time")
+        if self.valid_from and self.valid_until and self.valid_from > self.valid_until:
+            raise ValueError("valid_from must not be after valid_until")
+        return self
+
+
+class VisitorPassResponse(BaseModel):
+    id: str
+    host_household_id: str
+    name: str
+    phone: str
+    purpose: Optional[str]
+    days_of_week: List[int]
+    start_time: time
+    end_time: time
+    valid_from: Optional[date]
+    valid_until: Optional[date]
+    active: bool
+    created_by: Optional[str]
+    created_at: datetime
+
+
+class PassCheckin(BaseModel):
+    pass_id: Optional[str] = None
+    phone: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_key(self):
+        if not self.pass_id and not self.phone:
+            raise ValueError("Provide pass_id or phone")
+        return self
+
+
 # Event Schemas
 class EventCreate(BaseModel):
     type: EventType
@@ -128,6 +327,15 @@ class ChatResponse(BaseModel):
     details: Optional[dict] = None
 
 
+# Profiler Schemas
+class ProfilerConfigUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    route: Optional[str] = None
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    max_per_minute: Optional[int] = Field(None, ge=0, le=60)
+    interval_ms: Optional[int] = Field(None, ge=1, le=1000)
+
+
 # Device Token Schema
 class DeviceTokenCreate(BaseModel):
     token: str
\ No newline at end of file
@@ -0,0 +1,356 @@
+"""
+Replication between the local SQLite database and Supabase
+
+OutboxReplicator drains the SQLite outbox to Supabase from a background
+thread. Each batch is collapsed per row: rows created locally go out as
+one bulk upsert per table; rows that were only updated go out as an
+update of just the columns the local writes set, so a change made
+centrally to another column (a resident editing the visit) survives.
+Deletes go out as at most one call per table. The batch is then
+acknowledged. A batch that fails half-way is pushed again, which is safe
+because every write is by id. While the uplink is down, entries stay in
+the outbox and the retry interval backs off, so guards keep working
+against the local copy.
+
+Every SQLITE_PULL_INTERVAL_SECONDS, once the outbox is drained, the
+replicator also pulls visitors changed or deleted centrally since the
+last pull, with the same cursor and safety lag as GET /visitors/sync.
+Rows with local writes still queued keep their local version; pushing
+those writes bumps the central row, so the next pull brings it back.
+Pulled changes invalidate the visitor reads of the households they touch
+and adjust the occupancy counter; the replicator hands them to the event
+loop, the only thread that touches the version counters.
+
+pull_snapshot() copies the directory (households, users, device tokens),
+the visitor passes and the visitors from Supabase into the local database
+for the first start of a gatehouse, without queuing them for push, and
+sets the starting point of the incremental pulls.
+
+Usage (from backend/):
+    python -m app.storage.replication pull
+    python -m app.storage.replication push
+"""
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+from app.config import get_settings
+from app.storage.sqlite import SQLiteClient, get_sqlite_client
+from app.utils.metrics import REPLICATION_PENDING, REPLICATION_ROWS, REPLICATION_FAILURES
+from app.utils.occupancy import occupancy
+from app.utils.sync import EPOCH, capped, keyset_filter, sync_horizon
+from app.utils.versions import VISITORS_SCOPE, bump, household_visitors_scope
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TABLES = ("households", "users", "device_tokens", "visitor_passes", "visitors", "gate_pass_revocations")
+PUSH_ORDER = ("households", "users", "device_tokens", "visitor_passes", "visitors", "gate_pass_revocations", "events")
+SNAPSHOT_PAGE_SIZE = 1000
+MAX_BACKOFF_SECONDS = 60
+# Set by a trigger on the central database; pushing the gate's value would
+# put the row behind the sync cursors there
+SERVER_COLUMNS = {"visitors": {"updated_at"}}
+PULL_CURSOR = "visitors_cursor"
+
+
+def _remote_client():
+    from app.database import get_remote_supabase
+    return get_remote_supabase(service=True)
+
+
+def push_once(local: SQLiteClient, remote, batch_size: int) -> int:
+    """Push up to batch_size outbox entries; returns how many were acknowledged"""
+    conn = local.connection()
+    entries = conn.execute(
+        "SELECT seq, table_name, operation, row_id, payload, changed_columns FROM outbox ORDER BY seq LIMIT ?",
+        (batch_size,)
+    ).fetchall()
+    if not entries:
+        return 0
+
+    # Per row: the last version, and the columns set since the row was
+    # last written whole (None: created here, push the whole row)
+    latest = {}
+    for entry in entries:
+        key = (entry["table_name"], entry["row_id"])
+        if entry["operation"] == "delete":
+            latest[key] = ("delete", None, None)
+            continue
+        changed = json.loads(entry["changed_columns"]) if entry["changed_columns"] else None
+        previous = latest.get(key)
+        if changed is not None and previous is not None and previous[0] == "upsert":
+            changed = None if previous[2] is None else previous[2] | set(changed)
+        elif changed is not None:
+            changed = set(changed)
+        latest[key] = ("upsert", json.loads(entry["payload"]), changed)
+
+    # Parents first for writes, children first for deletes
+    for table in PUSH_ORDER:
+        server_columns = SERVER_COLUMNS.get(table, set())
+        rows = [
+            {column: value for column, value in row.items() if column not in server_columns}
+            for (t, _), (operation, row, changed) in latest.items()
+            if t == table and operation == "upsert" and changed is None
+        ]
+        if rows:
+            remote.table(table).upsert(rows, on_conflict="id").execute()
+            REPLICATION_ROWS.inc(table, "upsert", amount=len(rows))
+        for (t, row_id), (operation, row, changed) in latest.items():
+            if t == table and operation == "upsert" and changed is not None:
+                values = {column: row[column] for column in changed - server_columns - {"id"}}
+                if values:
+                    remote.table(table).update(values).eq("id", row_id).execute()
+                    REPLICATION_ROWS.inc(table, "update")
+    for table in reversed(PUSH_ORDER):
+        ids = [row_id for (t, row_id), (operation, _, _) in latest.items() if t == table and operation == "delete"]
+        if ids:
+            remote.table(table).delete().in_("id", ids).execute()
+            REPLICATION_ROWS.inc(table, "delete", amount=len(ids))
+
+    with conn:
+        conn.execute("DELETE FROM outbox WHERE seq <= ?", (entries[-1]["seq"],))
+    return len(entries)
+
+
+def pending(local: SQLiteClient) -> int:
+    return local.connection().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+
+def oldest_pending_age(local: SQLiteClient) -> float:
+    """Seconds since the oldest entry still in the outbox was written (0 when empty)"""
+    oldest = local.connection().execute("SELECT MIN(created_at) FROM outbox").fetchone()[0]
+    return max(0.0, time.time() - oldest) if oldest is not None else 0.0
+
+
+def read_cursor(local: SQLiteClient) -> Optional[dict]:
+    """Position of the incremental visitor pulls, or None before the first snapshot"""
+    row = local.connection().execute("SELECT value FROM replication_state WHERE name = ?", (PULL_CURSOR,)).fetchone()
+    return json.loads(row["value"]) if row is not None else None
+
+
+def _write_cursor(local: SQLiteClient, cursor: dict):
+    conn = local.connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO replication_state (name, value) VALUES (?, ?)", (PULL_CURSOR, json.dumps(cursor))
+        )
+
+
+def apply_pulled(changes: Dict[str, int]):
+    """
+    Invalidate visitor reads and adjust occupancy after a pull (on the event loop thread)
+
+    Args:
+        changes: Change in checked-in visitors per household touched by the pull
+    """
+    if not changes:
+        return
+    bump(VISITORS_SCOPE, *(household_visitors_scope(household_id) for household_id in changes if household_id))
+    for household_id, inside in changes.items():
+        if inside > 0:
+            occupancy.checked_in(household_id, inside)
+        elif inside < 0:
+            occupancy.checked_out(household_id, -inside)
+
+
+def pull_changes(local: SQLiteClient, remote, batch_size: int,
+                 on_pulled: Callable[[Dict[str, int]], None] = apply_pulled) -> int:
+    """
+    Apply up to batch_size visitors changed and deleted centrally since the last pull
+
+    Args:
+        local: Gate-local database
+        remote: Supabase client
+        batch_size: Most changed rows and tombstones to read
+        on_pulled: Called with the change in checked-in visitors per household
+            the pull touched (by default it invalidates their visitor reads)
+
+    Returns:
+        The larger of the two counts, so a full batch means there may be more
+    """
+    cursor = read_cursor(local) or {"u": EPOCH, "i": "", "t": EPOCH, "ti": ""}
+    horizon = sync_horizon(get_settings().sync_safety_lag_seconds)
+
+    changed = remote.table("visitors").select("*").or_(
+        keyset_filter("updated_at", cursor["u"], "id", cursor.get("i"))
+    ).lt("updated_at", horizon).order("updated_at").order("id").limit(batch_size).execute().data
+    tombstones = remote.table("visitor_tombstones").select("visitor_id, deleted_at").or_(
+        keyset_filter("deleted_at", cursor["t"], "visitor_id", cursor.get("ti"))
+    ).lt("deleted_at", horizon).order("deleted_at").order("visitor_id").limit(batch_size).execute().data
+
+    # Local writes not pushed yet win; pushing them bumps the central row again
+    queued = {
+        row["row_id"] for row in local.connection().execute(
+            "SELECT DISTINCT row_id FROM outbox WHERE table_name = 'visitors'"
+        )
+    }
+    columns = local.columns("visitors")
+    rows = [{k: v for k, v in row.items() if k in columns} for row in changed if row["id"] not in queued]
+    deleted = [row["visitor_id"] for row in tombstones]
+    changes = _household_changes(local, rows, deleted)
+    if rows:
+        local.table("visitors").upsert(rows, on_conflict="id").execute(replicate=False)
+    if tombstones:
+        local.table("visitors").delete().in_("id", deleted).execute(replicate=False)
+
+    if changed:
+        cursor["u"], cursor["i"] = changed[-1]["updated_at"], changed[-1]["id"]
+    if tombstones:
+        cursor["t"], cursor["ti"] = tombstones[-1]["deleted_at"], tombstones[-1]["visitor_id"]
+    if changed or tombstones:
+        _write_cursor(local, cursor)
+    if changes:
+        on_pulled(changes)
+    return max(len(changed), len(tombstones))
+
+
+def _household_changes(local: SQLiteClient, rows: list, deleted: list) -> Dict[str, int]:
+    """Households whose visitors `rows` and `deleted` change, with the change in checked-in visitors"""
+    ids = [row["id"] for row in rows] + deleted
+    if not ids:
+        return {}
+    before = {
+        row["id"]: row for row in local.connection().execute(
+            f"SELECT id, host_household_id, status FROM visitors WHERE id IN ({','.join('?' * len(ids))})", ids
+        )
+    }
+    changes = defaultdict(int)
+    for visitor_id, row in [(row["id"], row) for row in rows] + [(visitor_id, None) for visitor_id in deleted]:
+        old = before.get(visitor_id)
+        if old is not None:
+            changes[old["host_household_id"]] -= old["status"] == "checked_in"
+        if row is not None:
+            changes[row["host_household_id"]] += row["status"] == "checked_in"
+    return dict(changes)
+
+
+class OutboxReplicator(threading.Thread):
+    def __init__(self, local: SQLiteClient, interval: float, batch_size: int, remote_factory=_remote_client,
+                 pull_interval: float = 30.0, loop: Optional[asyncio.AbstractEventLoop] = None):
+        super().__init__(name="sqlite-replicator", daemon=True)
+        self.local = local
+        self.interval = interval
+        self.batch_size = batch_size
+        self.remote_factory = remote_factory
+        self.pull_interval = pull_interval
+        # Event loop serving requests, where pulled changes invalidate cached reads
+        self.loop = loop
+        self._next_pull = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        remote = None
+        delay = self.interval
+        while not self._stop_event.wait(delay):
+            try:
+                remote = remote or self.remote_factory()
+                # Drain everything that is queued before sleeping again
+                while push_once(self.local, remote, self.batch_size) == self.batch_size:
+                    if self._stop_event.is_set():
+                        break
+                if time.monotonic() >= self._next_pull and not pending(self.local):
+                    while pull_changes(self.local, remote, self.batch_size, self._on_pulled) == self.batch_size:
+                        if self._stop_event.is_set():
+                            break
+                    self._next_pull = time.monotonic() + self.pull_interval
+                delay = self.interval
+            except Exception as e:
+                REPLICATION_FAILURES.inc()
+                remote = None
+                delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+                logger.warning(f"Replication to Supabase failed, retrying in {delay:.0f}s: {str(e)}")
+            finally:
+                REPLICATION_PENDING.set(pending(self.local))
+
+    def _on_pulled(self, changes: Dict[str, int]):
+        if self.loop is None:
+            apply_pulled(changes)
+        else:
+            # Version counters are only touched on the event loop thread
+            self.loop.call_soon_threadsafe(apply_pulled, changes)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def start_replicator() -> OutboxReplicator:
+    settings = get_settings()
+    replicator = OutboxReplicator(
+        get_sqlite_client(),
+        interval=settings.sqlite_replication_interval_seconds,
+        batch_size=settings.sqlite_replication_batch_size,
+        pull_interval=settings.sqlite_pull_interval_seconds,
+        loop=asyncio.get_running_loop(),
+    )
+    replicator.start()
+    return replicator
+
+
+def pull_snapshot(local: SQLiteClient, remote, tables=SNAPSHOT_TABLES) -> dict:
+    """Copy `tables` from Supabase into the local database; returns row counts"""
+    cursor = None
+    if "visitors" in tables:
+        # Taken before copying, so changes made meanwhile come with the first incremental pull
+        horizon = sync_horizon(get_settings().sync_safety_lag_seconds)
+        latest_visitor = remote.table("visitors").select("updated_at").order(
+            "updated_at", desc=True
+        ).limit(1).execute().data
+        latest_tombstone = remote.table("visitor_tombstones").select("deleted_at").order(
+            "deleted_at", desc=True
+        ).limit(1).execute().data
+        cursor = {
+            "u": capped(latest_visitor[0]["updated_at"] if latest_visitor else None, horizon),
+            "i": "",
+            "t": capped(latest_tombstone[0]["deleted_at"] if latest_tombstone else None, horizon),
+            "ti": ""
+        }
+
+    counts = {}
+    for table in tables:
+        counts[table] = 0
+        start = 0
+        while True:
+            page = remote.table(table).select("*").order("id").range(
+                start, start + SNAPSHOT_PAGE_SIZE - 1
+            ).execute().data
+            if page:
+                columns = local.columns(table)
+                rows = [{k: v for k, v in row.items() if k in columns} for row in page]
+                local.table(table).upsert(rows, on_conflict="id").execute(replicate=False)
+                counts[table] += len(rows)
+            if len(page) < SNAPSHOT_PAGE_SIZE:
+                break
+            start += SNAPSHOT_PAGE_SIZE
+    if cursor is not None:
+        _write_cursor(local, cursor)
+    return counts
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    local = get_sqlite_client()
+    if command == "pull":
+        counts = pull_snapshot(local, _remote_client())
+        print("✅ Pulled " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    elif command == "push":
+        total = 0
+        batch_size = get_settings().sqlite_replication_batch_size
+        remote = _remote_client()
+        while True:
+            pushed = push_once(local, remote, batch_size)
+            total += pushed
+            if pushed < batch_size:
+                break
+        print(f"✅ Pushed {total} outbox entries, {pending(local)} pending")
+    else:
+        print("Usage: python -m app.storage.replication pull|push")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
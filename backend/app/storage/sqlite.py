@@ -0,0 +1,608 @@
+"""
+Embedded SQLite storage backend
+
+SQLiteClient implements the part of the supabase-py query builder the app
+uses (table().select().eq()...execute(), insert/upsert/update/delete, or_
+filters, ordering and limits), so routers and chat tools run unchanged
+against a local database file. The database runs in WAL mode, so reads
+never wait for the writer.
+
+Every write to a replicated table also appends the written rows to an
+outbox table in the same transaction, along with the columns an update
+set. app.storage.replication drains the outbox to Supabase in the
+background.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from app.config import get_settings
+from app.utils.metrics import DB_REQUESTS, DB_REQUEST_DURATION, DB_ROWS
+from app.utils.tracing import record_db_call
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS households (
+    id TEXT PRIMARY KEY,
+    flat_no TEXT NOT NULL,
+    name TEXT,
+    members TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_households_flat_no ON households (flat_no);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    phone TEXT,
+    display_name TEXT,
+    household_id TEXT,
+    roles TEXT NOT NULL DEFAULT '["resident"]',
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_household_id ON users (household_id);
+
+CREATE TABLE IF NOT EXISTS visitors (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT,
+    purpose TEXT,
+    host_household_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    approved_by TEXT,
+    approved_at TEXT,
+    checked_in_at TEXT,
+    checked_out_at TEXT,
+    scheduled_time TEXT,
+    pass_id TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_visitors_status_created_at ON visitors (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_visitors_household_created_at ON visitors (host_household_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_visitors_created_at ON visitors (created_at);
+CREATE INDEX IF NOT EXISTS idx_visitors_updated_at_id ON visitors (updated_at, id);
+
+-- Filled by the retention compaction on the central database; kept here
+-- so GET /visitors/{id} can fall back to it on either backend
+CREATE TABLE IF NOT EXISTS visitors_archive (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT,
+    purpose TEXT,
+    host_household_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    approved_by TEXT,
+    approved_at TEXT,
+    checked_in_at TEXT,
+    checked_out_at TEXT,
+    scheduled_time TEXT,
+    pass_id TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    archived_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS visitor_passes (
+    id TEXT PRIMARY KEY,
+    host_household_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    purpose TEXT,
+    days_of_week TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    valid_from TEXT,
+    valid_until TEXT,
+    active INTEGER NOT NULL DEFAULT 1,
+    created_by TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_visitor_passes_household ON visitor_passes (host_household_id);
+
+CREATE TABLE IF NOT EXISTS gate_pass_revocations (
+    id TEXT PRIMARY KEY,
+    visitor_id TEXT NOT NULL UNIQUE,
+    host_household_id TEXT NOT NULL,
+    revoked_by TEXT,
+    reason TEXT,
+    expires_at TEXT NOT NULL,
+    revoked_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_gate_pass_revocations_expires_at ON gate_pass_revocations (expires_at);
+
+CREATE TABLE IF NOT EXISTS visitor_tombstones (
+    visitor_id TEXT PRIMARY KEY,
+    host_household_id TEXT,
+    deleted_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_visitor_tombstones_deleted_at ON visitor_tombstones (deleted_at, visitor_id);
+
+CREATE TRIGGER IF NOT EXISTS visitors_record_tombstone
+AFTER DELETE ON visitors
+BEGIN
+    INSERT OR REPLACE INTO visitor_tombstones (visitor_id, host_household_id, deleted_at)
+    VALUES (OLD.id, OLD.host_household_id, strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'));
+END;
+
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    actor_user_id TEXT,
+    subject_id TEXT,
+    payload TEXT,
+    occurred_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_occurred_at ON events (occurred_at);
+
+CREATE TABLE IF NOT EXISTS device_tokens (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    token TEXT NOT NULL UNIQUE,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_device_tokens_user_id ON device_tokens (user_id);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    payload TEXT,
+    changed_columns TEXT,
+    created_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+);
+
+-- Replication positions, e.g. the visitors sync cursor of incremental pulls
+CREATE TABLE IF NOT EXISTS replication_state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Columns added after their table was first released, for older database files
+ADDED_COLUMNS = {
+    "visitors": {"pass_id": "TEXT"},
+    "outbox": {"changed_columns": "TEXT"},
+}
+
+# Schema that depends on ADDED_COLUMNS
+SCHEMA_AFTER_COLUMNS = """
+-- A pass holder can only be inside once at a time
+CREATE UNIQUE INDEX IF NOT EXISTS idx_visitors_pass_checked_in
+    ON visitors (pass_id) WHERE status = 'checked_in';
+"""
+
+# Columns stored as JSON text (arrays / jsonb in Postgres)
+JSON_COLUMNS = {
+    "households": {"members"},
+    "users": {"roles"},
+    "events": {"payload"},
+    "visitor_passes": {"days_of_week"},
+}
+
+# Column filled with the current time on insert when not provided
+TIMESTAMP_DEFAULTS = {
+    "households": ("created_at", "updated_at"),
+    "users": ("created_at", "updated_at"),
+    "visitors": ("created_at", "updated_at"),
+    "visitor_passes": ("created_at", "updated_at"),
+    "gate_pass_revocations": ("revoked_at",),
+    "events": ("occurred_at",),
+    "device_tokens": ("created_at",),
+}
+
+# visitor_tombstones is written by a trigger on both sides, so it is not replicated
+REPLICATED_TABLES = {
+    "households", "users", "visitor_passes", "visitors", "gate_pass_revocations", "events", "device_tokens"
+}
+
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# LIKE pattern characters as GLOB: wildcards translated, GLOB metacharacters matched literally
+GLOB_ESCAPES = {"%": "*", "_": "?", "*": "[*]", "?": "[?]", "[": "[[]"}
+
+
+class StorageError(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _identifier(name: str) -> str:
+    name = name.strip()
+    if not IDENTIFIER.match(name):
+        raise StorageError(f"Invalid column name: {name!r}")
+    return f'"{name}"'
+
+
+def _unquote(value):
+    if isinstance(value, str) and len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _bind(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _split_top_level(expression: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in expression:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _condition(column: str, op: str, value) -> Tuple[str, list]:
+    """SQL for one PostgREST filter"""
+    if op.startswith("not."):
+        sql, params = _condition(column, op[4:], value)
+        return f"NOT ({sql})", params
+
+    col = _identifier(column)
+    simple = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+    if op in simple:
+        return f"{col} {simple[op]} ?", [_bind(_unquote(value))]
+    if op == "like":
+        # LIKE is case-insensitive in SQLite; GLOB is the case-sensitive match.
+        # GLOB's own wildcards are literals in a LIKE pattern
+        pattern = "".join(GLOB_ESCAPES.get(ch, ch) for ch in str(value))
+        return f"{col} GLOB ?", [pattern]
+    if op == "ilike":
+        return f"{col} LIKE ?", [str(value)]
+    if op == "in":
+        values = value
+        if isinstance(value, str):
+            values = [_unquote(v) for v in _split_top_level(value.strip("()"))]
+        values = list(values)
+        if not values:
+            return "0", []
+        return f"{col} IN ({', '.join('?' for _ in values)})", [_bind(v) for v in values]
+    if op == "is":
+        if value in (None, "null"):
+            return f"{col} IS NULL", []
+        return f"{col} IS ?", [1 if value in (True, "true") else 0]
+    if op == "cs":
+        wanted = value.strip("{}").split(",") if isinstance(value, str) else list(value)
+        wanted = [_unquote(item) for item in wanted if item]
+        if not wanted:
+            return "1", []
+        return " AND ".join(
+            f"EXISTS (SELECT 1 FROM json_each({col}) WHERE value = ?)" for _ in wanted
+        ), wanted
+    raise StorageError(f"Filter operator '{op}' is not supported by the SQLite backend")
+
+
+def _logic_tree(expression: str, joiner: str) -> Tuple[str, list]:
+    """SQL for a PostgREST logic tree such as `a.gt.1,and(a.eq.1,b.gt.2)`"""
+    clauses, params = [], []
+    for part in _split_top_level(expression):
+        part = part.strip()
+        if part.startswith("and("):
+            sql, values = _logic_tree(part[4:-1], "AND")
+        elif part.startswith("or("):
+            sql, values = _logic_tree(part[3:-1], "OR")
+        else:
+            column, rest = part.split(".", 1)
+            if rest.startswith("not."):
+                op, value = rest[4:].split(".", 1)
+                op = f"not.{op}"
+            else:
+                op, value = rest.split(".", 1)
+            sql, values = _condition(column, op, value)
+        clauses.append(f"({sql})")
+        params.extend(values)
+    return f" {joiner} ".join(clauses), params
+
+
+class SQLiteResponse:
+    def __init__(self, data: list, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class SQLiteQuery:
+    def __init__(self, client: "SQLiteClient", table: str):
+        self.client = client
+        self.table_name = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = "id"
+        self.where = []
+        self.params = []
+        self.orders = []
+        self.limit_count = None
+        self.offset = 0
+
+    # Operations
+    def select(self, columns: str = "*", count=None, head=None):
+        self.operation = "select"
+        self.columns = columns
+        return self
+
+    def insert(self, data, **kwargs):
+        self.operation = "insert"
+        self.payload = data
+        return self
+
+    def upsert(self, data, on_conflict: str = "id", **kwargs):
+        self.operation = "upsert"
+        self.payload = data
+        self.on_conflict = on_conflict or "id"
+        return self
+
+    def update(self, data, **kwargs):
+        self.operation = "update"
+        self.payload = data
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    # Filters
+    def _add(self, column, op, value):
+        sql, params = _condition(column, op, value)
+        self.where.append(sql)
+        self.params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._add(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._add(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._add(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._add(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._add(column, "lte", value)
+
+    def like(self, column, pattern):
+        return self._add(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._add(column, "ilike", pattern)
+
+    def in_(self, column, values):
+        return self._add(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._add(column, "is", value)
+
+    def contains(self, column, value):
+        return self._add(column, "cs", value)
+
+    def filter(self, column, operator, criteria):
+        return self._add(column, operator, criteria)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        sql, params = _logic_tree(filters, "OR")
+        self.where.append(sql)
+        self.params.extend(params)
+        return self
+
+    # Modifiers
+    def order(self, column, desc: bool = False, **kwargs):
+        self.orders.append(f"{_identifier(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self.limit_count = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self.offset = start
+        self.limit_count = end - start + 1
+        return self
+
+    # Execution
+    def _where_sql(self) -> str:
+        return f" WHERE {' AND '.join(f'({clause})' for clause in self.where)}" if self.where else ""
+
+    def _select(self, conn) -> list:
+        columns = self.columns.replace(" ", "")
+        if columns == "count":
+            row = conn.execute(
+                f'SELECT COUNT(*) FROM "{self.table_name}"{self._where_sql()}', self.params
+            ).fetchone()
+            return [{"count": row[0]}]
+        projection = "*" if columns in ("*", "") else ", ".join(_identifier(c) for c in columns.split(","))
+        sql = f'SELECT {projection} FROM "{self.table_name}"{self._where_sql()}'
+        if self.orders:
+            sql += f" ORDER BY {', '.join(self.orders)}"
+        if self.limit_count is not None or self.offset:
+            sql += f" LIMIT {int(self.limit_count if self.limit_count is not None else -1)} OFFSET {int(self.offset)}"
+        return self.client.decode_rows(self.table_name, conn.execute(sql, self.params))
+
+    def _write(self, conn) -> list:
+        table = self.table_name
+        if self.operation in ("insert", "upsert"):
+            records = self.payload if isinstance(self.payload, list) else [self.payload]
+            written = []
+            for record in records:
+                row = self.client.with_defaults(table, record)
+                columns = list(row)
+                sql = (
+                    f'INSERT INTO "{table}" ({", ".join(_identifier(c) for c in columns)}) '
+                    f'VALUES ({", ".join("?" for _ in columns)})'
+                )
+                if self.operation == "upsert":
+                    conflict = [_identifier(c) for c in self.on_conflict.split(",")]
+                    updates = [c for c in record if c not in self.on_conflict.split(",") and c != "id"]
+                    if "updated_at" in self.client.columns(table) and "updated_at" not in record:
+                        updates.append("updated_at")
+                    assignments = ", ".join(f"{_identifier(c)} = excluded.{_identifier(c)}" for c in updates)
+                    sql += f" ON CONFLICT ({', '.join(conflict)}) " + (
+                        f"DO UPDATE SET {assignments}" if assignments else "DO NOTHING"
+                    )
+                sql += " RETURNING *"
+                written.extend(self.client.decode_rows(table, conn.execute(sql, [_bind(row[c]) for c in columns])))
+            return written
+
+        if self.operation == "update":
+            values = dict(self.payload)
+            if "updated_at" in self.client.columns(table) and "updated_at" not in values:
+                values["updated_at"] = _now()
+            assignments = ", ".join(f"{_identifier(c)} = ?" for c in values)
+            sql = f'UPDATE "{table}" SET {assignments}{self._where_sql()} RETURNING *'
+            return self.client.decode_rows(
+                table, conn.execute(sql, [_bind(v) for v in values.values()] + self.params)
+            )
+
+        if self.operation == "delete":
+            sql = f'DELETE FROM "{table}"{self._where_sql()} RETURNING *'
+            return self.client.decode_rows(table, conn.execute(sql, self.params))
+
+        raise StorageError(f"Unknown operation {self.operation}")
+
+    def execute(self, replicate: bool = True) -> SQLiteResponse:
+        started = time.perf_counter()
+        status_code = 200
+        data = []
+        try:
+            conn = self.client.connection()
+            if self.operation == "select":
+                data = self._select(conn)
+            else:
+                with conn:
+                    data = self._write(conn)
+                    if replicate and self.table_name in REPLICATED_TABLES:
+                        changed = list(self.payload) if self.operation == "update" else None
+                        self.client.enqueue(conn, self.table_name, self.operation, data, changed)
+            return SQLiteResponse(data=data, count=len(data))
+        except sqlite3.Error as e:
+            status_code = 500
+            raise StorageError(f"SQLite {self.operation} on {self.table_name} failed: {str(e)}") from e
+        finally:
+            elapsed = time.perf_counter() - started
+            DB_REQUESTS.inc(self.table_name, self.operation, str(status_code))
+            DB_REQUEST_DURATION.observe(elapsed, self.table_name, self.operation)
+            DB_ROWS.inc(self.table_name, self.operation, amount=len(data))
+            record_db_call(self.table_name, self.operation, elapsed, len(data), status_code)
+
+
+class SQLiteClient:
+    """Drop-in for the supabase-py Client, backed by one SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._columns = {}
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        for table, added in ADDED_COLUMNS.items():
+            existing = {row["name"] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+            for column, column_type in added.items():
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {column_type}')
+        conn.executescript(SCHEMA_AFTER_COLUMNS)
+
+    def connection(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers run alongside the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable across application crashes; a power loss may drop the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+        return conn
+
+    def columns(self, table: str) -> set:
+        if table not in self._columns:
+            rows = self.connection().execute(f'PRAGMA table_info("{table}")').fetchall()
+            if not rows:
+                raise StorageError(f"Unknown table: {table}")
+            self._columns[table] = {row["name"] for row in rows}
+        return self._columns[table]
+
+    def with_defaults(self, table: str, record: dict) -> dict:
+        row = dict(record)
+        columns = self.columns(table)
+        if "id" in columns:
+            row.setdefault("id", str(uuid.uuid4()))
+        now = _now()
+        for column in TIMESTAMP_DEFAULTS.get(table, ()):
+            row.setdefault(column, now)
+        return row
+
+    def decode_rows(self, table: str, cursor) -> list:
+        json_columns = JSON_COLUMNS.get(table, ())
+        rows = []
+        for row in cursor:
+            data = dict(row)
+            for column in json_columns:
+                if isinstance(data.get(column), str):
+                    data[column] = json.loads(data[column])
+            rows.append(data)
+        return rows
+
+    def enqueue(self, conn, table: str, operation: str, rows: list, changed: Optional[List[str]] = None):
+        """
+        Record written rows for replication (inside the write's transaction)
+
+        `changed` lists the columns an update set; the push sends only those,
+        so it does not overwrite other columns changed centrally meanwhile.
+        """
+        kind = "delete" if operation == "delete" else "upsert"
+        conn.executemany(
+            "INSERT INTO outbox (table_name, operation, row_id, payload, changed_columns) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    table, kind, row["id"], None if kind == "delete" else json.dumps(row),
+                    json.dumps(changed) if changed is not None else None
+                )
+                for row in rows
+            ]
+        )
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs):
+        raise StorageError(f"RPC '{fn}' is not available on the SQLite backend")
+
+
+@lru_cache()
+def get_sqlite_client() -> SQLiteClient:
+    return SQLiteClient(get_settings().sqlite_path)
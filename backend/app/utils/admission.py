@@ -0,0 +1,191 @@
+"""
+Priority-aware admission control
+
+Every request is put in a lane before it reaches the app:
+
+    priority  gate check-in/check-out; never rate limited, and the last
+              ADMISSION_PRIORITY_RESERVED of ADMISSION_MAX_CONCURRENT slots
+              are kept for it
+    llm       /chat; at most ADMISSION_LLM_MAX_CONCURRENT at a time, and
+              shed first: refused once ADMISSION_LLM_SHED_AT of the shared
+              slots are busy
+    default   everything else, up to the shared slots
+
+Callers (the token's user, or the client address without one) also get a
+token bucket per lane, ADMISSION_USER_RATE / ADMISSION_LLM_USER_RATE
+requests per second with a burst allowance. A refused request gets a 429
+with Retry-After and is counted in admission_shed_total.
+
+Limits are per worker process; the state is only touched from the event
+loop, so it needs no lock.
+"""
+import math
+import time
+from typing import Dict, Optional, Tuple
+from fastapi.responses import JSONResponse
+from app.auth import decode_token
+from app.config import get_settings
+from app.utils.metrics import ADMISSION_IN_FLIGHT, ADMISSION_SHED
+
+PRIORITY = "priority"
+LLM = "llm"
+DEFAULT = "default"
+LANES = (PRIORITY, LLM, DEFAULT)
+
+PRIORITY_ROUTES = {
+    ("POST", "/visitors/checkin"),
+    ("POST", "/visitors/checkout"),
+    ("POST", "/passes/checkin"),
+    ("POST", "/gate/checkins"),
+}
+LLM_PREFIXES = ("/chat",)
+# Probes, and streams that mostly sit idle while open
+EXEMPT_PREFIXES = ("/health", "/metrics", "/visitors/occupancy/stream")
+
+# Idle buckets are dropped once there are this many
+MAX_BUCKETS = 10000
+
+
+def lane_for(method: str, path: str) -> Optional[str]:
+    """The request's lane, or None when it bypasses admission control"""
+    if path.startswith(EXEMPT_PREFIXES) or method == "OPTIONS":
+        return None
+    if (method, path.rstrip("/")) in PRIORITY_ROUTES:
+        return PRIORITY
+    if path.startswith(LLM_PREFIXES):
+        return LLM
+    return DEFAULT
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, rate: float, burst: float, now: float):
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """Take a token; returns 0, or the seconds until one is available"""
+        self.refill(rate, burst, now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class Admission:
+    def __init__(self):
+        self.settings = get_settings()
+        self.in_flight: Dict[str, int] = dict.fromkeys(LANES, 0)
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def _limits(self, lane: str) -> Tuple[float, float]:
+        if lane == LLM:
+            return self.settings.admission_llm_user_rate, self.settings.admission_llm_user_burst
+        return self.settings.admission_user_rate, self.settings.admission_user_burst
+
+    def _prune(self, now: float):
+        for key, bucket in list(self.buckets.items()):
+            rate, burst = self._limits(key[1])
+            bucket.refill(rate, burst, now)
+            if bucket.tokens >= burst:
+                del self.buckets[key]
+        if len(self.buckets) >= MAX_BUCKETS:
+            # Every client is active: start over rather than grow without bound
+            self.buckets.clear()
+
+    def rate_limit(self, client: str, lane: str) -> float:
+        """Charge one request to the client's bucket for the lane; returns the wait if it is empty"""
+        if lane == PRIORITY:
+            return 0.0
+        rate, burst = self._limits(lane)
+        now = time.monotonic()
+        bucket = self.buckets.get((client, lane))
+        if bucket is None:
+            if len(self.buckets) >= MAX_BUCKETS:
+                self._prune(now)
+            bucket = self.buckets[(client, lane)] = TokenBucket(burst, now)
+        return bucket.take(rate, burst, now)
+
+    def try_acquire(self, lane: str) -> bool:
+        """Take a concurrency slot for the lane if one is free"""
+        busy = sum(self.in_flight.values())
+        shared = self.settings.admission_max_concurrent - self.settings.admission_priority_reserved
+        if lane == PRIORITY:
+            admitted = busy < self.settings.admission_max_concurrent
+        elif lane == LLM:
+            admitted = (
+                self.in_flight[LLM] < self.settings.admission_llm_max_concurrent
+                and busy < shared * self.settings.admission_llm_shed_at
+            )
+        else:
+            admitted = busy < shared
+        if admitted:
+            self.in_flight[lane] += 1
+            ADMISSION_IN_FLIGHT.inc(lane)
+        return admitted
+
+    def release(self, lane: str):
+        self.in_flight[lane] -= 1
+        ADMISSION_IN_FLIGHT.dec(lane)
+
+    def clear(self):
+        self.buckets.clear()
+
+
+admission = Admission()
+
+
+def client_key(scope) -> str:
+    """The token's user id, or the client address for anonymous and invalid tokens"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            claims = decode_token(token) if scheme.lower() == "bearer" else None
+            if claims and claims.get("sub"):
+                return f"user:{claims['sub']}"
+            break
+    client = scope.get("client")
+    return f"addr:{client[0] if client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the lanes, slots and buckets above"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        settings = get_settings()
+        if scope["type"] != "http" or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+        lane = lane_for(scope["method"], scope["path"])
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = admission.rate_limit(client_key(scope), lane)
+        if wait:
+            await self._shed(scope, receive, send, lane, "rate_limited", wait)
+            return
+        if not admission.try_acquire(lane):
+            await self._shed(scope, receive, send, lane, "overloaded", settings.admission_retry_after_seconds)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(lane)
+
+    async def _shed(self, scope, receive, send, lane: str, reason: str, retry_after: float):
+        ADMISSION_SHED.inc(lane, reason)
+        detail = "Too many requests" if reason == "rate_limited" else "Server is busy, please retry"
+        response = JSONResponse(
+            {"detail": detail}, status_code=429, headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        await response(scope, receive, send)
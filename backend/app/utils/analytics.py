@@ -0,0 +1,365 @@
+"""
+Hourly visitor traffic rollups
+
+visitor_stats_hourly (migrations/005_visitor_analytics.sql) counts, per UTC
+hour and host household, the visitors created, approved, denied, checked in
+and checked out, plus the summed dwell time of the visits that ended. The
+/analytics endpoints read only this table.
+
+AnalyticsRollup keeps it current from the audit log: every
+ANALYTICS_ROLLUP_INTERVAL_SECONDS it reads the events after the watermark
+(events.seq, so events replicated late from a gate still count), looks up
+their visitors in one query, and adds the per-hour deltas with the
+apply_visitor_stats RPC, which moves the watermark in the same transaction.
+Events inserted in the last ANALYTICS_ROLLUP_LAG_SECONDS are left for the
+next run, since a transaction still in flight may yet commit a lower seq.
+Only the worker holding the job's lease (app.utils.leases) rolls up, which
+also keeps the non-atomic client-side fallback to one writer.
+
+backfill() rebuilds the table from the timestamps of every visitor, the
+compacted ones in visitors_archive included, with one GROUP BY in the
+database (backfill_visitor_stats), or in a single pass here when the RPC
+is missing:
+
+    python -m app.utils.analytics backfill
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.database import fetch_all, get_supabase
+from app.models import EventType
+from app.utils.leases import acquire_lease
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "visitor_stats"
+LEASE = "visitor_stats"
+COUNTERS = ("created", "approved", "denied", "checked_in", "checked_out")
+# Visitor ids per `in` filter, to keep request URLs short
+LOOKUP_CHUNK = 200
+# After an RPC fails, use the client-side path for this long before trying it again
+RPC_RETRY_SECONDS = 300.0
+
+# Counters an event adds to, and the visitor column holding the time of the
+# transition (offline check-ins are uploaded well after they happen)
+TRANSITIONS = {
+    EventType.VISITOR_CREATED.value: (("created", "created_at"),),
+    EventType.VISITOR_APPROVED.value: (("approved", "approved_at"),),
+    EventType.VISITOR_DENIED.value: (("denied", "approved_at"),),
+    EventType.VISITOR_CHECKED_IN.value: (("checked_in", "checked_in_at"),),
+    EventType.VISITOR_CHECKED_OUT.value: (("checked_out", "checked_out_at"),),
+}
+# A pass holder's check-in creates an already approved visitor
+PASS_CHECKIN = (("created", "created_at"), ("approved", "approved_at"), ("checked_in", "checked_in_at"))
+
+VISITOR_COLUMNS = "id, host_household_id, status, created_at, approved_at, checked_in_at, checked_out_at"
+
+_rpc_unavailable_until = 0.0
+
+Key = Tuple[str, str]
+
+
+def _parse(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed is not None and parsed.tzinfo is None:
+        # Naive timestamps in this app are UTC (datetime.utcnow())
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def hour_bucket(value) -> str:
+    """Start of the UTC hour a timestamp falls in, as ISO 8601"""
+    return _parse(value).astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0).isoformat()
+
+
+def dwell_seconds(visitor: dict) -> int:
+    checked_in, checked_out = _parse(visitor.get("checked_in_at")), _parse(visitor.get("checked_out_at"))
+    if checked_in is None or checked_out is None:
+        return 0
+    return max(int((checked_out - checked_in).total_seconds()), 0)
+
+
+def _rows(totals: Dict[Key, List[int]]) -> List[dict]:
+    return [
+        {"bucket": bucket, "host_household_id": household_id, **dict(zip(COUNTERS, values[:-1])),
+         "dwell_seconds": values[-1]}
+        for (bucket, household_id), values in totals.items()
+    ]
+
+
+def _add(totals: Dict[Key, List[int]], at, household_id: str, counter: str, dwell: int = 0):
+    values = totals[(hour_bucket(at), household_id)]
+    values[COUNTERS.index(counter)] += 1
+    values[-1] += dwell
+
+
+def _new_totals() -> Dict[Key, List[int]]:
+    # One slot per counter, then dwell_seconds
+    return defaultdict(lambda: [0] * (len(COUNTERS) + 1))
+
+
+def aggregate_events(events: Iterable[dict], visitors: Dict[str, dict]) -> List[dict]:
+    """
+    Rollup deltas for a batch of events
+
+    Args:
+        events: Event rows (type, subject_id, payload, occurred_at)
+        visitors: The events' visitor rows by id
+
+    Returns:
+        visitor_stats_hourly rows holding the amounts to add
+    """
+    totals = _new_totals()
+    for event in events:
+        if event["type"] == EventType.VISITORS_IMPORTED.value:
+            # One event for the whole guest list; its subject is the household
+            values = totals[(hour_bucket(event["occurred_at"]), event["subject_id"])]
+            values[COUNTERS.index("created")] += int((event.get("payload") or {}).get("imported", 0))
+            continue
+
+        transitions = TRANSITIONS.get(event["type"])
+        visitor = visitors.get(event.get("subject_id"))
+        if transitions is None or visitor is None:
+            # Not a visitor transition, or the visitor is gone
+            continue
+        if event["type"] == EventType.VISITOR_CHECKED_IN.value and (event.get("payload") or {}).get("pass_id"):
+            transitions = PASS_CHECKIN
+
+        for counter, column in transitions:
+            dwell = dwell_seconds(visitor) if counter == "checked_out" else 0
+            _add(totals, visitor.get(column) or event["occurred_at"], visitor["host_household_id"], counter, dwell)
+    return _rows(totals)
+
+
+def aggregate_visitors(visitors: Iterable[dict], revoked: Iterable[str] = ()) -> List[dict]:
+    """
+    Rollup rows rebuilt from visitor timestamps (the backfill_visitor_stats rules)
+
+    Args:
+        visitors: Visitor rows (VISITOR_COLUMNS)
+        revoked: Ids of visitors whose gate pass was revoked; they count as approved
+
+    Returns:
+        visitor_stats_hourly rows
+    """
+    revoked = set(revoked)
+    totals = _new_totals()
+    for visitor in visitors:
+        household_id = visitor["host_household_id"]
+        _add(totals, visitor["created_at"], household_id, "created")
+        if visitor.get("approved_at"):
+            denied = visitor["status"] == "denied" and visitor["id"] not in revoked
+            _add(totals, visitor["approved_at"], household_id, "denied" if denied else "approved")
+        if visitor.get("checked_in_at"):
+            _add(totals, visitor["checked_in_at"], household_id, "checked_in")
+            if visitor.get("checked_out_at"):
+                _add(totals, visitor["checked_out_at"], household_id, "checked_out", dwell_seconds(visitor))
+    return _rows(totals)
+
+
+def read_watermark(supabase) -> dict:
+    """The rollup's watermark row (last_seq, updated_at)"""
+    result = supabase.table("analytics_watermarks").select("last_seq, updated_at").eq("name", WATERMARK).execute()
+    return result.data[0] if result.data else {"last_seq": 0, "updated_at": None}
+
+
+def _fetch_visitors(supabase, visitor_ids: List[str]) -> Dict[str, dict]:
+    visitors = {}
+    for start in range(0, len(visitor_ids), LOOKUP_CHUNK):
+        chunk = visitor_ids[start:start + LOOKUP_CHUNK]
+        for row in supabase.table("visitors").select(VISITOR_COLUMNS).in_("id", chunk).execute().data:
+            visitors[row["id"]] = row
+    return visitors
+
+
+def _apply_client_side(supabase, deltas: List[dict], previous_seq: int, next_seq: int) -> bool:
+    # Read-modify-write; unlike the RPC this is not atomic, so run one rollup at a time
+    if read_watermark(supabase)["last_seq"] != previous_seq:
+        return False
+    if deltas:
+        buckets = sorted({row["bucket"] for row in deltas})
+        existing = {
+            (hour_bucket(row["bucket"]), row["host_household_id"]): row
+            for row in supabase.table("visitor_stats_hourly").select("*").in_("bucket", buckets).execute().data
+        }
+        merged = []
+        for row in deltas:
+            current = existing.get((row["bucket"], row["host_household_id"]), {})
+            merged.append({
+                **row,
+                **{column: current.get(column, 0) + row[column] for column in (*COUNTERS, "dwell_seconds")}
+            })
+        supabase.table("visitor_stats_hourly").upsert(merged, on_conflict="bucket,host_household_id").execute()
+    _write_watermark(supabase, next_seq)
+    return True
+
+
+def _write_watermark(supabase, seq: int):
+    supabase.table("analytics_watermarks").upsert({
+        "name": WATERMARK,
+        "last_seq": seq,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }, on_conflict="name").execute()
+
+
+def roll_up_once(supabase, batch_size: int, lag_seconds: Optional[float] = None) -> int:
+    """
+    Add the next batch of events after the watermark to the rollup
+
+    Args:
+        supabase: Database client (service role)
+        batch_size: Most events to read
+        lag_seconds: Leave events inserted this recently for later
+            (default ANALYTICS_ROLLUP_LAG_SECONDS)
+
+    Returns:
+        Number of events rolled up (0 when caught up, or when another
+        worker moved the watermark first)
+    """
+    global _rpc_unavailable_until
+
+    if lag_seconds is None:
+        lag_seconds = get_settings().analytics_rollup_lag_seconds
+    horizon = datetime.now(timezone.utc) - timedelta(seconds=lag_seconds)
+
+    previous_seq = read_watermark(supabase)["last_seq"]
+    events = supabase.table("events").select(
+        "seq, type, subject_id, payload, occurred_at, inserted_at"
+    ).gt("seq", previous_seq).order("seq").limit(batch_size).execute().data
+    # Stop at the first recent event: anything after it waits for the next run
+    recent = next((index for index, event in enumerate(events) if _parse(event["inserted_at"]) >= horizon), None)
+    if recent is not None:
+        events = events[:recent]
+    if not events:
+        return 0
+
+    visitor_ids = sorted({
+        event["subject_id"] for event in events
+        if event["type"] in TRANSITIONS and event.get("subject_id")
+    })
+    deltas = aggregate_events(events, _fetch_visitors(supabase, visitor_ids))
+    next_seq = events[-1]["seq"]
+
+    if time.monotonic() >= _rpc_unavailable_until:
+        try:
+            applied = supabase.rpc("apply_visitor_stats", {
+                "deltas": deltas, "previous_seq": previous_seq, "next_seq": next_seq
+            }).execute().data
+            return len(events) if applied else 0
+        except Exception as e:
+            _rpc_unavailable_until = time.monotonic() + RPC_RETRY_SECONDS
+            logger.warning(f"apply_visitor_stats RPC unavailable, applying client-side: {str(e)}")
+
+    return len(events) if _apply_client_side(supabase, deltas, previous_seq, next_seq) else 0
+
+
+def backfill(supabase) -> int:
+    """
+    Rebuild the rollup from every visitor and move the watermark to the latest event
+
+    Returns:
+        The new watermark (events.seq)
+    """
+    try:
+        return supabase.rpc("backfill_visitor_stats", {}).execute().data
+    except Exception as e:
+        logger.warning(f"backfill_visitor_stats RPC unavailable, rebuilding client-side: {str(e)}")
+
+    # Watermark first: events logged during the rebuild are rolled up again
+    # later, which at worst double counts a few transitions of this minute
+    latest = supabase.table("events").select("seq").order("seq", desc=True).limit(1).execute().data
+    watermark = latest[0]["seq"] if latest else 0
+
+    visitors = [
+        row
+        for table in ("visitors", "visitors_archive")
+        for row in fetch_all(lambda: supabase.table(table).select(VISITOR_COLUMNS).order("id"))
+    ]
+    revoked = [
+        row["visitor_id"]
+        for row in fetch_all(lambda: supabase.table("gate_pass_revocations").select("visitor_id").order("id"))
+    ]
+    rows = aggregate_visitors(visitors, revoked)
+
+    supabase.table("visitor_stats_hourly").delete().gte("created", 0).execute()
+    for start in range(0, len(rows), 1000):
+        supabase.table("visitor_stats_hourly").insert(rows[start:start + 1000]).execute()
+    _write_watermark(supabase, watermark)
+    logger.info(f"Visitor stats rebuilt: {len(rows)} hourly rows from {len(visitors)} visitors")
+    return watermark
+
+
+class AnalyticsRollup:
+    """Background job rolling new events into visitor_stats_hourly"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.last_run_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> int:
+        """Roll up until caught up; returns the number of events processed"""
+        batch_size = self.settings.analytics_rollup_batch_size
+        total = 0
+        while True:
+            processed = roll_up_once(get_supabase(True), batch_size)
+            total += processed
+            if processed < batch_size:
+                return total
+
+    def run_if_leader(self) -> int:
+        """run_once in the worker holding the rollup lease; 0 in the others"""
+        lease_seconds = max(self.settings.analytics_rollup_interval_seconds * 3, 60.0)
+        if not acquire_lease(get_supabase(True), LEASE, lease_seconds):
+            return 0
+        return self.run_once()
+
+    async def _loop(self):
+        while True:
+            try:
+                processed = await run_in_threadpool(self.run_if_leader)
+                self.last_error = None
+                if processed:
+                    logger.info(f"Visitor stats: rolled up {processed} events")
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                logger.error(f"Visitor stats rollup failed: {self.last_error}")
+            self.last_run_at = time.monotonic()
+            await asyncio.sleep(self.settings.analytics_rollup_interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+rollup = AnalyticsRollup()
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "backfill":
+        print(f"Visitor stats rebuilt up to event {backfill(get_supabase(True))}")
+    elif command == "rollup":
+        print(f"Rolled up {rollup.run_once()} events")
+    else:
+        sys.exit("usage: python -m app.utils.analytics backfill|rollup")
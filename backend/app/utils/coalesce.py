@@ -0,0 +1,90 @@
+"""
+Single-flight coalescing of hot identical reads
+
+When dozens of guard screens poll GET /visitors/ at once, they all ask the
+same question. `reads.run(shape, key, fn)` runs `fn` in the threadpool for
+the first caller; callers with the same shape and key that arrive while it
+is in flight await the same result instead of querying again, and callers
+within READ_COALESCE_WINDOW_SECONDS after it finished reuse it.
+
+Keys carry the role scope (all visitors, or one household) and the scope's
+version counter (app.utils.versions), so a write on this worker starts a new
+key and is visible to the next read immediately; writes on other workers
+show up once the window has passed.
+
+Results are shared between requests: callers must not modify them.
+coalesce_requests_total{shape, outcome} counts leaders (the call that hit
+the database), shared in-flight results and cached results; the dedup ratio
+is (shared + cached) / all.
+"""
+import asyncio
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.utils.metrics import COALESCE_REQUESTS
+
+# Expired results are swept once there are this many
+MAX_RESULTS = 1024
+
+
+class SingleFlight:
+    def __init__(self):
+        self.settings = get_settings()
+        # In-flight calls and recent results; only touched on the event loop thread
+        self._in_flight: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self._results: Dict[Tuple[str, Hashable], Tuple[float, Any]] = {}
+
+    async def run(self, shape: str, key: Hashable, fn: Callable, *args) -> Any:
+        """
+        Result of `fn(*args)`, shared with identical concurrent and recent reads
+
+        Args:
+            shape: Name of the query (metric label)
+            key: Everything else the result depends on (role scope, version, parameters)
+            fn: Blocking function doing the read
+        """
+        entry = (shape, key)
+        cached = self._results.get(entry)
+        if cached is not None and cached[0] > time.monotonic():
+            COALESCE_REQUESTS.inc(shape, "cached")
+            return cached[1]
+
+        pending = self._in_flight.get(entry)
+        if pending is not None:
+            COALESCE_REQUESTS.inc(shape, "shared")
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(pending)
+
+        COALESCE_REQUESTS.inc(shape, "leader")
+        # The call is its own task, so the leader being cancelled (client gone)
+        # neither cancels it nor hands CancelledError to the followers
+        task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+        self._in_flight[entry] = task
+        task.add_done_callback(lambda done: self._finish(entry, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, entry: Tuple[str, Hashable], task: asyncio.Task):
+        del self._in_flight[entry]
+        # Retrieve the error, or asyncio logs it when nobody was waiting any more
+        if task.cancelled() or task.exception() is not None:
+            return
+        window = self.settings.read_coalesce_window_seconds
+        if window > 0:
+            if len(self._results) >= MAX_RESULTS:
+                self._sweep()
+            self._results[entry] = (time.monotonic() + window, task.result())
+
+    def _sweep(self):
+        now = time.monotonic()
+        for entry, (expires, _) in list(self._results.items()):
+            if expires <= now:
+                del self._results[entry]
+        if len(self._results) >= MAX_RESULTS:
+            self._results.clear()
+
+    def clear(self):
+        self._results.clear()
+
+
+reads = SingleFlight()
@@ -0,0 +1,176 @@
+"""
+Retention compaction of terminal visitors
+
+Checked-out and denied visitors whose last change is older than
+VISITOR_RETENTION_DAYS move from `visitors` to `visitors_archive`
+(migrations/006_visitors_archive.sql), VISITOR_COMPACTION_BATCH_SIZE rows
+per transaction with a short pause in between, so list and chat queries
+over the hot table never wait behind a long lock. The compact_visitors RPC
+moves a batch atomically; without it rows are copied to the archive first
+and then deleted, so an interrupted run never loses a visitor.
+
+After each batch the visitor reads of the households it touched are
+invalidated (app.utils.versions), in this worker and over the invalidation
+bus. Compacted visitors still count in the analytics backfill, and
+GET /visitors/{id} falls back to the archive. Only the worker holding the
+job's lease (app.utils.leases) compacts.
+
+    python -m app.utils.compaction
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.database import get_supabase
+from app.utils.leases import acquire_lease
+from app.utils.versions import VISITORS_SCOPE, bump, household_visitors_scope
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ["checked_out", "denied"]
+LEASE = "visitor_compaction"
+# Let other writers through between batches
+BATCH_PAUSE_SECONDS = 0.2
+# After the RPC fails, use the client-side path for this long before trying it again
+RPC_RETRY_SECONDS = 300.0
+
+_rpc_unavailable_until = 0.0
+
+
+def _compact_client_side(supabase, cutoff: str, batch_size: int) -> Dict[str, int]:
+    rows = supabase.table("visitors").select("*").in_("status", TERMINAL_STATUSES).lt(
+        "updated_at", cutoff
+    ).order("updated_at").limit(batch_size).execute().data
+    if not rows:
+        return {}
+    archived_at = datetime.now(timezone.utc).isoformat()
+    supabase.table("visitors_archive").upsert(
+        [{**row, "archived_at": archived_at} for row in rows], on_conflict="id"
+    ).execute()
+    deleted = supabase.table("visitors").delete().in_("id", [row["id"] for row in rows]).in_(
+        "status", TERMINAL_STATUSES
+    ).execute().data
+    return dict(Counter(row["host_household_id"] for row in deleted))
+
+
+def bump_compacted(moved: Dict[str, int]):
+    """Invalidate visitor reads of the households a batch was moved out of"""
+    if moved:
+        bump(VISITORS_SCOPE, *(household_visitors_scope(household_id) for household_id in moved if household_id))
+
+
+def compact_batch(supabase, older_than: datetime, batch_size: int) -> Dict[str, int]:
+    """
+    Move one batch of terminal visitors to the archive
+
+    Args:
+        supabase: Database client (service role)
+        older_than: Only visitors last changed before this time
+        batch_size: Most visitors to move
+
+    Returns:
+        Number of visitors moved by host household
+    """
+    global _rpc_unavailable_until
+
+    cutoff = older_than.astimezone(timezone.utc).isoformat()
+    if time.monotonic() >= _rpc_unavailable_until:
+        try:
+            rows = supabase.rpc("compact_visitors", {"cutoff": cutoff, "batch_size": batch_size}).execute().data
+            return {row["host_household_id"]: row["moved"] for row in rows}
+        except Exception as e:
+            _rpc_unavailable_until = time.monotonic() + RPC_RETRY_SECONDS
+            logger.warning(f"compact_visitors RPC unavailable, compacting client-side: {str(e)}")
+    return _compact_client_side(supabase, cutoff, batch_size)
+
+
+def compact_visitors(supabase, older_than: datetime, batch_size: int, pause: float = BATCH_PAUSE_SECONDS,
+                     on_batch: Callable[[Dict[str, int]], None] = bump_compacted) -> int:
+    """
+    Move every terminal visitor older than the cutoff, batch by batch
+
+    `on_batch` gets each batch's counts by household as soon as it is moved
+    (by default it invalidates the visitor reads of those households).
+
+    Returns:
+        Number of visitors moved
+    """
+    total = 0
+    while True:
+        moved = compact_batch(supabase, older_than, batch_size)
+        on_batch(moved)
+        total += sum(moved.values())
+        if sum(moved.values()) < batch_size:
+            return total
+        time.sleep(pause)
+
+
+def get_archived_visitor(supabase, visitor_id: str) -> Optional[dict]:
+    result = supabase.table("visitors_archive").select("*").eq("id", visitor_id).execute()
+    return result.data[0] if result.data else None
+
+
+class VisitorCompactor:
+    """Background job compacting terminal visitors every VISITOR_COMPACTION_INTERVAL_SECONDS"""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.last_run_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self, on_batch: Callable[[Dict[str, int]], None] = bump_compacted) -> int:
+        older_than = datetime.now(timezone.utc) - timedelta(days=self.settings.visitor_retention_days)
+        return compact_visitors(
+            get_supabase(True), older_than, self.settings.visitor_compaction_batch_size, on_batch=on_batch
+        )
+
+    def run_if_leader(self, on_batch: Callable[[Dict[str, int]], None] = bump_compacted) -> int:
+        """run_once in the worker holding the compaction lease; 0 in the others"""
+        lease_seconds = max(self.settings.visitor_compaction_interval_seconds * 3, 60.0)
+        if not acquire_lease(get_supabase(True), LEASE, lease_seconds):
+            return 0
+        return self.run_once(on_batch)
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+
+        def on_batch(moved: Dict[str, int]):
+            # Version counters are only touched on the event loop thread
+            loop.call_soon_threadsafe(bump_compacted, moved)
+
+        while True:
+            try:
+                moved = await run_in_threadpool(self.run_if_leader, on_batch)
+                self.last_error = None
+                if moved:
+                    logger.info(f"Compacted {moved} visitors into visitors_archive")
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                logger.error(f"Visitor compaction failed: {self.last_error}")
+            self.last_run_at = time.monotonic()
+            await asyncio.sleep(self.settings.visitor_compaction_interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+compactor = VisitorCompactor()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Compacted {compactor.run_once()} visitors")
@@ -0,0 +1,119 @@
+"""
+In-memory household directory
+
+Holds every household, an index by normalised flat number and the
+household -> member user ids map, loaded in two paged queries (households,
+then users with a household). Lookups are dict reads. The directory is
+invalidated when this worker changes households or memberships and is
+reloaded on next use; other workers hear about it over the invalidation
+bus (app.utils.invalidation). Changes made elsewhere show up after
+DIRECTORY_TTL_SECONDS.
+
+Used by the households API, household notifications (app.utils.fcm) and
+the chat context (app.utils.openai_tools).
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+from app.config import get_settings
+from app.database import fetch_all, get_supabase
+from app.utils.invalidation import bus
+
+logger = logging.getLogger(__name__)
+
+# An unknown household id triggers a reload at most this often
+MISS_RELOAD_SECONDS = 5.0
+
+
+def normalize_flat_no(flat_no: str) -> str:
+    """'a-101', 'A 101' and 'A101' are the same flat"""
+    return re.sub(r"[^0-9A-Za-z]", "", flat_no).upper()
+
+
+def _flat_sort_key(flat_no: str):
+    # Natural order: A2 before A10
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", normalize_flat_no(flat_no))]
+
+
+class HouseholdDirectory:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._households: Dict[str, dict] = {}
+        self._by_flat: Dict[str, str] = {}
+        self._members: Dict[str, List[str]] = {}
+        self._ordered: List[str] = []
+        self._loaded_at: Optional[float] = None
+
+    def refresh(self):
+        supabase = get_supabase(True)
+        households = fetch_all(
+            lambda: supabase.table("households").select("id, flat_no, name, created_at").order("id")
+        )
+        users = fetch_all(
+            lambda: supabase.table("users").select("id, household_id").filter(
+                "household_id", "not.is", "null"
+            ).order("id")
+        )
+
+        members = {household["id"]: [] for household in households}
+        for user in users:
+            members.setdefault(user["household_id"], []).append(user["id"])
+
+        with self._lock:
+            self._households = {household["id"]: household for household in households}
+            self._by_flat = {normalize_flat_no(h["flat_no"]): h["id"] for h in households}
+            self._members = members
+            self._ordered = sorted(self._households, key=lambda hid: _flat_sort_key(self._households[hid]["flat_no"]))
+            self._loaded_at = time.monotonic()
+        logger.info(f"Household directory loaded: {len(households)} households, {len(users)} members")
+
+    def invalidate(self):
+        """Reload on next use, here and in other workers (call after changing households or memberships)"""
+        self.expire()
+        bus.publish("directory")
+
+    def expire(self, keys=None):
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        ttl = bus.ttl(get_settings().directory_ttl_seconds)
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > ttl:
+            self.refresh()
+
+    def _ensure_known(self, household_id: str):
+        self._ensure_loaded()
+        if household_id not in self._households and time.monotonic() - self._loaded_at > MISS_RELOAD_SECONDS:
+            # Probably created by another worker since the last load
+            self.refresh()
+
+    def _view(self, household_id: str) -> dict:
+        return {**self._households[household_id], "members": list(self._members.get(household_id, []))}
+
+    def get(self, household_id: str) -> Optional[dict]:
+        self._ensure_known(household_id)
+        return self._view(household_id) if household_id in self._households else None
+
+    def by_flat(self, flat_no: str) -> Optional[dict]:
+        self._ensure_loaded()
+        household_id = self._by_flat.get(normalize_flat_no(flat_no))
+        return self._view(household_id) if household_id else None
+
+    def members(self, household_id: str) -> List[str]:
+        """User ids of the household's members"""
+        self._ensure_known(household_id)
+        return list(self._members.get(household_id, []))
+
+    def page(self, offset: int, limit: int) -> tuple:
+        """(households ordered by flat number, total count)"""
+        self._ensure_loaded()
+        ids = self._ordered[offset:offset + limit]
+        return [self._view(household_id) for household_id in ids], len(self._ordered)
+
+
+directory = HouseholdDirectory()
+bus.register("directory", directory.expire)
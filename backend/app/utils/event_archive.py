@@ -0,0 +1,280 @@
+"""
+Archive of old audit events in compressed monthly files
+
+archive_events() streams the events older than EVENT_RETENTION_DAYS out of
+the database in (occurred_at, id) order, one page at a time, into gzip
+compressed JSON Lines files partitioned by month:
+
+    EVENT_ARCHIVE_DIR/
+        manifest.jsonl                      one line per file: rows, sha256, time range
+        2026-01/events-20260719T020000-3f2a9c1e.jsonl.gz
+
+A file is written under a temporary name, fsynced and renamed, then read
+back and checked against its SHA-256 and row count. Only the ids read back
+from a verified file are deleted, EVENT_ARCHIVE_BATCH_SIZE at a time. If a
+run is interrupted between writing and deleting, the next run archives
+those rows again; readers drop the duplicates by id.
+
+read_archive() answers historical audit queries from the files: the
+manifest narrows the search to the months in range, and each file is read
+through a read-only memory map.
+
+    python -m app.utils.event_archive archive   # from cron, e.g. nightly
+    python -m app.utils.event_archive verify
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional
+from app.config import get_settings
+from app.database import get_supabase
+from app.utils.sync import keyset_filter
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.jsonl"
+EVENT_COLUMNS = "id, type, actor_user_id, subject_id, payload, occurred_at"
+# Level 6 compresses JSON nearly as well as 9 at a fraction of the CPU
+COMPRESS_LEVEL = 6
+READ_CHUNK = 1 << 20
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _parse(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Naive times are UTC, like every timestamp this app writes
+    if value is None:
+        return None
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+
+
+def month_of(occurred_at: str) -> str:
+    return _parse(occurred_at).astimezone(timezone.utc).strftime("%Y-%m")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(directory: Path) -> List[dict]:
+    path = Path(directory) / MANIFEST
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def iter_file(path: Path) -> Iterator[dict]:
+    """Events of one archive file, decompressed from a read-only memory map"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with gzip.GzipFile(fileobj=mapped, mode="rb") as lines:
+            for line in lines:
+                yield json.loads(line)
+
+
+class _Segment:
+    """One archive file being written"""
+
+    def __init__(self, directory: Path, month: str, run_id: str):
+        self.path = directory / month / f"events-{run_id}.jsonl.gz"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.month = month
+        self.rows = 0
+        self.first = self.last = None
+        self._raw = open(self.tmp_path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=COMPRESS_LEVEL)
+
+    def write(self, event: dict):
+        self._gzip.write(json.dumps(event, separators=(",", ":"), default=str).encode() + b"\n")
+        self.rows += 1
+        self.first = self.first or event["occurred_at"]
+        self.last = event["occurred_at"]
+
+    def close(self) -> dict:
+        self._gzip.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        os.replace(self.tmp_path, self.path)
+        return {
+            "file": f"{self.month}/{self.path.name}",
+            "month": self.month,
+            "rows": self.rows,
+            "sha256": file_sha256(self.path),
+            "first_occurred_at": self.first,
+            "last_occurred_at": self.last,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+
+def verify_file(directory: Path, entry: dict) -> List[str]:
+    """
+    Check an archive file against its manifest entry
+
+    Returns:
+        The ids of the events in the file
+
+    Raises:
+        ArchiveError: The checksum or the row count does not match
+    """
+    path = Path(directory) / entry["file"]
+    if file_sha256(path) != entry["sha256"]:
+        raise ArchiveError(f"Checksum mismatch: {entry['file']}")
+    ids = [event["id"] for event in iter_file(path)]
+    if len(ids) != entry["rows"]:
+        raise ArchiveError(f"{entry['file']} holds {len(ids)} events, expected {entry['rows']}")
+    return ids
+
+
+def _seal(supabase, directory: Path, segment: _Segment, batch_size: int) -> dict:
+    entry = segment.close()
+    ids = verify_file(directory, entry)
+    with open(directory / MANIFEST, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    for start in range(0, len(ids), batch_size):
+        supabase.table("events").delete().in_("id", ids[start:start + batch_size]).execute()
+    logger.info(f"Archived {entry['rows']} events to {entry['file']}")
+    return entry
+
+
+def archive_events(supabase, directory: Path, older_than: datetime, batch_size: int = 1000) -> List[dict]:
+    """
+    Move events that occurred before `older_than` from the database to archive files
+
+    Args:
+        supabase: Database client (service role)
+        directory: Archive directory
+        older_than: Cutoff; newer events stay in the database
+        batch_size: Events per read and per delete
+
+    Returns:
+        Manifest entries of the files written
+    """
+    directory = Path(directory)
+    # Never overwrite an earlier run's file
+    run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    cutoff = older_than.astimezone(timezone.utc).isoformat()
+    written, segment = [], None
+    last = None
+
+    while True:
+        query = supabase.table("events").select(EVENT_COLUMNS).lt("occurred_at", cutoff)
+        if last is not None:
+            query = query.or_(keyset_filter("occurred_at", last["occurred_at"], "id", last["id"]))
+        page = query.order("occurred_at").order("id").limit(batch_size).execute().data
+
+        for event in page:
+            month = month_of(event["occurred_at"])
+            if segment is not None and segment.month != month:
+                written.append(_seal(supabase, directory, segment, batch_size))
+                segment = None
+            if segment is None:
+                segment = _Segment(directory, month, run_id)
+            segment.write(event)
+
+        if len(page) < batch_size:
+            break
+        last = page[-1]
+
+    if segment is not None:
+        written.append(_seal(supabase, directory, segment, batch_size))
+    return written
+
+
+def read_archive(directory: Path, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 event_type: Optional[str] = None, subject_id: Optional[str] = None,
+                 limit: int = 50) -> List[dict]:
+    """
+    Archived events, newest first
+
+    Args:
+        directory: Archive directory
+        start: Only events at or after this time (naive: UTC)
+        end: Only events before this time (naive: UTC)
+        event_type: Only events of this type
+        subject_id: Only events about this visitor/household/pass
+        limit: Maximum number of events
+
+    Returns:
+        Event rows as they were in the events table
+    """
+    directory = Path(directory)
+    start, end = _utc(start), _utc(end)
+
+    # Newest month first; within a month every file that overlaps the range
+    by_month = {}
+    for entry in read_manifest(directory):
+        if start and _parse(entry["last_occurred_at"]) < start:
+            continue
+        if end and _parse(entry["first_occurred_at"]) >= end:
+            continue
+        by_month.setdefault(entry["month"], []).append(entry)
+
+    results, seen = [], set()
+    for month in sorted(by_month, reverse=True):
+        matches = []
+        for entry in by_month[month]:
+            for event in iter_file(directory / entry["file"]):
+                occurred_at = _parse(event["occurred_at"])
+                if (start and occurred_at < start) or (end and occurred_at >= end):
+                    continue
+                if (event_type and event["type"] != event_type) or (subject_id and event["subject_id"] != subject_id):
+                    continue
+                if event["id"] not in seen:
+                    seen.add(event["id"])
+                    matches.append(event)
+        matches.sort(key=lambda event: (_parse(event["occurred_at"]), event["id"]), reverse=True)
+        results.extend(matches)
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+def run_archival() -> List[dict]:
+    """archive_events() with the configured retention, directory and batch size"""
+    settings = get_settings()
+    if settings.storage_backend == "sqlite":
+        # Deletes would be replicated to Supabase
+        raise ArchiveError("Archive events from the central database, not a gate-local one")
+    older_than = datetime.now(timezone.utc) - timedelta(days=settings.event_retention_days)
+    return archive_events(
+        get_supabase(True), Path(settings.event_archive_dir), older_than, settings.event_archive_batch_size
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "archive":
+        entries = run_archival()
+        print(f"Archived {sum(entry['rows'] for entry in entries)} events into {len(entries)} files")
+    elif command == "verify":
+        archive_dir = Path(get_settings().event_archive_dir)
+        manifest = read_manifest(archive_dir)
+        for entry in manifest:
+            verify_file(archive_dir, entry)
+        print(f"{len(manifest)} archive files OK")
+    else:
+        sys.exit("usage: python -m app.utils.event_archive archive|verify")
@@ -0,0 +1,388 @@
+"""
+Streaming CSV / XLSX exports of visitors and events
+
+Rows are read with keyset pagination on (timestamp, id), EXPORT_PAGE_SIZE
+at a time, and each page is encoded and handed to the response before
+the next one is read, so memory stays flat however many rows match.
+
+XLSX is written without a spreadsheet library: a workbook is a zip of a
+few XML parts, and zipfile can write one to a non-seekable stream. The
+worksheet is deflated as it is generated, using inline strings so no
+shared string table has to be held in memory.
+
+Large exports can also run as background jobs that write to EXPORT_DIR;
+the job's status lives in a JSON file next to the export, so any worker
+on the host can report it and serve the download.
+"""
+import csv
+import io
+import json
+import re
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+from app.config import get_settings
+from app.database import get_supabase
+from app.utils.directory import directory
+from app.utils.sync import keyset_filter
+
+VISITOR_COLUMNS = [
+    "id", "name", "phone", "purpose", "host_household_id", "status", "approved_by", "approved_at",
+    "checked_in_at", "checked_out_at", "scheduled_time", "pass_id", "created_at",
+]
+# flat_no is looked up in the household directory
+VISITOR_EXPORT_COLUMNS = VISITOR_COLUMNS[:5] + ["flat_no"] + VISITOR_COLUMNS[5:]
+EVENT_COLUMNS = ["id", "occurred_at", "type", "actor_user_id", "subject_id", "payload"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# ...but a signed number or phone number is just data
+SIGNED_NUMBER = re.compile(r"^[+-][\d\s().-]*$")
+# Characters XML 1.0 does not allow
+XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+class ExportFilters:
+    def __init__(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 household_id: Optional[str] = None, event_type: Optional[str] = None,
+                 include_archived: bool = True):
+        self.start = start
+        self.end = end
+        self.household_id = household_id
+        self.event_type = event_type
+        self.include_archived = include_archived
+
+    def as_dict(self) -> dict:
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "household_id": self.household_id,
+            "event_type": self.event_type,
+            "include_archived": self.include_archived,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExportFilters":
+        return cls(
+            start=datetime.fromisoformat(data["start"]) if data.get("start") else None,
+            end=datetime.fromisoformat(data["end"]) if data.get("end") else None,
+            household_id=data.get("household_id"),
+            event_type=data.get("event_type"),
+            include_archived=data.get("include_archived", True),
+        )
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    text = str(value)
+    if text.startswith(FORMULA_PREFIXES) and not SIGNED_NUMBER.match(text):
+        return "'" + text
+    return text
+
+
+def keyset_pages(supabase, table: str, columns: List[str], time_column: str,
+                 apply_filters: Callable, page_size: int) -> Iterator[List[dict]]:
+    """Pages of a table in (time_column, id) order, without OFFSET"""
+    last = None
+    while True:
+        query = apply_filters(supabase.table(table).select(", ".join(columns)))
+        if last is not None:
+            query = query.or_(keyset_filter(time_column, last[time_column], "id", last["id"]))
+        page = query.order(time_column).order("id").limit(page_size).execute().data
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def _time_range(query, column: str, filters: ExportFilters):
+    if filters.start:
+        query = query.gte(column, filters.start.isoformat())
+    if filters.end:
+        query = query.lt(column, filters.end.isoformat())
+    return query
+
+
+def visitor_pages(filters: ExportFilters, page_size: int) -> Iterator[List[list]]:
+    """Visitor rows as cell lists; active visitors first, then compacted ones"""
+    supabase = get_supabase(True)
+
+    def apply_filters(query):
+        query = _time_range(query, "created_at", filters)
+        return query.eq("host_household_id", filters.household_id) if filters.household_id else query
+
+    tables = ["visitors", "visitors_archive"] if filters.include_archived else ["visitors"]
+    for table in tables:
+        for page in keyset_pages(supabase, table, VISITOR_COLUMNS, "created_at", apply_filters, page_size):
+            rows = []
+            for visitor in page:
+                household = directory.get(visitor["host_household_id"])
+                row = {**visitor, "flat_no": household["flat_no"] if household else None}
+                rows.append([_cell(row.get(column)) for column in VISITOR_EXPORT_COLUMNS])
+            yield rows
+
+
+def _household_subjects(supabase, household_id: str, subject_ids: List[str]) -> set:
+    """Which of a page's event subjects belong to a household (its visitors, or itself)"""
+    subjects = {household_id} & set(subject_ids)
+    ids = [subject_id for subject_id in set(subject_ids) if subject_id and subject_id != household_id]
+    for table in ("visitors", "visitors_archive"):
+        if not ids:
+            break
+        rows = supabase.table(table).select("id, host_household_id").in_("id", ids).execute().data
+        subjects.update(row["id"] for row in rows if row["host_household_id"] == household_id)
+        found = {row["id"] for row in rows}
+        ids = [subject_id for subject_id in ids if subject_id not in found]
+    return subjects
+
+
+def event_pages(filters: ExportFilters, page_size: int) -> Iterator[List[list]]:
+    """Event rows as cell lists, oldest first"""
+    supabase = get_supabase(True)
+
+    def apply_filters(query):
+        query = _time_range(query, "occurred_at", filters)
+        return query.eq("type", filters.event_type) if filters.event_type else query
+
+    for page in keyset_pages(supabase, "events", EVENT_COLUMNS, "occurred_at", apply_filters, page_size):
+        if filters.household_id:
+            # Events point at visitors, so resolve the page's subjects in one query
+            subjects = _household_subjects(supabase, filters.household_id, [e["subject_id"] for e in page])
+            page = [event for event in page if event["subject_id"] in subjects]
+        yield [[_cell(event.get(column)) for column in EVENT_COLUMNS] for event in page]
+
+
+def encode_csv(header: List[str], pages: Iterable[List[list]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the file as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Pipe(io.RawIOBase):
+    """Write-only stream that hands out what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _workbook(sheet_name: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_row(cells: List[str]) -> bytes:
+    values = "".join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(XML_ILLEGAL.sub("", cell))}</t></is></c>'
+        for cell in cells
+    )
+    return f"<row>{values}</row>".encode()
+
+
+def encode_xlsx(header: List[str], pages: Iterable[List[list]], sheet_name: str = "Export") -> Iterator[bytes]:
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr("xl/workbook.xml", _workbook(sheet_name))
+        yield pipe.drain()
+
+        # The sheet's size is unknown until the last page: without zip64 headers
+        # up front, an export past 2 GiB fails when the entry is closed
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header))
+            for rows in pages:
+                sheet.write(b"".join(_xlsx_row(row) for row in rows))
+                yield pipe.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield pipe.drain()
+
+
+EXPORTS = {
+    "visitors": (VISITOR_EXPORT_COLUMNS, visitor_pages),
+    "events": (EVENT_COLUMNS, event_pages),
+}
+
+
+def export_stream(kind: str, export_format: str, filters: ExportFilters,
+                  page_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Encoded export, chunk by chunk
+
+    Args:
+        kind: "visitors" or "events"
+        export_format: "csv" or "xlsx"
+        filters: Date range (created_at / occurred_at), household, event type
+        page_size: Rows read per query (defaults to EXPORT_PAGE_SIZE)
+    """
+    header, pages = EXPORTS[kind]
+    rows = pages(filters, page_size or get_settings().export_page_size)
+    if export_format == "xlsx":
+        return encode_xlsx(header, rows, sheet_name=kind.capitalize())
+    return encode_csv(header, rows)
+
+
+def export_filename(kind: str, export_format: str) -> str:
+    return f"{kind}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{export_format}"
+
+
+# Background jobs
+
+def _export_dir() -> Path:
+    path = Path(get_settings().export_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _job_path(job_id: str) -> Path:
+    # Job ids end up in file names
+    return _export_dir() / f"{uuid.UUID(job_id)}.json"
+
+
+def _save_job(job: dict):
+    path = _job_path(job["id"])
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(job))
+    tmp_path.replace(path)
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    try:
+        return json.loads(_job_path(job_id).read_text())
+    except (ValueError, FileNotFoundError):
+        return None
+
+
+def job_file(job: dict) -> Path:
+    return _export_dir() / job["file"]
+
+
+def create_job(kind: str, export_format: str, filters: ExportFilters, created_by: str) -> dict:
+    remove_expired_jobs()
+    job_id = str(uuid.uuid4())
+    job = {
+        "id": job_id,
+        "kind": kind,
+        "format": export_format,
+        "filters": filters.as_dict(),
+        "status": "pending",
+        "size_bytes": None,
+        "error": None,
+        "file": f"{job_id}.{export_format}",
+        "filename": export_filename(kind, export_format),
+        "created_by": created_by,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "finished_at": None,
+    }
+    _save_job(job)
+    return job
+
+
+def run_job(job_id: str):
+    """Write a job's export to EXPORT_DIR (run as a background task)"""
+    job = get_job(job_id)
+    job["status"] = "running"
+    _save_job(job)
+
+    path = job_file(job)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in export_stream(job["kind"], job["format"], ExportFilters.from_dict(job["filters"])):
+                f.write(chunk)
+        tmp_path.replace(path)
+        job.update(status="done", size_bytes=path.stat().st_size)
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        job.update(status="failed", error=str(e) or type(e).__name__)
+    job["finished_at"] = datetime.now(timezone.utc).isoformat()
+    _save_job(job)
+
+
+def remove_expired_jobs():
+    """Delete jobs (and their files) older than EXPORT_JOB_TTL_HOURS"""
+    expires_before = datetime.now(timezone.utc) - timedelta(hours=get_settings().export_job_ttl_hours)
+    for path in _export_dir().glob("*.json"):
+        try:
+            job = json.loads(path.read_text())
+        except ValueError:
+            continue
+        if datetime.fromisoformat(job["created_at"]) < expires_before:
+            job_file(job).unlink(missing_ok=True)
+            path.unlink(missing_ok=True)
+
+
+def job_view(job: dict) -> Dict:
+    return {key: job[key] for key in (
+        "id", "kind", "format", "filters", "status", "size_bytes", "error", "filename", "created_at", "finished_at"
+    )}
@@ -1,8 +1,9 @@
-import httpx
 import json
 from typing import Optional, List
 from app.config import get_settings
 from app.database import get_supabase
+from app.utils.directory import directory
+from app.utils.metrics import NOTIFICATIONS_SENT, NOTIFICATION_FANOUT
 import logging
 
 settings = get_settings()
@@ -22,6 +23,8 @@ async def send_notification(topic: str, title: str, body: str, data: Optional[di
     # For local development, just log the notification
     # In production, implement actual FCM HTTP v1 API
 
+    NOTIFICATIONS_SENT.inc("topic")
+
     logger.info(f"[NOTIFICATION] Topic: {topic}")
     logger.info(f"  Title: {title}")
     logger.info(f"  Body: {body}")
@@ -47,6 +50,7 @@ async def send_notification(topic: str, title: str, body: str, data: Optional[di
 
     try:
         # Get access token
+        import httpx
         import google.oauth2.service_account
         import google.auth.transport.requests
 
@@ -123,11 +127,14 @@ async def send_notification_to_user(user_id: str, title: str, body: str, data: O
         # Get user's device tokens
         result = supabase.table("device_tokens").select("token").eq("user_id", user_id).execute()
 
+        NOTIFICATION_FANOUT.observe(len(result.data), "user_tokens")
+
         if not result.data:
             logger.info(f"No device tokens found for user {user_id}")
             return
 
         tokens = [token_record["token"] for token_record in result.data]
+        NOTIFICATIONS_SENT.inc("user", amount=len(tokens))
 
         # Log notification for each token
         for token in tokens:
@@ -184,19 +191,18 @@ async def send_notification_to_household(household_id: str, title: str, body: st
         body: Notification body
         data: Optional additional data payload
     """
-    supabase = get_supabase()
-
     try:
-        # Get all household members
-        result = supabase.table("users").select("id").eq("household_id", household_id).execute()
+        # Household members from the cached directory
+        members = directory.members(household_id)
+        NOTIFICATION_FANOUT.observe(len(members), "household")
 
-        if not result.data:
+        if not members:
             logger.info(f"No users found for household {household_id}")
             return
 
         # Send notification to each member
-        for user in result.data:
-            await send_notification_to_user(user["id"], title, body, data)
+        for user_id in members:
+            await send_notification_to_user(user_id, title, body, data)
 
     except Exception as e:
         logger.error(f"Error sending notification to household {household_id}: {str(e)}")
@@ -218,6 +224,7 @@ async def send_notification_to_role(role: str, title: str, body: str, data: Opti
         # Get all users with this role
         # Note: In PostgreSQL, we use @> operator to check if array contains value
         result = supabase.table("users").select("id").filter("roles", "cs", f'{{{role}}}').execute()
+        NOTIFICATION_FANOUT.observe(len(result.data), "role")
 
         if not result.data:
             logger.info(f"No users found with role {role}")
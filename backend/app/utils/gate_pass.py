@@ -0,0 +1,195 @@
+"""
+Signed gate passes that guard devices verify offline
+
+Approving a visitor mints a pass: a small binary payload signed with
+Ed25519, base64url encoded so it fits in a QR code (~150 characters).
+
+    payload = version (1 byte) | key id (4) | visitor id (16) |
+              household id (16) | not before (4, unix) | not after (4, unix)
+    pass    = base64url(payload + signature (64 bytes))
+
+Devices fetch the public keys from GET /gate/keys and the revocation list
+from GET /gate/revocations, verify passes with verify_gate_pass(), let the
+visitor in, and later upload the check-ins in one POST /gate/checkins.
+
+The signing key comes from GATE_PASS_SIGNING_KEY (base64 32-byte Ed25519
+seed). Without it, a key is derived from SECRET_KEY so every worker signs
+with the same key.
+"""
+import base64
+import hashlib
+import struct
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional
+from app.config import get_settings
+
+PASS_VERSION = 1
+PAYLOAD_FORMAT = ">B4s16s16sII"
+PAYLOAD_SIZE = struct.calcsize(PAYLOAD_FORMAT)
+SIGNATURE_SIZE = 64
+# Device clocks drift; accept check-ins this far outside the window
+CLOCK_SKEW = timedelta(minutes=5)
+
+
+class GatePassError(Exception):
+    pass
+
+
+@dataclass
+class GatePass:
+    key_id: str
+    visitor_id: str
+    household_id: str
+    not_before: datetime
+    not_after: datetime
+
+    def valid_at(self, at: datetime) -> bool:
+        return self.not_before - CLOCK_SKEW <= at <= self.not_after + CLOCK_SKEW
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def as_utc(value: datetime) -> datetime:
+    # Timestamps in this app are naive UTC (datetime.utcnow())
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+@lru_cache()
+def _signing_key():
+    # cryptography is only needed once passes are minted or checked
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+    settings = get_settings()
+    if settings.gate_pass_signing_key:
+        seed = base64.b64decode(settings.gate_pass_signing_key)
+    else:
+        seed = hashlib.sha256(f"gate-pass:{settings.secret_key}".encode()).digest()
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+def _raw_public_key(private_key) -> bytes:
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+    return private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+
+def key_id(raw_public_key: bytes) -> str:
+    return hashlib.sha256(raw_public_key).hexdigest()[:8]
+
+
+def public_keys() -> Dict[str, str]:
+    """Verification keys by key id (base64url raw Ed25519 public keys)"""
+    raw = _raw_public_key(_signing_key())
+    return {key_id(raw): _b64encode(raw)}
+
+
+def pass_window(approved_at: datetime, scheduled_time: Optional[datetime] = None) -> tuple:
+    """
+    Validity window of a pass
+
+    Returns:
+        (not_before, not_after): from approval until GATE_PASS_TTL_HOURS
+        after the approval or the scheduled visit, whichever is later
+    """
+    ttl = timedelta(hours=get_settings().gate_pass_ttl_hours)
+    return approved_at, max(approved_at, scheduled_time or approved_at) + ttl
+
+
+def mint_gate_pass(visitor_id: str, household_id: str, not_before: datetime, not_after: datetime) -> str:
+    """
+    Sign a gate pass for an approved visitor
+
+    Args:
+        visitor_id: Visitor UUID
+        household_id: Host household UUID
+        not_before: Start of the validity window (aware or UTC)
+        not_after: End of the validity window (aware or UTC)
+
+    Returns:
+        base64url pass for a QR code
+    """
+    private_key = _signing_key()
+    payload = struct.pack(
+        PAYLOAD_FORMAT,
+        PASS_VERSION,
+        bytes.fromhex(key_id(_raw_public_key(private_key))),
+        uuid.UUID(visitor_id).bytes,
+        uuid.UUID(household_id).bytes,
+        int(as_utc(not_before).timestamp()),
+        int(as_utc(not_after).timestamp()),
+    )
+    return _b64encode(payload + private_key.sign(payload))
+
+
+def visitor_pass_window(visitor: dict) -> tuple:
+    """pass_window() of an approved visitor row, so re-minting gives the same window"""
+    return pass_window(
+        as_utc(_parse_timestamp(visitor["approved_at"])),
+        as_utc(_parse_timestamp(visitor["scheduled_time"])) if visitor.get("scheduled_time") else None
+    )
+
+
+def gate_pass_for(visitor: dict) -> str:
+    """Pass for an approved visitor row"""
+    not_before, not_after = visitor_pass_window(visitor)
+    return mint_gate_pass(visitor["id"], visitor["host_household_id"], not_before, not_after)
+
+
+def verify_gate_pass(token: str, keys: Optional[Dict[str, str]] = None) -> GatePass:
+    """
+    Check a pass's signature and decode it (what guard devices do offline)
+
+    Args:
+        token: Pass as read from the QR code
+        keys: Public keys by key id, as served by GET /gate/keys (defaults to this server's)
+
+    Returns:
+        The decoded pass; check valid_at() and the revocation list next
+
+    Raises:
+        GatePassError: The pass is malformed or the signature does not match
+    """
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+    try:
+        raw = _b64decode(token)
+    except ValueError:
+        raise GatePassError("Malformed gate pass")
+    if len(raw) != PAYLOAD_SIZE + SIGNATURE_SIZE:
+        raise GatePassError("Malformed gate pass")
+
+    payload, signature = raw[:PAYLOAD_SIZE], raw[PAYLOAD_SIZE:]
+    version, kid, visitor, household, not_before, not_after = struct.unpack(PAYLOAD_FORMAT, payload)
+    if version != PASS_VERSION:
+        raise GatePassError(f"Unsupported gate pass version {version}")
+
+    public_key = (public_keys() if keys is None else keys).get(kid.hex())
+    if public_key is None:
+        raise GatePassError("Gate pass signed with an unknown key")
+    try:
+        Ed25519PublicKey.from_public_bytes(_b64decode(public_key)).verify(signature, payload)
+    except InvalidSignature:
+        raise GatePassError("Invalid gate pass signature")
+
+    return GatePass(
+        key_id=kid.hex(),
+        visitor_id=str(uuid.UUID(bytes=visitor)),
+        household_id=str(uuid.UUID(bytes=household)),
+        not_before=datetime.fromtimestamp(not_before, timezone.utc),
+        not_after=datetime.fromtimestamp(not_after, timezone.utc),
+    )
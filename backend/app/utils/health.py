@@ -0,0 +1,181 @@
+"""
+Cached dependency health, maintained by a background probe
+
+HealthMonitor probes the database every HEALTH_PROBE_INTERVAL_SECONDS, the
+LLM provider every HEALTH_LLM_PROBE_INTERVAL_SECONDS and, with the SQLite
+backend, the replication outbox lag. The health endpoints only read the
+cached results, so orchestrator probes cost no database or network calls.
+
+A check is "degraded" when it is slower than its threshold (or the outbox
+lags), and only "down" after HEALTH_FAILURE_THRESHOLD consecutive failures,
+so one dropped packet doesn't take the worker out of rotation. The worker
+is ready while the database is not down and the last probe is recent.
+
+Notifications are sent inline from the request handlers (see
+app.utils.fcm), so there is no notification queue to measure yet.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+from app.database import get_supabase
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_DEGRADED = "degraded"
+STATUS_DOWN = "down"
+STATUS_UNKNOWN = "unknown"
+
+# Checks that take the worker out of rotation when down
+CRITICAL_CHECKS = ("database",)
+
+
+class CheckResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.status = STATUS_UNKNOWN
+        self.latency_ms = None
+        self.detail = None
+        self.error = None
+        self.checked_at = None
+        self.consecutive_failures = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "latency_ms": self.latency_ms,
+            "detail": self.detail,
+            "error": self.error,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+        }
+
+
+def _probe_database():
+    get_supabase().table("users").select("id").limit(1).execute()
+
+
+def _probe_llm(timeout: float):
+    import httpx
+    settings = get_settings()
+    response = httpx.get(
+        f"{settings.llm_base_url}/models",
+        headers={"Authorization": f"Bearer {settings.openai_api_key}"},
+        timeout=timeout
+    )
+    response.raise_for_status()
+
+
+def _replication_lag() -> dict:
+    from app.storage.replication import oldest_pending_age, pending
+    from app.storage.sqlite import get_sqlite_client
+    local = get_sqlite_client()
+    return {"pending": pending(local), "lag_seconds": round(oldest_pending_age(local), 1)}
+
+
+class HealthMonitor:
+    def __init__(self):
+        self.settings = get_settings()
+        self.checks = {"database": CheckResult("database"), "llm": CheckResult("llm")}
+        if self.settings.storage_backend == "sqlite":
+            self.checks["replication"] = CheckResult("replication")
+        self.last_probe_at: Optional[float] = None
+        self._last_llm_probe: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run_check(self, result: CheckResult, probe, slow_ms: Optional[float] = None):
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(
+                run_in_threadpool(probe), timeout=self.settings.health_probe_timeout_seconds
+            )
+            result.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            result.detail = detail
+            result.error = None
+            result.consecutive_failures = 0
+            result.status = STATUS_DEGRADED if slow_ms is not None and result.latency_ms > slow_ms else STATUS_OK
+        except Exception as e:
+            result.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            result.error = str(e) or type(e).__name__
+            result.consecutive_failures += 1
+            result.status = (
+                STATUS_DOWN if result.consecutive_failures >= self.settings.health_failure_threshold
+                else STATUS_DEGRADED
+            )
+            logger.warning(f"Health check {result.name} failed ({result.consecutive_failures}x): {result.error}")
+        result.checked_at = datetime.now(timezone.utc)
+
+    async def probe(self):
+        """Refresh every check that is due"""
+        settings = self.settings
+        await self._run_check(self.checks["database"], _probe_database, settings.health_db_latency_threshold_ms)
+
+        now = time.monotonic()
+        if self._last_llm_probe is None or now - self._last_llm_probe >= settings.health_llm_probe_interval_seconds:
+            self._last_llm_probe = now
+            timeout = settings.health_probe_timeout_seconds
+            await self._run_check(self.checks["llm"], lambda: _probe_llm(timeout))
+
+        replication = self.checks.get("replication")
+        if replication is not None:
+            await self._run_check(replication, _replication_lag)
+            lag = (replication.detail or {}).get("lag_seconds", 0)
+            if replication.status == STATUS_OK and lag > settings.health_replication_lag_threshold_seconds:
+                replication.status = STATUS_DEGRADED
+
+        self.last_probe_at = time.monotonic()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.error(f"Health probe crashed: {str(e)}")
+            await asyncio.sleep(self.settings.health_probe_interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def stale(self) -> bool:
+        return self.last_probe_at is None or (
+            time.monotonic() - self.last_probe_at > self.settings.health_stale_after_seconds
+        )
+
+    @property
+    def ready(self) -> bool:
+        return not self.stale and all(
+            self.checks[name].status in (STATUS_OK, STATUS_DEGRADED) for name in CRITICAL_CHECKS
+        )
+
+    def snapshot(self) -> dict:
+        statuses = [check.status for check in self.checks.values()]
+        if self.last_probe_at is None:
+            overall = STATUS_UNKNOWN
+        elif not self.ready:
+            overall = "unhealthy"
+        elif all(status == STATUS_OK for status in statuses):
+            overall = "healthy"
+        else:
+            overall = STATUS_DEGRADED
+        return {
+            "status": overall,
+            "ready": self.ready,
+            "stale": self.stale,
+            "checks": {name: check.as_dict() for name, check in self.checks.items()},
+        }
+
+
+monitor = HealthMonitor()
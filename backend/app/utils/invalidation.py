@@ -0,0 +1,231 @@
+"""
+Cross-worker cache invalidation bus
+
+Every worker keeps in-process caches: version counters behind ETags and
+coalesced reads (app.utils.versions), the household directory and the pass
+index. A write only invalidates them in the worker that handled it. With
+INVALIDATION_BACKEND set, each invalidation is also published on a channel
+and applied by the other workers:
+
+    local     single process, nothing is published (default)
+    redis     Redis pub/sub, or any Redis-compatible server (Valkey, KeyDB);
+              needs the `redis` package
+    postgres  LISTEN/NOTIFY over a direct database connection (not
+              PostgREST); needs `psycopg` 3.2+
+
+INVALIDATION_URL is the redis:// or postgresql:// URL.
+
+Caches register a handler by name (bus.register) and publish through
+bus.publish(name, keys). Messages carry the sending worker's id and a
+sequence number; a receiver that sees a gap, or that reconnects after
+losing the connection, drops everything, since it may have missed a
+message. Publishing happens on a background thread so a write never waits
+for the broker. While the bus is configured but not connected, caches
+expire after INVALIDATION_FALLBACK_TTL_SECONDS instead of their usual TTL
+(see bus.ttl()).
+
+Handlers run on the event loop thread, like every other write to the
+version counters.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import secrets
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+from app.config import get_settings
+from app.utils.metrics import INVALIDATION_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_VERSION = 1
+# Listeners wake up this often to check whether they should stop
+POLL_SECONDS = 1.0
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError("INVALIDATION_BACKEND=redis needs the redis package")
+        self.client = redis.Redis.from_url(url)
+
+    def publish(self, channel: str, payload: str):
+        self.client.publish(channel, payload)
+
+    def listen(self, channel: str, stop: threading.Event) -> Iterator[Optional[str]]:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        try:
+            while not stop.is_set():
+                message = pubsub.get_message(timeout=POLL_SECONDS)
+                yield message["data"].decode() if message is not None else None
+        finally:
+            pubsub.close()
+
+
+class PostgresBackend:
+    def __init__(self, url: str):
+        if psycopg is None:
+            raise RuntimeError("INVALIDATION_BACKEND=postgres needs the psycopg package")
+        self.url = url
+        self._connection = None
+
+    def publish(self, channel: str, payload: str):
+        if self._connection is None or self._connection.closed:
+            self._connection = psycopg.connect(self.url, autocommit=True)
+        self._connection.execute("SELECT pg_notify(%s, %s)", (channel, payload))
+
+    def listen(self, channel: str, stop: threading.Event) -> Iterator[Optional[str]]:
+        with psycopg.connect(self.url, autocommit=True) as connection:
+            connection.execute(f'LISTEN "{channel}"')
+            while not stop.is_set():
+                for notify in connection.notifies(timeout=POLL_SECONDS):
+                    yield notify.payload
+                yield None
+
+
+BACKENDS = {"redis": RedisBackend, "postgres": PostgresBackend}
+
+
+class InvalidationBus:
+    def __init__(self):
+        self.settings = get_settings()
+        self.worker_id = secrets.token_hex(8)
+        self.backend = None
+        self.connected = False
+        self.last_error: Optional[str] = None
+        self._handlers: Dict[str, Callable[[Optional[List[str]]], None]] = {}
+        self._seq = itertools.count(1)
+        self._last_seen: Dict[str, int] = {}
+        self._outbox = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register(self, name: str, handler: Callable[[Optional[List[str]]], None]):
+        """Call `handler(keys)` when another worker invalidates `name`; keys=None means everything"""
+        self._handlers[name] = handler
+
+    def publish(self, name: str, keys: Optional[List[str]] = None):
+        """Tell the other workers to invalidate `name` (the caller has already invalidated its own copy)"""
+        if self.backend is None:
+            return
+        self._outbox.put({
+            "v": MESSAGE_VERSION,
+            "origin": self.worker_id,
+            "seq": next(self._seq),
+            "name": name,
+            "keys": keys,
+        })
+
+    def ttl(self, seconds: float) -> float:
+        """How long a cache entry may be trusted: `seconds`, or less while invalidations may be missed"""
+        if self.backend is None or self.connected:
+            return seconds
+        return min(seconds, self.settings.invalidation_fallback_ttl_seconds)
+
+    def invalidate_all(self):
+        for handler in self._handlers.values():
+            handler(None)
+
+    def receive(self, payload: str):
+        """Apply a message from the channel (on the event loop thread)"""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            INVALIDATION_MESSAGES.inc("dropped")
+            return
+        if message.get("v") != MESSAGE_VERSION or message.get("origin") == self.worker_id:
+            return
+
+        INVALIDATION_MESSAGES.inc("received")
+        previous = self._last_seen.get(message["origin"])
+        self._last_seen[message["origin"]] = message["seq"]
+        if previous is not None and message["seq"] != previous + 1:
+            # Missed a message from that worker: nothing cached can be trusted
+            logger.warning(f"Invalidation messages from worker {message['origin']} were missed, dropping all caches")
+            self.invalidate_all()
+            return
+
+        handler = self._handlers.get(message["name"])
+        if handler is not None:
+            handler(message["keys"])
+
+    def _publisher(self):
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                return
+            try:
+                self.backend.publish(self.settings.invalidation_channel, json.dumps(message))
+                INVALIDATION_MESSAGES.inc("published")
+            except Exception as e:
+                # Receivers see the gap in sequence numbers on the next message
+                INVALIDATION_MESSAGES.inc("dropped")
+                logger.warning(f"Failed to publish cache invalidation: {str(e)}")
+
+    def _listener(self):
+        while not self._stop.is_set():
+            try:
+                # listen() yields payloads, and None whenever it has been idle for POLL_SECONDS
+                for payload in self.backend.listen(self.settings.invalidation_channel, self._stop):
+                    if not self.connected:
+                        self._on_connected()
+                    if payload is not None:
+                        self._loop.call_soon_threadsafe(self.receive, payload)
+            except Exception as e:
+                self.connected = False
+                self.last_error = str(e) or type(e).__name__
+                logger.warning(f"Invalidation bus disconnected, retrying: {self.last_error}")
+                self._stop.wait(self.settings.invalidation_reconnect_seconds)
+
+    def _on_connected(self):
+        self.connected = True
+        self.last_error = None
+        # Anything published while we were away is lost
+        self._loop.call_soon_threadsafe(self.invalidate_all)
+
+    def start(self):
+        backend = self.settings.invalidation_backend
+        if backend == "local":
+            return
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown INVALIDATION_BACKEND: {backend}")
+        self.start_with(BACKENDS[backend](self.settings.invalidation_url))
+
+    def start_with(self, backend):
+        """Publish and listen through `backend` (see RedisBackend for the interface)"""
+        self.backend = backend
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._publisher, name="invalidation-publisher", daemon=True),
+            threading.Thread(target=self._listener, name="invalidation-listener", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        if self.backend is None:
+            return
+        self._stop.set()
+        self._outbox.put(None)
+        for thread in self._threads:
+            thread.join(timeout=POLL_SECONDS * 2)
+        self.backend = None
+        self.connected = False
+
+
+bus = InvalidationBus()
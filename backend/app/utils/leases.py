@@ -0,0 +1,36 @@
+"""
+Run a background job in one worker at a time
+
+Every uvicorn worker (and every host) runs the same lifespan, so the
+analytics rollup and the visitor compactor would otherwise run once per
+worker. Before each run a job takes its row in job_leases
+(migrations/005_visitor_analytics.sql) with a single conditional UPDATE:
+it succeeds when the lease has expired or this worker already holds it, so
+exactly one worker wins. The holder renews the lease on every run; when it
+stops, another worker takes over once the lease expires.
+"""
+import secrets
+from datetime import datetime, timedelta, timezone
+
+# Identifies this process as a lease holder
+HOLDER = secrets.token_hex(8)
+
+
+def acquire_lease(supabase, name: str, seconds: float) -> bool:
+    """
+    Take or renew the lease on `name` for `seconds`
+
+    Args:
+        supabase: Database client (service role)
+        name: Job name (a row of job_leases)
+        seconds: How long the lease lasts without renewal
+
+    Returns:
+        True if this worker holds the lease and should run the job
+    """
+    now = datetime.now(timezone.utc)
+    result = supabase.table("job_leases").update({
+        "holder": HOLDER,
+        "expires_at": (now + timedelta(seconds=seconds)).isoformat()
+    }).eq("name", name).or_(f'holder.eq.{HOLDER},expires_at.lt."{now.isoformat()}"').execute()
+    return bool(result.data)
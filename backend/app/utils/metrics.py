@@ -0,0 +1,249 @@
+"""
+Minimal Prometheus-compatible metrics
+
+Every metric keeps one shard (a plain dict) per thread that writes to it.
+A thread only ever mutates its own shard, so recording a sample is a dict
+lookup and an add with no lock; /metrics sums the shards when scraped. The
+only lock is taken once per thread, when its shard is first created.
+
+Threadpool workers come and go (anyio retires a worker after 10 s idle),
+so the shards of threads that have exited are folded into one retired
+total whenever a shard is created or the metric is scraped. The number of
+shards follows the number of live threads, and no sample is lost.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FANOUT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        # (thread, shard) of every live thread that has written, and the
+        # merged shards of the threads that have exited
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+        _registry.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._shards_lock:
+                self._retire_exited()
+                self._shards.append((threading.current_thread(), shard))
+            self._local.shard = shard
+            return shard
+
+    def _retire_exited(self):
+        # Called with _shards_lock held; an exited thread no longer writes its shard
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    def _merge(self, totals: dict, shard: dict):
+        for labels, value in shard.items():
+            totals[labels] = totals.get(labels, 0) + value
+
+    def _snapshots(self):
+        # dict.copy() is atomic under the GIL, so a writer on another
+        # thread can never make us iterate a dict mid-resize
+        with self._shards_lock:
+            self._retire_exited()
+            shards = [shard for _, shard in self._shards]
+            retired = self._retired.copy()
+        return [retired] + [shard.copy() for shard in shards]
+
+    def _format_labels(self, values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+    def _render_samples(self):
+        totals = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+        for labels, value in sorted(totals.items()):
+            yield f"{self.name}{self._format_labels(labels)} {value}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        # Only meaningful for series written by a single thread
+        shard = self._shard()
+        shard[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            # One slot per bucket plus +Inf, then sum and count
+            series = shard[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def _merge(self, totals: dict, shard: dict):
+        for labels, series in shard.items():
+            current = totals.get(labels)
+            totals[labels] = list(series) if current is None else [a + b for a, b in zip(current, series)]
+
+    def _render_samples(self):
+        totals = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+
+        bounds = [str(bucket) for bucket in self.buckets] + ["+Inf"]
+        for labels, series in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield f"{self.name}_bucket{self._format_labels(labels, ('le', bound))} {cumulative}"
+            yield f"{self.name}_sum{self._format_labels(labels)} {series[-2]}"
+            yield f"{self.name}_count{self._format_labels(labels)} {series[-1]}"
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format (0.0.4)"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# HTTP
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method",)
+)
+
+# Admission control
+ADMISSION_SHED = Counter(
+    "admission_shed_total", "Requests refused with 429 by admission control", ("lane", "reason")
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests holding an admission slot", ("lane",)
+)
+
+# Read coalescing (outcome: leader, shared or cached)
+COALESCE_REQUESTS = Counter(
+    "coalesce_requests_total", "Coalesced reads by query shape and whether they hit the database", ("shape", "outcome")
+)
+
+# Cross-worker cache invalidation (direction: published, received or dropped)
+INVALIDATION_MESSAGES = Counter(
+    "invalidation_messages_total", "Cache invalidation messages on the invalidation bus", ("direction",)
+)
+
+# Supabase / PostgREST
+DB_REQUESTS = Counter(
+    "supabase_requests_total", "PostgREST calls", ("table", "operation", "status")
+)
+DB_REQUEST_DURATION = Histogram(
+    "supabase_request_duration_seconds", "PostgREST call latency (until response headers)",
+    ("table", "operation")
+)
+DB_ROWS = Counter(
+    "supabase_rows_total", "Rows returned by PostgREST calls", ("table", "operation")
+)
+
+# Local storage replication (STORAGE_BACKEND=sqlite)
+REPLICATION_ROWS = Counter(
+    "storage_replicated_rows_total", "Outbox entries pushed to Supabase", ("table", "operation")
+)
+REPLICATION_PENDING = Gauge(
+    "storage_outbox_pending", "Outbox entries waiting to be pushed to Supabase"
+)
+REPLICATION_FAILURES = Counter(
+    "storage_replication_failures_total", "Failed attempts to push the outbox to Supabase"
+)
+
+# Occupancy
+OCCUPANCY_CORRECTIONS = Counter(
+    "occupancy_reconcile_corrections_total",
+    "Visitors the in-memory occupancy count was off by when checked against the database"
+)
+
+# LLM
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "Chat completion latency", ("model",)
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens", "Tokens used per chat completion", ("model", "kind"), buckets=TOKEN_BUCKETS
+)
+
+# Notifications
+NOTIFICATIONS_SENT = Counter(
+    "notifications_sent_total", "Notifications sent", ("target",)
+)
+NOTIFICATION_FANOUT = Histogram(
+    "notification_fanout_size", "Recipients resolved per notification", ("target",),
+    buckets=FANOUT_BUCKETS
+)
+
+
+def observe_llm_call(model: str, started: float, response):
+    """Record latency and token usage of a chat completion started at `started`"""
+    LLM_REQUEST_DURATION.observe(time.perf_counter() - started, model)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.observe(usage.prompt_tokens or 0, model, "prompt")
+        LLM_TOKENS.observe(usage.completion_tokens or 0, model, "completion")
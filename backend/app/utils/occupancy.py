@@ -0,0 +1,121 @@
+"""
+Live count of visitors inside the community
+
+Check-in and check-out handlers (the visitor routes, pass and offline gate
+check-ins, and the chat tools) adjust an in-memory counter per household,
+so GET /visitors/occupancy and the occupancy stream never query the
+database. The counter starts from, and every OCCUPANCY_RECONCILE_SECONDS is
+reset to, the checked-in visitors in the database. That corrects
+transitions made by other workers and any that raced the previous load.
+
+Towers are derived from the flat number: the part before the dash
+('T03-1204' -> 'T03'), else its leading letters ('A101' -> 'A').
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from app.config import get_settings
+from app.database import fetch_all, get_supabase
+from app.utils.directory import directory
+from app.utils.metrics import OCCUPANCY_CORRECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def tower_of(flat_no: str) -> str:
+    if "-" in flat_no:
+        return flat_no.split("-", 1)[0].upper()
+    match = re.match(r"[A-Za-z]+", flat_no)
+    return match.group(0).upper() if match else flat_no
+
+
+class Occupancy:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._inside: Optional[Counter] = None
+        self._loaded_at: Optional[float] = None
+        self.reconciled_at: Optional[datetime] = None
+        # Bumped on every change, so streams only send when something moved
+        self.version = 0
+
+    def reconcile(self):
+        """Reset the counts to the checked-in visitors in the database"""
+        supabase = get_supabase(True)
+        rows = fetch_all(
+            lambda: supabase.table("visitors").select("id, host_household_id").eq("status", "checked_in").order("id")
+        )
+        inside = Counter(row["host_household_id"] for row in rows)
+
+        with self._lock:
+            if self._inside is not None and self._inside != inside:
+                corrections = sum(abs(inside[h] - self._inside[h]) for h in set(inside) | set(self._inside))
+                OCCUPANCY_CORRECTIONS.inc(amount=corrections)
+                logger.info(f"Occupancy reconciled: corrected by {corrections}")
+            if self._inside != inside:
+                self.version += 1
+            self._inside = inside
+            self._loaded_at = time.monotonic()
+            self.reconciled_at = datetime.now(timezone.utc)
+
+    @property
+    def due(self) -> bool:
+        return self._loaded_at is None or (
+            time.monotonic() - self._loaded_at > get_settings().occupancy_reconcile_seconds
+        )
+
+    def _ensure_loaded(self):
+        if self.due:
+            self.reconcile()
+
+    def _add(self, household_id: str, amount: int):
+        with self._lock:
+            if self._inside is None:
+                # Not loaded yet; the first load reads this transition from the database
+                return
+            self._inside[household_id] = max(self._inside[household_id] + amount, 0)
+            self.version += 1
+
+    def checked_in(self, household_id: str, count: int = 1):
+        self._add(household_id, count)
+
+    def checked_out(self, household_id: str, count: int = 1):
+        self._add(household_id, -count)
+
+    def snapshot(self, household_id: Optional[str] = None) -> dict:
+        """
+        Visitors inside right now
+
+        Args:
+            household_id: Only count this household (None for the whole community)
+
+        Returns:
+            total, per household and per tower counts (households with
+            nobody inside are left out), and when the counts were last
+            checked against the database
+        """
+        self._ensure_loaded()
+        with self._lock:
+            inside = {h: n for h, n in self._inside.items() if n and (household_id is None or h == household_id)}
+            version, reconciled_at = self.version, self.reconciled_at
+
+        by_tower: Dict[str, int] = Counter()
+        for h, n in inside.items():
+            household = directory.get(h)
+            by_tower[tower_of(household["flat_no"]) if household else "unknown"] += n
+        return {
+            "total": sum(inside.values()),
+            "by_household": inside,
+            "by_tower": dict(by_tower),
+            "version": version,
+            "reconciled_at": reconciled_at,
+        }
+
+
+occupancy = Occupancy()
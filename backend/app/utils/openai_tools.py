@@ -1,21 +1,31 @@
-from openai import OpenAI
 from app.config import get_settings
 from app.database import get_supabase
 from app.models import VisitorStatus, EventType
 from app.schemas import ChatResponse
 from datetime import datetime
+from app.utils.coalesce import reads
+from app.utils.directory import directory
 from app.utils.fcm import send_notification, send_notification_to_household
+from app.utils.occupancy import occupancy
+from app.utils.versions import VISITORS_SCOPE, bump_visitors, bump_events, get_version, household_visitors_scope
+from app.utils.metrics import observe_llm_call
+from functools import lru_cache
 import json
 import logging
 import re
+import time
 
 settings = get_settings()
 
-# Initialize Groq client
-client = OpenAI(
-    api_key=settings.openai_api_key,  # Use your Groq API key here
-    base_url="https://api.groq.com/openai/v1"
-)
+
+@lru_cache()
+def get_llm_client():
+    """Groq client, created on the first chat message (importing openai takes ~0.4s)"""
+    from openai import OpenAI
+    return OpenAI(
+        api_key=settings.openai_api_key,  # Use your Groq API key here
+        base_url=settings.llm_base_url
+    )
 
 logger = logging.getLogger(__name__)
 
@@ -121,10 +131,11 @@ async def log_event(event_type: EventType, actor_user_id: str, subject_id: str,
         "actor_user_id": actor_user_id,
         "subject_id": subject_id,
         "payload": payload or {},
-        "timestamp": datetime.utcnow().isoformat()
+        "occurred_at": datetime.utcnow().isoformat()
     }
     try:
         supabase.table("events").insert(event_data).execute()
+        bump_events()
         logger.info(f"Logged event: {event_type.value} by {actor_user_id}")
     except Exception as e:
         logger.error(f"Failed to log event: {str(e)}")
@@ -183,6 +194,7 @@ async def approve_visitor_tool(visitor_name: str, current_user: dict):
         }
 
         supabase.table("visitors").update(update_data).eq("id", visitor["id"]).execute()
+        bump_visitors(visitor["host_household_id"])
 
         await log_event(
             EventType.VISITOR_APPROVED,
@@ -249,6 +261,7 @@ async def deny_visitor_tool(visitor_name: str, reason: str, current_user: dict):
         }
 
         supabase.table("visitors").update(update_data).eq("id", visitor["id"]).execute()
+        bump_visitors(visitor["host_household_id"])
 
         await log_event(
             EventType.VISITOR_DENIED,
@@ -297,6 +310,8 @@ async def checkin_visitor_tool(visitor_name: str, current_user: dict):
         }
 
         supabase.table("visitors").update(update_data).eq("id", visitor["id"]).execute()
+        bump_visitors(visitor["host_household_id"])
+        occupancy.checked_in(visitor["host_household_id"])
 
         await log_event(
             EventType.VISITOR_CHECKED_IN,
@@ -349,6 +364,8 @@ async def checkout_visitor_tool(visitor_name: str, current_user: dict):
         }
 
         supabase.table("visitors").update(update_data).eq("id", visitor["id"]).execute()
+        bump_visitors(visitor["host_household_id"])
+        occupancy.checked_out(visitor["host_household_id"])
 
         await log_event(
             EventType.VISITOR_CHECKED_OUT,
@@ -449,22 +466,27 @@ async def process_chat_message(message: str, current_user: dict) -> ChatResponse
     supabase = get_supabase()
 
     try:
-        # Get visitor context
+        # Get visitor context (shared by concurrent chats with the same scope)
         if "admin" in current_user.get("roles", []) or "guard" in current_user.get("roles", []):
-            visitors_result = supabase.table("visitors").select("*").order(
-                "created_at", desc=True
-            ).limit(10).execute()
+            query = supabase.table("visitors").select("*").order("created_at", desc=True).limit(10)
+            context_key = (VISITORS_SCOPE, get_version(VISITORS_SCOPE))
+        elif current_user.get("household_id"):
+            query = supabase.table("visitors").select("*").eq(
+                "host_household_id", current_user.get("household_id")
+            ).order("created_at", desc=True).limit(10)
+            scope = household_visitors_scope(current_user["household_id"])
+            context_key = (scope, get_version(scope))
         else:
-            if current_user.get("household_id"):
-                visitors_result = supabase.table("visitors").select("*").eq(
-                    "host_household_id", current_user.get("household_id")
-                ).order("created_at", desc=True).limit(10).execute()
-            else:
-                visitors_result = None
+            query = None
+
+        latest_visitors = await reads.run("chat_context", context_key, lambda: query.execute().data) if query else []
+
+        household = directory.get(current_user["household_id"]) if current_user.get("household_id") else None
+        flat_no = household["flat_no"] if household else "N/A"
 
         visitors_context = "Current visitors:\n"
-        if visitors_result and visitors_result.data:
-            for v in visitors_result.data:
+        if latest_visitors:
+            for v in latest_visitors:
                 visitors_context += f"- {v['name']} ({v['status']}, {v['phone']})\n"
         else:
             visitors_context += "No visitors\n"
@@ -475,7 +497,7 @@ async def process_chat_message(message: str, current_user: dict) -> ChatResponse
         CURRENT USER INFORMATION:
         - Name: {current_user.get('display_name')}
         - Role: {', '.join(current_user.get('roles', []))}
-        - Household ID: {current_user.get('household_id', 'N/A')}
+        - Flat: {flat_no}
         
         {visitors_context}
         
@@ -510,7 +532,8 @@ async def process_chat_message(message: str, current_user: dict) -> ChatResponse
         ]
 
         # Call Groq API with tools - using parallel tool calls disabled
-        response = client.chat.completions.create(
+        started = time.perf_counter()
+        response = get_llm_client().chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=messages,
             tools=tools,
@@ -519,6 +542,7 @@ async def process_chat_message(message: str, current_user: dict) -> ChatResponse
             temperature=0.7,
             max_tokens=1024
         )
+        observe_llm_call("llama-3.1-8b-instant", started, response)
 
         response_message = response.choices[0].message
         tool_calls = response_message.tool_calls
@@ -570,12 +594,14 @@ async def process_chat_message(message: str, current_user: dict) -> ChatResponse
         })
 
         # Get final response
-        final_response = client.chat.completions.create(
+        started = time.perf_counter()
+        final_response = get_llm_client().chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=messages,
             temperature=0.7,
             max_tokens=512
         )
+        observe_llm_call("llama-3.1-8b-instant", started, final_response)
 
         return ChatResponse(
             response=final_response.choices[0].message.content,
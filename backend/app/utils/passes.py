@@ -0,0 +1,145 @@
+"""
+In-memory index of recurring visitor passes
+
+Daily staff (maids, cooks, drivers, newspaper delivery) get a pass per
+household: days of the week plus a time window in COMMUNITY_TIMEZONE.
+Active passes are loaded in one paged query and indexed by id, by phone
+number and by household, so checking a pass holder in at the gate is a dict
+lookup plus the visitor insert. The index is reloaded after any worker
+changes a pass (see app.utils.invalidation), when an unknown pass id comes
+in, and otherwise every PASS_INDEX_TTL_SECONDS.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as time_of_day
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+from app.config import get_settings
+from app.database import fetch_all, get_supabase
+from app.utils.invalidation import bus
+from app.utils.visitor_search import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+# Staff often arrive a little early; let them in this long before the window
+PASS_EARLY_MINUTES = 15
+# An unknown pass id triggers a reload at most this often
+MISS_RELOAD_SECONDS = 5.0
+# Phones match on their last digits, with or without the country code
+PHONE_MATCH_DIGITS = 10
+
+
+def community_now() -> datetime:
+    """Current local time of the community"""
+    return datetime.now(ZoneInfo(get_settings().community_timezone))
+
+
+def phone_key(phone: str) -> str:
+    return normalize_phone(phone)[-PHONE_MATCH_DIGITS:]
+
+
+def _parse_time(value) -> time_of_day:
+    return value if isinstance(value, time_of_day) else time_of_day.fromisoformat(value)
+
+
+def _parse_date(value) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+def pass_allows(visitor_pass: dict, at: datetime) -> bool:
+    """
+    Whether a pass lets its holder in at a local time
+
+    Args:
+        visitor_pass: Pass row (days_of_week, start_time, end_time, valid_from, valid_until, active)
+        at: Local time in the community's time zone
+
+    Returns:
+        True if `at` falls on one of the pass's days, inside its window
+        (opening PASS_EARLY_MINUTES early) and its validity dates
+    """
+    if not visitor_pass.get("active", True):
+        return False
+
+    valid_from = _parse_date(visitor_pass.get("valid_from"))
+    valid_until = _parse_date(visitor_pass.get("valid_until"))
+    if (valid_from and at.date() < valid_from) or (valid_until and at.date() > valid_until):
+        return False
+
+    # Compare wall-clock times on the local date
+    opens = datetime.combine(at.date(), _parse_time(visitor_pass["start_time"])) - timedelta(minutes=PASS_EARLY_MINUTES)
+    closes = datetime.combine(at.date(), _parse_time(visitor_pass["end_time"]))
+    local = at.replace(tzinfo=None)
+    return at.weekday() in visitor_pass["days_of_week"] and opens <= local <= closes
+
+
+class PassIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._passes: Dict[str, dict] = {}
+        self._by_phone: Dict[str, List[str]] = {}
+        self._by_household: Dict[str, List[str]] = {}
+        self._loaded_at: Optional[float] = None
+
+    def refresh(self):
+        supabase = get_supabase(True)
+        rows = fetch_all(
+            lambda: supabase.table("visitor_passes").select("*").eq("active", True).order("id")
+        )
+
+        by_phone: Dict[str, List[str]] = {}
+        by_household: Dict[str, List[str]] = {}
+        for row in rows:
+            by_phone.setdefault(phone_key(row["phone"]), []).append(row["id"])
+            by_household.setdefault(row["host_household_id"], []).append(row["id"])
+
+        with self._lock:
+            self._passes = {row["id"]: row for row in rows}
+            self._by_phone = by_phone
+            self._by_household = by_household
+            self._loaded_at = time.monotonic()
+        logger.info(f"Visitor pass index loaded: {len(rows)} active passes")
+
+    def invalidate(self):
+        """Reload on next use, here and in other workers (call after creating or revoking a pass)"""
+        self.expire()
+        bus.publish("passes")
+
+    def expire(self, keys=None):
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        ttl = bus.ttl(get_settings().pass_index_ttl_seconds)
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > ttl:
+            self.refresh()
+
+    def get(self, pass_id: str) -> Optional[dict]:
+        self._ensure_loaded()
+        if pass_id not in self._passes and time.monotonic() - self._loaded_at > MISS_RELOAD_SECONDS:
+            # Probably created by another worker since the last load
+            self.refresh()
+        return self._passes.get(pass_id)
+
+    def for_phone(self, phone: str) -> List[dict]:
+        """Active passes held by a phone number (one per household the holder works for)"""
+        self._ensure_loaded()
+        return [self._passes[pass_id] for pass_id in self._by_phone.get(phone_key(phone), [])]
+
+    def for_household(self, household_id: str) -> List[dict]:
+        self._ensure_loaded()
+        return [self._passes[pass_id] for pass_id in self._by_household.get(household_id, [])]
+
+    def all(self) -> List[dict]:
+        self._ensure_loaded()
+        return list(self._passes.values())
+
+
+passes = PassIndex()
+bus.register("passes", passes.expire)
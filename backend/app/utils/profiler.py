@@ -0,0 +1,216 @@
+"""
+On-demand statistical profiler for live requests
+
+ProfilerMiddleware picks requests to profile: every request under the
+configured route prefix, plus a random sample_rate fraction of all other
+requests. At most max_per_minute requests are profiled, and only one at a
+time. For a picked request, a background thread samples the stack of the
+event loop thread every interval_ms. No tracing hooks are installed, so
+requests that are not picked pay only the sampling decision.
+
+Only code running on the event loop thread is covered: the async handlers
+(every route of this app is `async def`) and the blocking calls they make
+inline, such as supabase-py queries. Work handed to the threadpool (sync
+dependencies, run_in_threadpool reads and exports) shows up as the handler
+waiting in the event loop, not as its own stacks; the threadpool is shared
+by every request, so its threads cannot be attributed to the profiled one.
+Each profile records the sampled thread.
+
+Finished profiles are kept in a small in-memory ring buffer and can be
+downloaded from the admin endpoints as collapsed stacks (flamegraph.pl,
+speedscope, inferno) or as speedscope JSON.
+"""
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.config import get_settings
+
+MAX_STORED_PROFILES = 50
+MAX_STACK_DEPTH = 128
+
+
+class ProfilerConfig:
+    def __init__(self):
+        settings = get_settings()
+        self.enabled = settings.profiler_enabled
+        self.route = settings.profiler_route
+        self.sample_rate = settings.profiler_sample_rate
+        self.max_per_minute = settings.profiler_max_per_minute
+        self.interval_ms = settings.profiler_interval_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "route": self.route,
+            "sample_rate": self.sample_rate,
+            "max_per_minute": self.max_per_minute,
+            "interval_ms": self.interval_ms,
+        }
+
+
+config = ProfilerConfig()
+profiles = deque(maxlen=MAX_STORED_PROFILES)
+
+_recent_starts = deque()
+_active = threading.Event()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, target_thread_id: int, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _should_profile(path: str) -> bool:
+    if not config.enabled or _active.is_set():
+        return False
+
+    matches_route = bool(config.route) and path.startswith(config.route)
+    if not matches_route and not (config.sample_rate > 0 and random.random() < config.sample_rate):
+        return False
+
+    # Hard cap on profiled requests per rolling minute
+    now = time.monotonic()
+    while _recent_starts and now - _recent_starts[0] > 60:
+        _recent_starts.popleft()
+    if len(_recent_starts) >= config.max_per_minute:
+        return False
+
+    _recent_starts.append(now)
+    return True
+
+
+class ProfilerMiddleware:
+    """ASGI middleware that profiles selected requests (see module docstring)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        _active.set()
+        status = {"code": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        # The event loop thread (see the module docstring)
+        sampler = _Sampler(threading.get_ident(), config.interval_ms / 1000)
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Joining the sampler can take up to one interval; don't block the loop for it
+            await run_in_threadpool(sampler.stop)
+            _active.clear()
+            route = scope.get("route")
+            profiles.append({
+                "id": str(uuid.uuid4()),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status["code"],
+                "started_at": started_at.isoformat(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "interval_ms": config.interval_ms,
+                "thread": "event_loop",
+                "samples": sampler.samples,
+                "stacks": sampler.stacks,
+            })
+
+
+def profile_summary(profile: dict) -> dict:
+    return {key: value for key, value in profile.items() if key != "stacks"}
+
+
+def find_profile(profile_id: str) -> Optional[dict]:
+    for profile in profiles:
+        if profile["id"] == profile_id:
+            return profile
+    return None
+
+
+def to_collapsed(profile: dict) -> str:
+    """Brendan Gregg's collapsed stack format: `frame;frame;frame count` per line"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(profile["stacks"].items()))
+
+
+def to_speedscope(profile: dict) -> dict:
+    """speedscope.app file format with one sampled profile"""
+    frames = []
+    frame_index = {}
+    samples = []
+    weights = []
+    for stack, count in profile["stacks"].items():
+        indexes = []
+        for label in stack.split(";"):
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                name, _, location = label.rpartition(" (")
+                file, _, line = location.rstrip(")").rpartition(":")
+                frames.append({"name": name, "file": file, "line": int(line) if line.isdigit() else None})
+            indexes.append(frame_index[label])
+        samples.append(indexes)
+        weights.append(count * profile["interval_ms"])
+
+    name = f"{profile['method']} {profile['path']} ({profile['started_at']})"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "community-api",
+    }
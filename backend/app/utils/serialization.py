@@ -0,0 +1,40 @@
+from typing import Any, Type
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+from app.config import get_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def fast_json_enabled() -> bool:
+    return get_settings().fast_json and orjson is not None
+
+
+def default_response_class() -> Type[Response]:
+    """Response class for the app: orjson when FAST_JSON is on and installed"""
+    return ORJSONResponse if fast_json_enabled() else JSONResponse
+
+
+def prevalidated(content: Any, response: Response) -> Any:
+    """
+    Return rows that already have the response model's shape
+
+    With FAST_JSON on, the content is serialized straight away with orjson,
+    skipping FastAPI's response_model validation and jsonable_encoder pass.
+    Only use it for rows selected with exactly the response model's columns.
+    Otherwise the content is returned unchanged for the normal path.
+
+    Args:
+        content: Rows (or a dict of rows) as returned by Supabase
+        response: The endpoint's injected Response, whose headers (ETag,
+            Cache-Control) are carried over to the fast response
+    """
+    if not fast_json_enabled():
+        return content
+
+    fast_response = ORJSONResponse(content)
+    fast_response.headers.update(response.headers)
+    return fast_response
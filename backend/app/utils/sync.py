@@ -0,0 +1,77 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Statuses a gate device needs to hold locally; anything else is sent as a removal
+SYNC_ACTIVE_STATUSES = ["approved", "checked_in"]
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 2000
+EPOCH = "1970-01-01T00:00:00+00:00"
+
+
+def encode_cursor(cursor: dict) -> str:
+    """Encode a sync position as an opaque URL-safe string"""
+    raw = json.dumps(cursor, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Optional[dict]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Returns:
+        The cursor dict, or None if the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        cursor = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(cursor, dict):
+        return None
+
+    # Cursor values end up inside a PostgREST filter, so only accept
+    # well-formed timestamps and UUIDs
+    try:
+        for key in ("u", "t"):
+            datetime.fromisoformat(cursor[key])
+        for key in ("i", "ti"):
+            if cursor.get(key):
+                uuid.UUID(cursor[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return cursor
+
+
+def sync_horizon(lag_seconds: float) -> str:
+    """
+    Newest change a sync may hand out
+
+    updated_at/deleted_at are stamped when the row is written, not when the
+    transaction commits, so a change can become visible after a cursor has
+    already moved past its timestamp. Changes newer than the horizon are left
+    for a later sync instead.
+    """
+    return (datetime.now(timezone.utc) - timedelta(seconds=lag_seconds)).isoformat()
+
+
+def capped(timestamp: Optional[str], horizon: str) -> str:
+    """`timestamp` (the epoch when there is none), or `horizon` if that is earlier"""
+    if timestamp is None:
+        return EPOCH
+    return horizon if datetime.fromisoformat(horizon) < datetime.fromisoformat(timestamp) else timestamp
+
+
+def keyset_filter(column: str, value: str, id_column: str, last_id: Optional[str]) -> str:
+    """
+    Build a PostgREST `or` filter selecting rows strictly after (value, last_id)
+
+    Rows sharing the same timestamp (e.g. a batch update) are paged by id so
+    a page boundary never skips or repeats rows.
+    """
+    if not last_id:
+        return f'{column}.gt."{value}"'
+    return f'{column}.gt."{value}",and({column}.eq."{value}",{id_column}.gt.{last_id})'
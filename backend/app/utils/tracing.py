@@ -0,0 +1,203 @@
+"""
+Request-scoped tracing of PostgREST round trips
+
+The HTTP middleware opens a RequestTrace in a context variable. Every
+PostgREST call made while handling the request (see app.database) is added
+to it as a span. When the request finishes, the trace is summarised in a
+Server-Timing header and a structured log line. If TRACE_EXPORT_PATH is
+set, it is also appended to that file as OTLP/JSON, which the OpenTelemetry
+Collector's otlpjsonfile receiver can pick up.
+"""
+import json
+import logging
+import queue
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "community-api"
+
+# OTLP enums
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class RequestTrace:
+    def __init__(self, method: str, path: str):
+        self.trace_id = secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.method = method
+        self.path = path
+        self.route = path
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status_code = None
+        self.db_spans = []
+
+    def add_db_call(self, table: str, operation: str, start_ns: int, end_ns: int, rows: int, status_code: int):
+        self.db_spans.append({
+            "span_id": secrets.token_hex(8),
+            "table": table,
+            "operation": operation,
+            "start_ns": start_ns,
+            "end_ns": end_ns,
+            "rows": rows,
+            "status_code": status_code,
+        })
+
+    @property
+    def db_time_ms(self) -> float:
+        return sum(span["end_ns"] - span["start_ns"] for span in self.db_spans) / 1e6
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_time_ms:.1f};desc="{len(self.db_spans)} calls", '
+            f'total;dur={self.duration_ms:.1f}'
+        )
+
+    def summary(self) -> dict:
+        calls = {}
+        for span in self.db_spans:
+            key = f"{span['operation']} {span['table']}"
+            calls[key] = calls.get(key, 0) + 1
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "route": self.route,
+            "status": self.status_code,
+            "duration_ms": round(self.duration_ms, 2),
+            "db_calls": len(self.db_spans),
+            "db_time_ms": round(self.db_time_ms, 2),
+            "db_rows": sum(span["rows"] for span in self.db_spans),
+            "calls": calls,
+        }
+
+    def to_otlp(self) -> dict:
+        def attributes(**values):
+            return [
+                {"key": key, "value": {"intValue": str(value)} if isinstance(value, int) else {"stringValue": str(value)}}
+                for key, value in values.items()
+            ]
+
+        spans = [{
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": f"{self.method} {self.route}",
+            "kind": SPAN_KIND_SERVER,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": attributes(**{
+                "http.request.method": self.method,
+                "http.route": self.route,
+                "http.response.status_code": self.status_code or 0,
+                "db.call_count": len(self.db_spans),
+            }),
+            "status": {"code": STATUS_ERROR if (self.status_code or 500) >= 500 else STATUS_OK},
+        }]
+        for span in self.db_spans:
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": span["span_id"],
+                "parentSpanId": self.span_id,
+                "name": f"{span['operation']} {span['table']}",
+                "kind": SPAN_KIND_CLIENT,
+                "startTimeUnixNano": str(span["start_ns"]),
+                "endTimeUnixNano": str(span["end_ns"]),
+                "attributes": attributes(**{
+                    "db.system": "postgresql",
+                    "db.collection.name": span["table"],
+                    "db.operation.name": span["operation"],
+                    "db.response.returned_rows": span["rows"],
+                    "http.response.status_code": span["status_code"],
+                }),
+                "status": {"code": STATUS_ERROR if span["status_code"] >= 400 else STATUS_OK},
+            })
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": attributes(**{"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }]
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def start_trace(method: str, path: str) -> RequestTrace:
+    trace = RequestTrace(method, path)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def record_db_call(table: str, operation: str, elapsed: float, rows: int, status_code: int):
+    """Attach a finished PostgREST call to the current request's trace, if any"""
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    end_ns = time.time_ns()
+    trace.add_db_call(table, operation, end_ns - int(elapsed * 1e9), end_ns, rows, status_code)
+
+
+class _OtlpFileExporter:
+    """Appends OTLP/JSON lines to a file from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="otlp-file-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, payload: dict):
+        self._queue.put(payload)
+
+    def _run(self):
+        while True:
+            payload = self._queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to export trace to {self.path}: {str(e)}")
+
+
+_exporter = None
+
+
+def _get_exporter() -> Optional[_OtlpFileExporter]:
+    global _exporter
+    path = get_settings().trace_export_path
+    if not path:
+        return None
+    if _exporter is None or _exporter.path != path:
+        _exporter = _OtlpFileExporter(path)
+    return _exporter
+
+
+def finish_trace(trace: RequestTrace, status_code: int, route: Optional[str] = None):
+    """Close the trace, log its summary and export it"""
+    trace.end_ns = time.time_ns()
+    trace.status_code = status_code
+    if route:
+        trace.route = route
+
+    logger.info(json.dumps({"event": "request_trace", **trace.summary()}))
+
+    exporter = _get_exporter()
+    if exporter is not None:
+        exporter.export(trace.to_otlp())
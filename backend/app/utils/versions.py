@@ -0,0 +1,87 @@
+import hashlib
+import json
+import secrets
+from collections import defaultdict
+from typing import Any, List, Optional
+from app.utils.invalidation import bus
+
+# Regenerated on every start so ETags handed out by a previous process
+# (or another worker) never match this one's counters
+EPOCH = secrets.token_hex(8)
+
+VISITORS_SCOPE = "visitors"
+EVENTS_SCOPE = "events"
+GATE_REVOCATIONS_SCOPE = "gate_revocations"
+
+# Version counters are process-local and only ever incremented on the
+# event loop thread, so plain ints are enough
+_versions = defaultdict(int)
+
+
+def household_visitors_scope(household_id: str) -> str:
+    return f"visitors:household:{household_id}"
+
+
+def get_version(scope: str) -> int:
+    return _versions[scope]
+
+
+def _bump_local(scopes: Optional[List[str]]):
+    # None: another worker's messages were missed, so every scope may have changed
+    for scope in list(_versions) if scopes is None else scopes:
+        _versions[scope] += 1
+
+
+def bump(*scopes: str):
+    """Invalidate reads of `scopes` in this worker and, over the invalidation bus, in the others"""
+    _bump_local(scopes)
+    bus.publish("versions", list(scopes))
+
+
+bus.register("versions", _bump_local)
+
+
+def bump_visitors(household_id: Optional[str]):
+    """Invalidate visitor reads after a visitor was created or changed state"""
+    if household_id:
+        bump(VISITORS_SCOPE, household_visitors_scope(household_id))
+    else:
+        bump(VISITORS_SCOPE)
+
+
+def bump_events():
+    """Invalidate audit log reads after an event was inserted"""
+    bump(EVENTS_SCOPE)
+
+
+def make_etag(scope: str, key: str = "") -> str:
+    """
+    Build a strong ETag for a read of `scope`
+
+    Args:
+        scope: Version counter the response depends on
+        key: Anything else that changes the response body (role scope, path params)
+    """
+    raw = f"{EPOCH}:{scope}:{get_version(scope)}:{key}".encode()
+    return f'"{hashlib.sha256(raw).hexdigest()[:32]}"'
+
+
+def content_etag(content: Any) -> str:
+    """Strong ETag from a response body, for reads no version counter tracks"""
+    raw = json.dumps(content, sort_keys=True, default=str).encode()
+    return f'"{hashlib.sha256(raw).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from app.schemas import VisitorCreate
+
+# Rows are inserted in chunks of this size so a 500 guest list is a handful
+# of round trips instead of one insert per guest
+IMPORT_CHUNK_SIZE = 100
+IMPORT_MAX_ROWS = 1000
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv", "application/vnd.ms-excel"}
+JSONL_CONTENT_TYPES = {"application/jsonl", "application/x-ndjson", "application/x-jsonlines"}
+
+
+def detect_import_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """
+    Work out whether an uploaded guest list is CSV or JSONL
+
+    Args:
+        filename: Uploaded file name
+        content_type: Uploaded file content type
+
+    Returns:
+        "csv", "jsonl" or None if the format is not supported
+    """
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES:
+        return "csv"
+    if content_type in JSONL_CONTENT_TYPES:
+        return "jsonl"
+    return None
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+def _clean_csv_row(row: dict) -> dict:
+    # Empty CSV cells mean "not provided", not an empty string
+    return {
+        key.strip(): value.strip() if value and value.strip() else None
+        for key, value in row.items()
+        if key
+    }
+
+
+def iter_import_rows(fileobj: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[VisitorCreate], Optional[str]]]:
+    """
+    Lazily parse and validate an uploaded guest list
+
+    The file is read line by line so memory use does not grow with the
+    size of the upload.
+
+    Args:
+        fileobj: Binary file object of the upload
+        fmt: "csv" or "jsonl"
+
+    Yields:
+        (row number, validated visitor or None, error message or None)
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            # Row 1 is the header line
+            for row_no, row in enumerate(reader, start=2):
+                if not any(value for value in row.values() if isinstance(value, str) and value.strip()):
+                    continue
+                try:
+                    yield row_no, VisitorCreate(**_clean_csv_row(row)), None
+                except ValidationError as e:
+                    yield row_no, None, _format_validation_error(e)
+        else:
+            for row_no, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield row_no, None, f"Invalid JSON: {e.msg}"
+                    continue
+                if not isinstance(record, dict):
+                    yield row_no, None, "Each line must be a JSON object"
+                    continue
+                try:
+                    yield row_no, VisitorCreate(**record), None
+                except ValidationError as e:
+                    yield row_no, None, _format_validation_error(e)
+    except UnicodeDecodeError:
+        yield 0, None, "File must be UTF-8 encoded"
+    finally:
+        # Leave closing the underlying upload to the framework
+        text.detach()
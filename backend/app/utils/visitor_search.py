@@ -0,0 +1,134 @@
+"""
+Visitor search by partial name or phone number
+
+The search_visitors RPC (migrations/002_visitor_search.sql) matches on the
+name normalized as normalize_name() does (lower-cased, accents stripped)
+and on the phone number's digits, both backed by trigram indexes, and
+ranks in the database. Where the RPC is not available (the SQLite
+backend, or the migration has not been applied) a narrowed ilike query
+fetches candidates and they are ranked here with the same rules:
+
+    0. name starts with the query, or the phone starts/ends with its digits
+    1. a later word of the name starts with the query
+    2. the query appears anywhere in the name or phone
+    3. fuzzy name match (trigram similarity, RPC only)
+
+then visitors still expected at the gate (pending/approved/checked in)
+first, then newest first.
+"""
+import logging
+import re
+import time
+import unicodedata
+from typing import List, Optional
+from app.schemas import VisitorResponse
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 50
+SEARCH_MIN_QUERY_LENGTH = 2
+# Phone matching needs at least this many digits, or "12" matches everyone
+SEARCH_MIN_PHONE_DIGITS = 3
+# Most candidate rows the fallback ranks in Python
+SEARCH_FALLBACK_CANDIDATES = 500
+# After the RPC fails, use the fallback for this long before trying it again
+RPC_RETRY_SECONDS = 300.0
+
+ACTIVE_STATUSES = ("pending", "approved", "checked_in")
+
+_rpc_unavailable_until = 0.0
+
+
+def normalize_name(value: str) -> str:
+    """Lower-case, strip accents and collapse whitespace"""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return " ".join(value.lower().split())
+
+
+def normalize_phone(value: str) -> str:
+    """Digits only: '+91 98765-43210' -> '919876543210'"""
+    return re.sub(r"\D", "", value or "")
+
+
+def match_rank(visitor: dict, name_q: str, phone_q: str) -> Optional[int]:
+    """
+    Rank class of a visitor for a normalized query
+
+    Returns:
+        0 (best) to 2, or None if the visitor does not match
+    """
+    name = normalize_name(visitor.get("name"))
+    phone = normalize_phone(visitor.get("phone")) if len(phone_q) >= SEARCH_MIN_PHONE_DIGITS else ""
+
+    if name.startswith(name_q) or (phone and (phone.startswith(phone_q) or phone.endswith(phone_q))):
+        return 0
+    if f" {name_q}" in name:
+        return 1
+    if name_q in name or (phone and phone_q in phone):
+        return 2
+    return None
+
+
+def _candidates_filter(name_q: str, phone_q: str) -> str:
+    """PostgREST `or` filter over-selecting the visitors that can match"""
+    # Characters that would break the filter syntax or act as wildcards
+    name_like = re.sub(r"[,()\"\\:%_*]", "", name_q)
+    conditions = [f"name.ilike.%{name_like}%"]
+    if len(phone_q) >= SEARCH_MIN_PHONE_DIGITS:
+        # Digits in order with anything in between, so formatted numbers match
+        conditions.append(f"phone.ilike.%{'%'.join(phone_q)}%")
+    return ",".join(conditions)
+
+
+def _search_fallback(supabase, name_q: str, phone_q: str, household_id: Optional[str], limit: int) -> List[dict]:
+    query = supabase.table("visitors").select(", ".join(VisitorResponse.model_fields)).or_(
+        _candidates_filter(name_q, phone_q)
+    )
+    if household_id:
+        query = query.eq("host_household_id", household_id)
+    rows = query.order("created_at", desc=True).limit(SEARCH_FALLBACK_CANDIDATES).execute().data
+
+    # Rows come newest first and the sort is stable, so ties stay newest first
+    ranked = []
+    for row in rows:
+        rank = match_rank(row, name_q, phone_q)
+        if rank is not None:
+            ranked.append((rank, row.get("status") not in ACTIVE_STATUSES, row))
+    ranked.sort(key=lambda item: item[:2])
+    return [row for _, _, row in ranked[:limit]]
+
+
+def search_visitors(supabase, query: str, household_id: Optional[str] = None,
+                    limit: int = SEARCH_DEFAULT_LIMIT) -> List[dict]:
+    """
+    Find visitors by partial name or phone number, best match first
+
+    Args:
+        supabase: Database client
+        query: Search text as typed by the user
+        household_id: Only search this household's visitors (None for all)
+        limit: Maximum number of results
+
+    Returns:
+        Visitor rows with exactly the VisitorResponse fields
+    """
+    global _rpc_unavailable_until
+
+    name_q = normalize_name(query)
+    phone_q = normalize_phone(query)
+
+    if time.monotonic() >= _rpc_unavailable_until:
+        try:
+            rows = supabase.rpc("search_visitors", {
+                "query": name_q,
+                "household": household_id,
+                "max_results": limit
+            }).execute().data
+            return [{field: row.get(field) for field in VisitorResponse.model_fields} for row in rows]
+        except Exception as e:
+            _rpc_unavailable_until = time.monotonic() + RPC_RETRY_SECONDS
+            logger.warning(f"search_visitors RPC unavailable, using the ilike fallback: {str(e)}")
+
+    return _search_fallback(supabase, name_q, phone_q, household_id, limit)
@@ -0,0 +1,302 @@
+"""
+Load test of the visitor lifecycle: create -> approve -> checkin -> checkout
+
+Seeds a set of households (one resident each) and guards, then runs
+--visitors lifecycles with --concurrency workers. Each lifecycle picks a
+household and a guard, and the resident creates and approves the visitor
+while the guard checks it in and out. Latency, status codes and errors are
+recorded per endpoint.
+
+By default the app runs in-process (httpx ASGI transport) against the
+in-memory FakeSupabase from the test suite. That measures the app's own
+overhead: routing, auth, validation, serialization and the number of
+database round trips. With --base-url the requests go to a running server
+instead. It must share SECRET_KEY with this process and use the same
+Supabase/PostgREST instance (SUPABASE_URL), which the households and users
+are seeded into. Point it at a local PostgREST, not at production.
+
+The JSON report (--output) has the parameters, the git commit and the
+per-endpoint results, so runs on two commits can be compared with
+--compare.
+
+Usage (from backend/):
+    python -m benchmarks.lifecycle --households 2000 --guards 20 --visitors 5000 --concurrency 32
+    python -m benchmarks.lifecycle --base-url http://localhost:8000 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+import app.database
+from app.auth import create_access_token
+
+STEPS = (
+    ("create", "POST /visitors/"),
+    ("approve", "POST /visitors/approve"),
+    ("checkin", "POST /visitors/checkin"),
+    ("checkout", "POST /visitors/checkout"),
+)
+SEED_CHUNK_SIZE = 500
+
+
+def use_in_memory_database():
+    """Point every `get_supabase()` in the app at one FakeSupabase"""
+    from tests.fake_supabase import FakeSupabase
+    from tests.factories import TABLE_DEFAULTS
+
+    db = FakeSupabase()
+    db.defaults = TABLE_DEFAULTS
+    original = app.database.get_supabase
+    for module in list(sys.modules.values()):
+        if getattr(module, "__name__", "").startswith("app") and getattr(module, "get_supabase", None) is original:
+            module.get_supabase = lambda *args, **kwargs: db
+    return db
+
+
+def insert_chunked(supabase, table, rows):
+    inserted = []
+    for start in range(0, len(rows), SEED_CHUNK_SIZE):
+        result = supabase.table(table).insert(rows[start:start + SEED_CHUNK_SIZE]).execute()
+        inserted.extend(result.data)
+    return inserted
+
+
+def seed(supabase, run_id, households, guards):
+    """Create the households, residents and guards of this run; returns their tokens"""
+    household_rows = insert_chunked(supabase, "households", [
+        {"flat_no": f"LT{run_id}-{i:05d}", "name": f"Load Test Household {i}"}
+        for i in range(households)
+    ])
+    resident_rows = insert_chunked(supabase, "users", [
+        {
+            "email": f"loadtest.{run_id}.resident{i}@example.com",
+            "display_name": f"Load Test Resident {i}",
+            "household_id": household["id"],
+            "roles": ["resident"],
+        }
+        for i, household in enumerate(household_rows)
+    ])
+    guard_rows = insert_chunked(supabase, "users", [
+        {
+            "email": f"loadtest.{run_id}.guard{i}@example.com",
+            "display_name": f"Load Test Guard {i}",
+            "roles": ["guard"],
+        }
+        for i in range(guards)
+    ])
+
+    def token(user):
+        return create_access_token({
+            "sub": user["id"],
+            "roles": user["roles"],
+            "household_id": user.get("household_id"),
+        })
+
+    return [token(user) for user in resident_rows], [token(user) for user in guard_rows]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {endpoint: [] for _, endpoint in STEPS}
+        self.statuses = {endpoint: {} for _, endpoint in STEPS}
+        self.exceptions = {endpoint: 0 for _, endpoint in STEPS}
+        self.completed = 0
+
+    async def call(self, client, endpoint, token, json_body):
+        method, path = endpoint.split(" ", 1)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=json_body,
+                                            headers={"Authorization": f"Bearer {token}"})
+        except httpx.HTTPError:
+            self.exceptions[endpoint] += 1
+            return None
+        finally:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+        status = str(response.status_code)
+        self.statuses[endpoint][status] = self.statuses[endpoint].get(status, 0) + 1
+        return response if response.status_code < 400 else None
+
+
+async def lifecycle(client, recorder, number, resident_token, guard_token):
+    created = await recorder.call(client, "POST /visitors/", resident_token, {
+        "name": f"Load Test Visitor {number}",
+        "phone": f"+9190{number:08d}",
+        "purpose": "Delivery",
+    })
+    if created is None:
+        return
+    visitor_id = created.json()["id"]
+
+    for endpoint, token in (
+        ("POST /visitors/approve", resident_token),
+        ("POST /visitors/checkin", guard_token),
+        ("POST /visitors/checkout", guard_token),
+    ):
+        if await recorder.call(client, endpoint, token, {"visitor_id": visitor_id}) is None:
+            return
+    recorder.completed += 1
+
+
+async def run_load(client, recorder, args, resident_tokens, guard_tokens):
+    rng = random.Random(args.seed)
+    work = asyncio.Queue()
+    for number in range(args.visitors):
+        work.put_nowait((number, rng.choice(resident_tokens), rng.choice(guard_tokens)))
+
+    async def worker():
+        while not work.empty():
+            number, resident_token, guard_token = work.get_nowait()
+            await lifecycle(client, recorder, number, resident_token, guard_token)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for _, endpoint in STEPS:
+        latencies = sorted(recorder.latencies[endpoint])
+        requests = len(latencies)
+        errors = recorder.exceptions[endpoint] + sum(
+            count for status, count in recorder.statuses[endpoint].items() if int(status) >= 400
+        )
+
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        endpoints[endpoint] = {
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 2) if elapsed else 0,
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else 0,
+            "statuses": dict(sorted(recorder.statuses[endpoint].items())),
+            "exceptions": recorder.exceptions[endpoint],
+            "latency_ms": {
+                "p50": ms(percentile(latencies, 0.50)),
+                "p95": ms(percentile(latencies, 0.95)),
+                "p99": ms(percentile(latencies, 0.99)),
+                "max": ms(latencies[-1] if latencies else None),
+                "mean": ms(sum(latencies) / requests if requests else None),
+            },
+        }
+    return endpoints
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    print(f"\n{report['lifecycles_completed']}/{report['params']['visitors']} lifecycles in "
+          f"{report['duration_s']}s ({report['lifecycles_per_s']}/s)")
+    header = f"{'endpoint':<26}{'req':>7}{'rps':>9}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}"
+    if baseline:
+        header += f"{'Δp95':>9}{'Δrps':>9}"
+    print(header)
+    for endpoint, result in report["endpoints"].items():
+        latency = result["latency_ms"]
+        line = (f"{endpoint:<26}{result['requests']:>7}{result['throughput_rps']:>9.1f}"
+                f"{result['error_rate'] * 100:>7.2f}{latency['p50'] or 0:>9.2f}"
+                f"{latency['p95'] or 0:>9.2f}{latency['p99'] or 0:>9.2f}")
+        before = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if before:
+            line += (f"{(latency['p95'] or 0) - (before['latency_ms']['p95'] or 0):>+9.2f}"
+                     f"{result['throughput_rps'] - before['throughput_rps']:>+9.1f}")
+        print(line)
+
+
+async def main_async(args):
+    run_id = uuid.uuid4().hex[:8]
+    if args.base_url:
+        supabase = app.database.get_supabase(True)
+        transport = None
+    else:
+        from app.main import app as fastapi_app
+        supabase = use_in_memory_database()
+        transport = httpx.ASGITransport(app=fastapi_app)
+
+    seed_started = time.perf_counter()
+    resident_tokens, guard_tokens = seed(supabase, run_id, args.households, args.guards)
+    print(f"Seeded {args.households} households and {args.guards} guards "
+          f"in {time.perf_counter() - seed_started:.1f}s (run {run_id})")
+
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url or "http://loadtest", transport=transport,
+                                 limits=limits, timeout=args.timeout) as client:
+        started = time.perf_counter()
+        # The handlers print progress lines; keep them out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            await run_load(client, recorder, args, resident_tokens, guard_tokens)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "target": args.base_url or "in-process",
+        "params": {
+            "households": args.households,
+            "guards": args.guards,
+            "visitors": args.visitors,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "duration_s": round(elapsed, 3),
+        "lifecycles_completed": recorder.completed,
+        "lifecycles_per_s": round(recorder.completed / elapsed, 2) if elapsed else 0,
+        "endpoints": summarize(recorder, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--households", type=int, default=1000)
+    parser.add_argument("--guards", type=int, default=10)
+    parser.add_argument("--visitors", type=int, default=2000, help="lifecycles to run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1, help="seed for household/guard selection")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--base-url", help="run against this server instead of in-process")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of a previous run to show deltas against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+CPU cost per request of GET /visitors/ with the default and FAST_JSON paths
+
+Runs the real app in-process against canned Supabase rows, so the numbers
+cover routing, auth, serialization and compression but not network time.
+
+Usage (from backend/):
+    python -m benchmarks.serialization --rows 500 --requests 200
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+import app.auth
+import app.routers.visitors
+from app.auth import create_access_token
+from app.config import get_settings
+from app.main import app as fastapi_app
+
+
+class CannedResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class CannedQuery:
+    """Accepts any PostgREST builder chain and returns fixed rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return CannedResult(self.rows)
+
+
+class CannedClient:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return CannedQuery(self.tables.get(name, []))
+
+
+def make_visitors(count):
+    now = datetime.utcnow()
+    statuses = ["pending", "approved", "denied", "checked_in", "checked_out"]
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Visitor {i}",
+            "phone": f"+91555{i:07d}",
+            "purpose": "Delivery",
+            "host_household_id": str(uuid.uuid4()),
+            "status": statuses[i % len(statuses)],
+            "approved_by": str(uuid.uuid4()),
+            "approved_at": (now - timedelta(minutes=i)).isoformat() + "+00:00",
+            "checked_in_at": None,
+            "checked_out_at": None,
+            "scheduled_time": None,
+            "created_at": (now - timedelta(minutes=i)).isoformat() + "+00:00",
+        }
+        for i in range(count)
+    ]
+
+
+def measure(client, headers, requests):
+    # Warm up caches, lazy imports and the TestClient portal
+    for _ in range(10):
+        client.get("/visitors/", headers=headers)
+
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    size = 0
+    for _ in range(requests):
+        response = client.get("/visitors/", headers=headers)
+        response.raise_for_status()
+        size = int(response.headers.get("content-length", len(response.content)))
+    cpu_ms = (time.process_time() - start_cpu) * 1000 / requests
+    wall_ms = (time.perf_counter() - start_wall) * 1000 / requests
+    return cpu_ms, wall_ms, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    guard = {
+        "id": str(uuid.uuid4()),
+        "email": "guard@example.com",
+        "display_name": "Bench Guard",
+        "phone": None,
+        "household_id": None,
+        "roles": ["guard"],
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    canned = CannedClient({"users": [guard], "visitors": make_visitors(args.rows)})
+    app.auth.get_supabase = lambda *a, **k: canned
+    app.routers.visitors.get_supabase = lambda *a, **k: canned
+
+    token = create_access_token({"sub": guard["id"], "roles": guard["roles"]})
+    settings = get_settings()
+    client = TestClient(fastapi_app)
+
+    print(f"GET /visitors/ with {args.rows} rows, {args.requests} requests per mode")
+    print(f"{'mode':<22}{'cpu ms/req':>12}{'wall ms/req':>13}{'bytes':>10}")
+    for fast_json in (False, True):
+        settings.fast_json = fast_json
+        for encoding in ("identity", "gzip"):
+            headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": encoding}
+            cpu_ms, wall_ms, size = measure(client, headers, args.requests)
+            mode = f"{'fast_json' if fast_json else 'default'}/{encoding}"
+            print(f"{mode:<22}{cpu_ms:>12.2f}{wall_ms:>13.2f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
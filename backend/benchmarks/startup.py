@@ -0,0 +1,66 @@
+"""
+Import and startup time of the API per router selection
+
+Each configuration is measured in fresh interpreters (imports are cached
+within a process): time to import app.main (which builds the app with
+create_app()), time until the first request is answered, and the peak RSS.
+The settings come from the environment / .env as usual; ENABLED_ROUTERS is
+overridden per configuration.
+
+Usage (from backend/):
+    python -m benchmarks.startup --runs 7
+    python -m benchmarks.startup --configs all auth,visitors visitors
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+TestClient(app.main.app).get("/health/live").raise_for_status()
+answered = time.perf_counter()
+json.dump({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (answered - started) * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+}, sys.stdout)
+"""
+
+
+def measure(routers: str) -> dict:
+    env = {**os.environ, "ENABLED_ROUTERS": routers}
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--configs", nargs="+", default=["all", "auth,visitors"],
+                        help="ENABLED_ROUTERS values to compare")
+    args = parser.parse_args()
+
+    print(f"{'routers':<28}{'import ms':>11}{'first req ms':>14}{'rss MB':>9}{'modules':>9}")
+    for routers in args.configs:
+        runs = [measure(routers) for _ in range(args.runs)]
+        print(
+            f"{routers:<28}"
+            f"{statistics.median(r['import_ms'] for r in runs):>11.0f}"
+            f"{statistics.median(r['first_response_ms'] for r in runs):>14.0f}"
+            f"{statistics.median(r['max_rss_mb'] for r in runs):>9.0f}"
+            f"{runs[0]['modules']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
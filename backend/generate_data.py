@@ -0,0 +1,414 @@
+"""
+Synthetic data generator for production-scale testing
+
+Generates a society of --towers towers with --flats-per-tower households,
+residents, guards and admins, plus --months months of visitor history with
+the matching audit events, and writes them to Supabase in chunked bulk
+upserts. seed.py is still the way to get the handful of known demo
+accounts; this script is for pagination, indexing and archival testing.
+
+Deterministic: every row id is derived from --seed and the row's position,
+and every household's history comes from its own random stream, so the same
+parameters always produce the same rows.
+
+Resumable: progress is written to --state-file after each chunk. Re-running
+with the same parameters continues after the last completed chunk, and
+since all writes are upserts on deterministic ids, replaying a chunk that
+was half-written before a crash does not duplicate rows.
+
+Usage (from backend/):
+    python generate_data.py --towers 10 --flats-per-tower 200 --months 12
+    python generate_data.py --dry-run --towers 40 --flats-per-tower 250 --months 24
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_STATE_FILE = ".generate_data_state.json"
+
+# (purpose, weight, typical stay in minutes)
+PURPOSES = [
+    ("Delivery", 30, 8),
+    ("Courier Delivery", 12, 6),
+    ("Guest Visit", 20, 150),
+    ("Relative Visit", 8, 300),
+    ("Friend Visit", 8, 120),
+    ("Housekeeping", 8, 90),
+    ("Plumber Service", 3, 60),
+    ("Electrician Service", 3, 60),
+    ("Cab Pickup", 5, 4),
+    ("Internet Technician", 3, 45),
+]
+
+# Relative arrival weight per hour of day (deliveries late morning, guests evening)
+HOUR_WEIGHTS = [
+    0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 0.8, 1.5, 2.5, 3.0, 3.5, 3.5,
+    3.0, 2.5, 2.0, 2.0, 2.5, 3.5, 4.0, 4.0, 3.0, 2.0, 1.0, 0.4,
+]
+
+FIRST_NAMES = [
+    "Aarav", "Priya", "Rahul", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rohan", "Meera",
+    "John", "Emma", "Minho", "Lisa", "David", "Sophia", "Omar", "Fatima", "Chen", "Yuki",
+    "Carlos", "Maria", "Ibrahim", "Aisha", "Ravi", "Divya", "Karan", "Neha", "Sanjay", "Pooja",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Reddy", "Iyer", "Nair", "Patel", "Singh", "Kumar", "Gupta", "Das",
+    "Johnson", "Kim", "Park", "Wu", "Brown", "Lee", "Khan", "Chen", "Garcia", "Tanaka",
+]
+
+
+def _poisson(rng: random.Random, lam: float) -> int:
+    """Poisson sample (Knuth for small means, normal approximation above)"""
+    if lam <= 0:
+        return 0
+    if lam > 30:
+        return max(0, round(rng.gauss(lam, math.sqrt(lam))))
+    limit, k, p = math.exp(-lam), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat()
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.namespace = uuid.uuid5(uuid.NAMESPACE_DNS, f"community-app.generate-data.{args.seed}")
+        # Pin "now" to the start of the current day so a resumed run produces the same rows
+        self.now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        if args.end_date:
+            self.now = datetime.fromisoformat(args.end_date).replace(tzinfo=timezone.utc)
+        self.start = self.now - timedelta(days=30 * args.months)
+        self.purposes = [p[0] for p in PURPOSES]
+        self.purpose_weights = [p[1] for p in PURPOSES]
+        self.stays = {p[0]: p[2] for p in PURPOSES}
+
+    # Identities
+    def make_id(self, kind: str, *parts) -> str:
+        return str(uuid.uuid5(self.namespace, ":".join([kind, *map(str, parts)])))
+
+    def rng(self, *parts) -> random.Random:
+        return random.Random(":".join(map(str, (self.args.seed, *parts))))
+
+    @property
+    def household_count(self) -> int:
+        return self.args.towers * self.args.flats_per_tower
+
+    def flat_no(self, index: int) -> str:
+        tower, flat = divmod(index, self.args.flats_per_tower)
+        floor, unit = divmod(flat, self.args.flats_per_floor)
+        return f"T{tower + 1:02d}-{floor + 1:02d}{unit + 1:02d}"
+
+    def resident_id(self, household: int, n: int) -> str:
+        return self.make_id("resident", household, n)
+
+    def guard_id(self, n: int) -> str:
+        return self.make_id("guard", n)
+
+    # Directory: households, users, device tokens
+    def households(self, index: int):
+        rng = self.rng("household", index)
+        return [{
+            "id": self.make_id("household", index),
+            "flat_no": self.flat_no(index),
+            "name": f"The {rng.choice(LAST_NAMES)} Family",
+        }]
+
+    def residents(self, index: int):
+        rng = self.rng("residents", index)
+        family = rng.choice(LAST_NAMES)
+        rows = []
+        for n in range(self.args.residents_per_flat):
+            rows.append({
+                "id": self.resident_id(index, n),
+                "email": f"resident.{self.flat_no(index).lower()}.{n + 1}@generated.example.com",
+                "phone": f"+9198{index:06d}{n:02d}",
+                "display_name": f"{rng.choice(FIRST_NAMES)} {family}",
+                "household_id": self.make_id("household", index),
+                "roles": ["resident"],
+            })
+        return rows
+
+    def staff(self, index: int):
+        if index < self.args.guards:
+            n, role = index, "guard"
+            user_id = self.guard_id(n)
+        else:
+            n, role = index - self.args.guards, "admin"
+            user_id = self.make_id("admin", n)
+        rng = self.rng("staff", index)
+        return [{
+            "id": user_id,
+            "email": f"{role}.{n + 1}@generated.example.com",
+            "phone": f"+9197{index:08d}",
+            "display_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "roles": [role],
+        }]
+
+    def device_tokens(self, index: int):
+        return [
+            {"user_id": self.resident_id(index, n), "token": f"generated_fcm_{self.resident_id(index, n)}"}
+            for n in range(self.args.residents_per_flat)
+        ]
+
+    # History: visitors and their event trail
+    def arrival_time(self, rng: random.Random) -> datetime:
+        day = self.start + timedelta(days=rng.randrange((self.now - self.start).days))
+        weights = HOUR_WEIGHTS
+        if day.weekday() >= 5:
+            # Weekends: fewer early deliveries, more afternoon and evening guests
+            weights = [w * (0.6 if h < 12 else 1.4) for h, w in enumerate(HOUR_WEIGHTS)]
+        hour = rng.choices(range(24), weights=weights)[0]
+        return day + timedelta(hours=hour, minutes=rng.randrange(60), seconds=rng.randrange(60))
+
+    def visitor_history(self, index: int):
+        """Visitors of one household over the whole period, with their events"""
+        rng = self.rng("history", index)
+        household_id = self.make_id("household", index)
+        residents = [self.resident_id(index, n) for n in range(self.args.residents_per_flat)]
+        guards = [self.guard_id(n) for n in range(self.args.guards)]
+        # Some households get far more visitors than others
+        activity = rng.lognormvariate(0, 0.6)
+        count = _poisson(rng, self.args.visitors_per_flat_per_month * self.args.months * activity)
+
+        visitors, events = [], []
+        for n in range(count):
+            visitor_id = self.make_id("visitor", index, n)
+            purpose = rng.choices(self.purposes, weights=self.purpose_weights)[0]
+            arrival = self.arrival_time(rng)
+            # Deliveries are announced minutes ahead, guests hours or days ahead
+            lead = rng.expovariate(1 / (20 if self.stays[purpose] < 15 else 600))
+            created_at = arrival - timedelta(minutes=lead)
+            resident = rng.choice(residents)
+            guard = rng.choice(guards) if guards else None
+
+            outcome = rng.random()
+            if outcome < 0.86:
+                status = "checked_out"
+            elif outcome < 0.91:
+                status = "denied"
+            elif outcome < 0.96:
+                status = "approved"  # approved but never came
+            else:
+                status = "pending"  # never acted on
+
+            row = {
+                "id": visitor_id,
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "phone": f"+9190{rng.randrange(10 ** 8):08d}",
+                "purpose": purpose,
+                "host_household_id": household_id,
+                "status": status,
+                "approved_by": None,
+                "approved_at": None,
+                "checked_in_at": None,
+                "checked_out_at": None,
+                "scheduled_time": _iso(arrival),
+                "created_at": _iso(created_at),
+            }
+            trail = [("visitor_created", resident, created_at, {"name": row["name"], "purpose": purpose})]
+
+            if status in ("approved", "checked_out"):
+                approved_at = created_at + timedelta(minutes=min(lead, rng.expovariate(1 / 5)))
+                row["approved_by"] = resident
+                row["approved_at"] = _iso(approved_at)
+                trail.append(("visitor_approved", resident, approved_at, {"status": "approved"}))
+            elif status == "denied":
+                denied_at = created_at + timedelta(minutes=rng.expovariate(1 / 10))
+                row["approved_by"] = resident
+                row["approved_at"] = _iso(denied_at)
+                trail.append(("visitor_denied", resident, denied_at, {"status": "denied", "reason": "Not expected"}))
+
+            if status == "checked_out":
+                checked_in = arrival + timedelta(minutes=rng.gauss(0, 5))
+                stay = max(1.0, rng.lognormvariate(math.log(self.stays[purpose]), 0.5))
+                checked_out = checked_in + timedelta(minutes=stay)
+                if checked_out > self.now:
+                    # Still inside at the end of the generated period
+                    row["status"] = "checked_in"
+                    checked_out = None
+                row["checked_in_at"] = _iso(checked_in)
+                trail.append(("visitor_checked_in", guard, checked_in, {"status": "checked_in"}))
+                if checked_out is not None:
+                    row["checked_out_at"] = _iso(checked_out)
+                    trail.append(("visitor_checked_out", guard, checked_out, {"status": "checked_out"}))
+
+            row["updated_at"] = _iso(max(moment for _, _, moment, _ in trail))
+            visitors.append(row)
+            for position, (event_type, actor, moment, payload) in enumerate(trail):
+                events.append({
+                    "id": self.make_id("event", index, n, position),
+                    "type": event_type,
+                    "actor_user_id": actor,
+                    "subject_id": visitor_id,
+                    "payload": payload,
+                    "occurred_at": _iso(moment),
+                })
+        return visitors, events
+
+
+class Progress:
+    """Resume cursor per stage, persisted to a JSON file after every chunk"""
+
+    def __init__(self, path: str, params: dict, fresh: bool):
+        self.path = path
+        self.params = params
+        self.done = {}
+        if not fresh and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("params") != params:
+                raise SystemExit(
+                    f"❌ {path} was written by a run with different parameters.\n"
+                    f"   Re-run with the same parameters to resume, or pass --fresh to start over."
+                )
+            self.done = state.get("done", {})
+
+    def next_index(self, stage: str) -> int:
+        return self.done.get(stage, 0)
+
+    def save(self, stage: str, next_index: int):
+        self.done[stage] = next_index
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"params": self.params, "done": self.done}, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def upsert_with_retry(supabase, table: str, rows: list, on_conflict: str, attempts: int = 4):
+    for attempt in range(1, attempts + 1):
+        try:
+            supabase.table(table).upsert(rows, on_conflict=on_conflict).execute()
+            return
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = 2 ** attempt
+            print(f"   ⚠️  {table}: {str(e)[:120]} - retrying in {delay}s")
+            time.sleep(delay)
+
+
+def run_stage(supabase, progress: Progress, stage: str, total: int, produce, tables, chunk_size: int):
+    """
+    Generate rows for items [next_index, total) and upsert them in chunks
+
+    Args:
+        stage: Name of the stage in the state file
+        total: Number of items (households, staff members...) in the stage
+        produce: item index -> one list of rows per table in `tables`
+        tables: (table, on_conflict) pairs, written in this order
+        chunk_size: Flush once the largest buffer reaches this many rows
+    """
+    start = progress.next_index(stage)
+    if start >= total:
+        print(f"   {stage}: already complete")
+        return
+    if start:
+        print(f"   {stage}: resuming at {start}/{total}")
+
+    buffers = [[] for _ in tables]
+    written = [0] * len(tables)
+    started = time.perf_counter()
+
+    def flush(next_index: int):
+        # Parents before children, so a chunk never references missing rows
+        for i, (table, on_conflict) in enumerate(tables):
+            for offset in range(0, len(buffers[i]), chunk_size):
+                upsert_with_retry(supabase, table, buffers[i][offset:offset + chunk_size], on_conflict)
+            written[i] += len(buffers[i])
+            buffers[i].clear()
+        progress.save(stage, next_index)
+        rate = sum(written) / max(time.perf_counter() - started, 1e-9)
+        counts = ", ".join(f"{count} {table}" for (table, _), count in zip(tables, written))
+        print(f"   {stage}: {next_index}/{total} ({counts}, {rate:,.0f} rows/s)")
+
+    for index in range(start, total):
+        for buffer, rows in zip(buffers, produce(index)):
+            buffer.extend(rows)
+        # Only flush on item boundaries, so the saved cursor never splits an item
+        if max(len(buffer) for buffer in buffers) >= chunk_size:
+            flush(index + 1)
+    flush(total)
+
+
+def estimate(generator: Generator, sample: int = 200):
+    """Estimate row counts from a sample of households (no database writes)"""
+    households = generator.household_count
+    step = max(1, households // sample)
+    sampled = range(0, households, step)
+    visitors = events = 0
+    for index in sampled:
+        v, e = generator.visitor_history(index)
+        visitors += len(v)
+        events += len(e)
+    scale = households / len(sampled)
+    args = generator.args
+    print(f"🏢 {households:,} households in {args.towers} towers")
+    print(f"👤 {households * args.residents_per_flat:,} residents, {args.guards} guards, {args.admins} admins")
+    print(f"🚶 ~{visitors * scale:,.0f} visitors over {args.months} months")
+    print(f"📝 ~{events * scale:,.0f} events")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--towers", type=int, default=4)
+    parser.add_argument("--flats-per-tower", type=int, default=100)
+    parser.add_argument("--flats-per-floor", type=int, default=4)
+    parser.add_argument("--residents-per-flat", type=int, default=2)
+    parser.add_argument("--guards", type=int, default=12)
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--visitors-per-flat-per-month", type=float, default=20,
+                        help="mean; actual counts vary per household")
+    parser.add_argument("--end-date", help="last day of the history (YYYY-MM-DD); defaults to today")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per bulk upsert")
+    parser.add_argument("--state-file", default=DEFAULT_STATE_FILE)
+    parser.add_argument("--fresh", action="store_true", help="ignore the state file and start over")
+    parser.add_argument("--dry-run", action="store_true", help="print estimated row counts only")
+    args = parser.parse_args()
+
+    generator = Generator(args)
+    if args.dry_run:
+        estimate(generator)
+        return
+
+    from app.database import get_supabase
+    supabase = get_supabase(True)
+
+    params = {key: value for key, value in vars(args).items() if key not in ("state_file", "fresh", "dry_run")}
+    params["end"] = generator.now.isoformat()
+    progress = Progress(args.state_file, params, args.fresh)
+
+    print("🚀 Generating synthetic data...")
+    households = generator.household_count
+
+    print("\n1️⃣  Households and residents")
+    run_stage(supabase, progress, "households", households,
+              lambda i: (generator.households(i), generator.residents(i), generator.device_tokens(i)),
+              [("households", "id"), ("users", "id"), ("device_tokens", "token")], args.chunk_size)
+
+    print("\n2️⃣  Guards and admins")
+    run_stage(supabase, progress, "staff", args.guards + args.admins,
+              lambda i: (generator.staff(i),), [("users", "id")], args.chunk_size)
+
+    print("\n3️⃣  Visitor history and events")
+    run_stage(supabase, progress, "history", households, generator.visitor_history,
+              [("visitors", "id"), ("events", "id")], args.chunk_size)
+
+    print("\n✅ Synthetic data generation completed")
+    print(f"   State saved in {args.state_file}; delete it (or pass --fresh) before generating a different dataset")
+
+
+if __name__ == "__main__":
+    main()
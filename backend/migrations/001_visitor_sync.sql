@@ -0,0 +1,55 @@
+-- Delta sync support for guard devices (GET /visitors/sync)
+--
+-- Every change to a visitor bumps updated_at so devices can ask for
+-- "rows changed since <cursor>", and hard deletes leave a tombstone so
+-- devices can drop rows they still hold locally.
+--
+-- Timestamps use clock_timestamp() (the time of the write) rather than
+-- NOW() (the start of the transaction), and GET /visitors/sync only hands
+-- out changes older than SYNC_SAFETY_LAG_SECONDS, so a transaction that
+-- commits late still lands ahead of every device's cursor.
+
+ALTER TABLE visitors
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp();
+ALTER TABLE visitors ALTER COLUMN updated_at SET DEFAULT clock_timestamp();
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visitors_set_updated_at ON visitors;
+CREATE TRIGGER visitors_set_updated_at
+    BEFORE UPDATE ON visitors
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Keyset index for the sync cursor (updated_at, id)
+CREATE INDEX IF NOT EXISTS idx_visitors_updated_at_id ON visitors (updated_at, id);
+
+CREATE TABLE IF NOT EXISTS visitor_tombstones (
+    visitor_id UUID PRIMARY KEY,
+    host_household_id UUID,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+ALTER TABLE visitor_tombstones ALTER COLUMN deleted_at SET DEFAULT clock_timestamp();
+
+CREATE INDEX IF NOT EXISTS idx_visitor_tombstones_deleted_at
+    ON visitor_tombstones (deleted_at, visitor_id);
+
+CREATE OR REPLACE FUNCTION record_visitor_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO visitor_tombstones (visitor_id, host_household_id, deleted_at)
+    VALUES (OLD.id, OLD.host_household_id, clock_timestamp())
+    ON CONFLICT (visitor_id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS visitors_record_tombstone ON visitors;
+CREATE TRIGGER visitors_record_tombstone
+    AFTER DELETE ON visitors
+    FOR EACH ROW EXECUTE FUNCTION record_visitor_tombstone();
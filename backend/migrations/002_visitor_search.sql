@@ -0,0 +1,74 @@
+-- Visitor search by partial name or phone number (GET /visitors/search)
+--
+-- Trigram indexes on the normalized name and on the phone number's digits
+-- serve prefix, substring and fuzzy matches, so a guard typing "ramesh" or
+-- the last four digits of a number gets ranked results without a scan.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- Same as normalize_name() in app/utils/visitor_search.py: lower-cased,
+-- accents stripped, whitespace collapsed, so "jose" and "José" both find
+-- "José". unaccent() itself is only STABLE (it reads its dictionary), so
+-- this wrapper names the dictionary and is declared IMMUTABLE to be usable
+-- in the index.
+CREATE OR REPLACE FUNCTION search_name(value TEXT)
+RETURNS TEXT AS $$
+    SELECT regexp_replace(btrim(lower(unaccent('unaccent'::regdictionary, value))), '\s+', ' ', 'g');
+$$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+SET search_path = public, extensions;
+
+-- Replaced by the index on search_name(name)
+DROP INDEX IF EXISTS idx_visitors_name_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_visitors_search_name_trgm
+    ON visitors USING gin (search_name(name) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_visitors_phone_digits_trgm
+    ON visitors USING gin ((regexp_replace(phone, '\D', '', 'g')) gin_trgm_ops);
+
+-- Keep the ranking in step with app/utils/visitor_search.py:
+--   0. name prefix, or phone starts/ends with the digits
+--   1. a later word of the name starts with the query
+--   2. substring of the name or phone
+--   3. fuzzy (trigram) name match
+-- then active visitors first, closest name, newest.
+CREATE OR REPLACE FUNCTION search_visitors(
+    query TEXT,
+    household UUID DEFAULT NULL,
+    max_results INT DEFAULT 20
+)
+RETURNS SETOF visitors AS $$
+    WITH q AS (
+        SELECT
+            search_name(query) AS name_q,
+            -- LIKE pattern with the wildcards in the query escaped
+            replace(replace(replace(search_name(query), '\', '\\'), '%', '\%'), '_', '\_') AS name_like,
+            regexp_replace(query, '\D', '', 'g') AS phone_q
+    )
+    SELECT v.*
+    FROM visitors v, q
+    WHERE (household IS NULL OR v.host_household_id = household)
+      AND (
+          search_name(v.name) LIKE '%' || q.name_like || '%'
+          OR search_name(v.name) % q.name_q
+          OR (length(q.phone_q) >= 3
+              AND regexp_replace(v.phone, '\D', '', 'g') LIKE '%' || q.phone_q || '%')
+      )
+    ORDER BY
+        CASE
+            WHEN search_name(v.name) LIKE q.name_like || '%' THEN 0
+            WHEN length(q.phone_q) >= 3
+                AND (regexp_replace(v.phone, '\D', '', 'g') LIKE q.phone_q || '%'
+                     OR regexp_replace(v.phone, '\D', '', 'g') LIKE '%' || q.phone_q) THEN 0
+            WHEN search_name(v.name) LIKE '% ' || q.name_like || '%' THEN 1
+            WHEN search_name(v.name) LIKE '%' || q.name_like || '%'
+                OR (length(q.phone_q) >= 3
+                    AND regexp_replace(v.phone, '\D', '', 'g') LIKE '%' || q.phone_q || '%') THEN 2
+            ELSE 3
+        END,
+        v.status::TEXT NOT IN ('pending', 'approved', 'checked_in'),
+        similarity(search_name(v.name), q.name_q) DESC,
+        v.created_at DESC
+    LIMIT max_results;
+$$ LANGUAGE sql STABLE;
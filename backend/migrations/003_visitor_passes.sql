@@ -0,0 +1,41 @@
+-- Recurring visitor passes for daily staff (maids, cooks, drivers, delivery)
+--
+-- A household registers a pass once with the days of the week and the time
+-- window it is valid for. At the gate, POST /passes/checkin turns it into a
+-- checked-in visitor row (visitors.pass_id set), so a pass holder never
+-- needs a create + approve round per visit.
+
+CREATE TABLE IF NOT EXISTS visitor_passes (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    host_household_id UUID NOT NULL REFERENCES households(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    purpose TEXT,
+    -- 0 = Monday ... 6 = Sunday, in the community's time zone
+    days_of_week SMALLINT[] NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    valid_from DATE,
+    valid_until DATE,
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_by UUID REFERENCES users(id),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CHECK (start_time < end_time)
+);
+
+CREATE INDEX IF NOT EXISTS idx_visitor_passes_household ON visitor_passes (host_household_id);
+CREATE INDEX IF NOT EXISTS idx_visitor_passes_active ON visitor_passes (active, id);
+
+DROP TRIGGER IF EXISTS visitor_passes_set_updated_at ON visitor_passes;
+CREATE TRIGGER visitor_passes_set_updated_at
+    BEFORE UPDATE ON visitor_passes
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+ALTER TABLE visitors
+    ADD COLUMN IF NOT EXISTS pass_id UUID REFERENCES visitor_passes(id) ON DELETE SET NULL;
+
+-- A pass holder can only be inside once at a time; a second check-in fails
+-- on this index instead of needing a read first
+CREATE UNIQUE INDEX IF NOT EXISTS idx_visitors_pass_checked_in
+    ON visitors (pass_id) WHERE status = 'checked_in';
@@ -0,0 +1,31 @@
+-- Revocation list for signed gate passes (GET /gate/revocations)
+--
+-- Gate passes are verified offline by guard devices, so cancelling an
+-- approved visitor has to reach the devices as a list of revoked visitor
+-- ids. Rows only matter until the pass would have expired anyway.
+
+CREATE TABLE IF NOT EXISTS gate_pass_revocations (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    visitor_id UUID NOT NULL UNIQUE REFERENCES visitors(id) ON DELETE CASCADE,
+    host_household_id UUID NOT NULL,
+    revoked_by UUID REFERENCES users(id),
+    reason TEXT,
+    expires_at TIMESTAMPTZ NOT NULL,
+    revoked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_gate_pass_revocations_expires_at
+    ON gate_pass_revocations (expires_at);
+
+-- Offline check-ins committed by guard devices (POST /gate/checkins).
+-- Only visitors that are still approved move to checked_in, so a pass
+-- revoked while the batch was in flight stays denied; updated_at is set
+-- by the visitors trigger. Returns the visitors that were checked in.
+CREATE OR REPLACE FUNCTION commit_gate_checkins(checkins JSONB)
+RETURNS SETOF visitors AS $$
+    UPDATE visitors v
+    SET status = 'checked_in', checked_in_at = (c->>'checked_in_at')::TIMESTAMPTZ
+    FROM jsonb_array_elements(checkins) AS c
+    WHERE v.id = (c->>'id')::UUID AND v.status::TEXT = 'approved'
+    RETURNING v.*;
+$$ LANGUAGE sql;
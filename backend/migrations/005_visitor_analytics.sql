@@ -0,0 +1,130 @@
+-- Hourly visitor traffic rollups for the committee (GET /analytics/...)
+--
+-- visitor_stats_hourly holds per hour and household how many visitors were
+-- created, approved, denied, checked in and checked out, plus the summed
+-- dwell time (checked_out_at - checked_in_at) of the visits that ended in
+-- that hour. app/utils/analytics.py keeps it current from the audit log:
+-- it reads events after a watermark (events.seq) and applies the deltas
+-- with apply_visitor_stats(), which advances the watermark in the same
+-- transaction so a batch is never counted twice. backfill_visitor_stats()
+-- rebuilds everything from the visitors table in one set-based pass.
+
+-- Insertion order of events; unlike occurred_at it also orders events
+-- replicated late from a gate-local database
+ALTER TABLE events ADD COLUMN IF NOT EXISTS seq BIGSERIAL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_seq ON events (seq);
+
+-- seq is taken when the row is inserted, not when it commits, so a slow
+-- transaction can make seq 10 visible after seq 11 was already rolled up.
+-- The rollup only reads events inserted more than
+-- ANALYTICS_ROLLUP_LAG_SECONDS ago. Gates never send this column, so
+-- replicated events are stamped when they reach Supabase.
+ALTER TABLE events ADD COLUMN IF NOT EXISTS inserted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp();
+
+CREATE TABLE IF NOT EXISTS visitor_stats_hourly (
+    bucket TIMESTAMPTZ NOT NULL,
+    host_household_id UUID NOT NULL,
+    created INT NOT NULL DEFAULT 0,
+    approved INT NOT NULL DEFAULT 0,
+    denied INT NOT NULL DEFAULT 0,
+    checked_in INT NOT NULL DEFAULT 0,
+    checked_out INT NOT NULL DEFAULT 0,
+    dwell_seconds BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, host_household_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_visitor_stats_hourly_household
+    ON visitor_stats_hourly (host_household_id, bucket);
+
+CREATE TABLE IF NOT EXISTS analytics_watermarks (
+    name TEXT PRIMARY KEY,
+    last_seq BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO analytics_watermarks (name) VALUES ('visitor_stats') ON CONFLICT DO NOTHING;
+
+-- Background jobs that must run in one worker at a time (app/utils/leases.py)
+CREATE TABLE IF NOT EXISTS job_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT,
+    expires_at TIMESTAMPTZ NOT NULL DEFAULT '-infinity'
+);
+
+INSERT INTO job_leases (name) VALUES ('visitor_stats') ON CONFLICT DO NOTHING;
+
+-- Add `deltas` (a JSON array of visitor_stats_hourly rows) to the rollup and
+-- move the watermark from previous_seq to next_seq. Returns FALSE without
+-- applying anything when another worker already moved the watermark.
+CREATE OR REPLACE FUNCTION apply_visitor_stats(deltas JSONB, previous_seq BIGINT, next_seq BIGINT)
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE analytics_watermarks
+    SET last_seq = next_seq, updated_at = NOW()
+    WHERE name = 'visitor_stats' AND last_seq = previous_seq;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    INSERT INTO visitor_stats_hourly AS s
+        (bucket, host_household_id, created, approved, denied, checked_in, checked_out, dwell_seconds)
+    SELECT d.bucket, d.host_household_id, d.created, d.approved, d.denied, d.checked_in, d.checked_out, d.dwell_seconds
+    FROM jsonb_to_recordset(deltas) AS d(
+        bucket TIMESTAMPTZ, host_household_id UUID, created INT, approved INT, denied INT,
+        checked_in INT, checked_out INT, dwell_seconds BIGINT
+    )
+    ON CONFLICT (bucket, host_household_id) DO UPDATE SET
+        created = s.created + EXCLUDED.created,
+        approved = s.approved + EXCLUDED.approved,
+        denied = s.denied + EXCLUDED.denied,
+        checked_in = s.checked_in + EXCLUDED.checked_in,
+        checked_out = s.checked_out + EXCLUDED.checked_out,
+        dwell_seconds = s.dwell_seconds + EXCLUDED.dwell_seconds;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rebuild the rollup from the visitors table and move the watermark to the
+-- latest event. Counts follow the incremental job: a revoked gate pass
+-- still counts as an approval, a pass check-in as created + approved.
+CREATE OR REPLACE FUNCTION backfill_visitor_stats()
+RETURNS BIGINT AS $$
+DECLARE
+    watermark BIGINT;
+BEGIN
+    -- Keep the incremental job out until the rebuild commits
+    PERFORM 1 FROM analytics_watermarks WHERE name = 'visitor_stats' FOR UPDATE;
+    SELECT COALESCE(MAX(seq), 0) INTO watermark FROM events;
+
+    DELETE FROM visitor_stats_hourly;
+
+    INSERT INTO visitor_stats_hourly
+        (bucket, host_household_id, created, approved, denied, checked_in, checked_out, dwell_seconds)
+    SELECT bucket, host_household_id,
+           SUM(created), SUM(approved), SUM(denied), SUM(checked_in), SUM(checked_out), SUM(dwell_seconds)
+    FROM (
+        SELECT date_trunc('hour', created_at) AS bucket, host_household_id,
+               1 AS created, 0 AS approved, 0 AS denied, 0 AS checked_in, 0 AS checked_out, 0::BIGINT AS dwell_seconds
+        FROM visitors
+        UNION ALL
+        SELECT date_trunc('hour', v.approved_at), v.host_household_id, 0,
+               CASE WHEN v.status::TEXT <> 'denied' OR r.visitor_id IS NOT NULL THEN 1 ELSE 0 END,
+               CASE WHEN v.status::TEXT = 'denied' AND r.visitor_id IS NULL THEN 1 ELSE 0 END,
+               0, 0, 0
+        FROM visitors v
+        LEFT JOIN gate_pass_revocations r ON r.visitor_id = v.id
+        WHERE v.approved_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('hour', checked_in_at), host_household_id, 0, 0, 0, 1, 0, 0
+        FROM visitors WHERE checked_in_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('hour', checked_out_at), host_household_id, 0, 0, 0, 0, 1,
+               GREATEST(EXTRACT(EPOCH FROM checked_out_at - checked_in_at), 0)::BIGINT
+        FROM visitors WHERE checked_out_at IS NOT NULL AND checked_in_at IS NOT NULL
+    ) transitions
+    GROUP BY bucket, host_household_id;
+
+    UPDATE analytics_watermarks SET last_seq = watermark, updated_at = NOW() WHERE name = 'visitor_stats';
+    RETURN watermark;
+END;
+$$ LANGUAGE plpgsql;
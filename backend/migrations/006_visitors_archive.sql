@@ -0,0 +1,98 @@
+-- Retention compaction of terminal visitors (app/utils/compaction.py)
+--
+-- Visitors that reached checked_out or denied more than
+-- VISITOR_RETENTION_DAYS ago move from the hot visitors table to
+-- visitors_archive, a few hundred rows per transaction. GET /visitors/{id}
+-- falls back to the archive, and the analytics backfill reads both tables
+-- so rebuilt counts include compacted visitors.
+
+CREATE TABLE IF NOT EXISTS visitors_archive (LIKE visitors INCLUDING DEFAULTS);
+ALTER TABLE visitors_archive ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_visitors_archive_id ON visitors_archive (id);
+
+-- One worker compacts at a time (job_leases, 005)
+INSERT INTO job_leases (name) VALUES ('visitor_compaction') ON CONFLICT DO NOTHING;
+CREATE INDEX IF NOT EXISTS idx_visitors_archive_household_created_at
+    ON visitors_archive (host_household_id, created_at);
+
+-- Move up to batch_size terminal visitors last changed before cutoff.
+-- Rows locked by a running request are skipped rather than waited on, and
+-- the delete leaves tombstones as usual so guard devices drop the rows.
+-- Columns are matched by name, so a column added to visitors later is
+-- simply not archived until it is added to visitors_archive too.
+-- Returns how many visitors left the hot table, by host household, so the
+-- caller can invalidate those households' cached reads; the count is of
+-- deleted rows, not archive inserts (ON CONFLICT skips rows an earlier
+-- interrupted client-side run already copied).
+DROP FUNCTION IF EXISTS compact_visitors(TIMESTAMPTZ, INT);
+CREATE OR REPLACE FUNCTION compact_visitors(cutoff TIMESTAMPTZ, batch_size INT)
+RETURNS TABLE (host_household_id UUID, moved INT) AS $$
+    WITH batch AS (
+        SELECT id FROM visitors
+        WHERE status::TEXT IN ('checked_out', 'denied') AND updated_at < cutoff
+        ORDER BY updated_at
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    ), deleted AS (
+        DELETE FROM visitors v USING batch WHERE v.id = batch.id
+        RETURNING v.*
+    ), archived AS (
+        INSERT INTO visitors_archive
+        SELECT (jsonb_populate_record(
+            NULL::visitors_archive, to_jsonb(deleted) || jsonb_build_object('archived_at', NOW())
+        )).*
+        FROM deleted
+        ON CONFLICT (id) DO NOTHING
+    )
+    SELECT deleted.host_household_id, COUNT(*)::INT FROM deleted GROUP BY deleted.host_household_id;
+$$ LANGUAGE sql;
+
+-- backfill_visitor_stats (005) over visitors and visitors_archive
+CREATE OR REPLACE FUNCTION backfill_visitor_stats()
+RETURNS BIGINT AS $$
+DECLARE
+    watermark BIGINT;
+BEGIN
+    PERFORM 1 FROM analytics_watermarks WHERE name = 'visitor_stats' FOR UPDATE;
+    SELECT COALESCE(MAX(seq), 0) INTO watermark FROM events;
+
+    DELETE FROM visitor_stats_hourly;
+
+    INSERT INTO visitor_stats_hourly
+        (bucket, host_household_id, created, approved, denied, checked_in, checked_out, dwell_seconds)
+    WITH all_visitors AS (
+        SELECT id, host_household_id, status::TEXT AS status, created_at, approved_at, checked_in_at, checked_out_at
+        FROM visitors
+        UNION ALL
+        SELECT id, host_household_id, status::TEXT, created_at, approved_at, checked_in_at, checked_out_at
+        FROM visitors_archive
+    )
+    SELECT bucket, host_household_id,
+           SUM(created), SUM(approved), SUM(denied), SUM(checked_in), SUM(checked_out), SUM(dwell_seconds)
+    FROM (
+        SELECT date_trunc('hour', created_at) AS bucket, host_household_id,
+               1 AS created, 0 AS approved, 0 AS denied, 0 AS checked_in, 0 AS checked_out, 0::BIGINT AS dwell_seconds
+        FROM all_visitors
+        UNION ALL
+        SELECT date_trunc('hour', v.approved_at), v.host_household_id, 0,
+               CASE WHEN v.status <> 'denied' OR r.visitor_id IS NOT NULL THEN 1 ELSE 0 END,
+               CASE WHEN v.status = 'denied' AND r.visitor_id IS NULL THEN 1 ELSE 0 END,
+               0, 0, 0
+        FROM all_visitors v
+        LEFT JOIN gate_pass_revocations r ON r.visitor_id = v.id
+        WHERE v.approved_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('hour', checked_in_at), host_household_id, 0, 0, 0, 1, 0, 0
+        FROM all_visitors WHERE checked_in_at IS NOT NULL
+        UNION ALL
+        SELECT date_trunc('hour', checked_out_at), host_household_id, 0, 0, 0, 0, 1,
+               GREATEST(EXTRACT(EPOCH FROM checked_out_at - checked_in_at), 0)::BIGINT
+        FROM all_visitors WHERE checked_out_at IS NOT NULL AND checked_in_at IS NOT NULL
+    ) transitions
+    GROUP BY bucket, host_household_id;
+
+    UPDATE analytics_watermarks SET last_seq = watermark, updated_at = NOW() WHERE name = 'visitor_stats';
+    RETURN watermark;
+END;
+$$ LANGUAGE plpgsql;
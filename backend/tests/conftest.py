@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+
+# Settings are read at import time, so these must exist before `app` is imported
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-service-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app.database  # noqa: E402
+from app.auth import create_access_token  # noqa: E402
+from app.main import app as fastapi_app  # noqa: E402
+# The chat router imports this on first use; load it now so use_database() patches it too
+import app.utils.openai_tools  # noqa: E402,F401
+from app.utils.admission import admission  # noqa: E402
+from app.utils.coalesce import reads  # noqa: E402
+from app.utils.directory import directory  # noqa: E402
+from app.utils.occupancy import occupancy  # noqa: E402
+from app.utils.passes import passes  # noqa: E402
+from tests.factories import (  # noqa: E402
+    ADMIN_ID, GUARD_ID, HOUSEHOLD_A, RESIDENT_ID, TABLE_DEFAULTS, FakeLLM, seed_tables,
+)
+from tests.fake_supabase import FakeSupabase  # noqa: E402
+
+
+def use_database(monkeypatch, db):
+    """Route every `get_supabase()` in the app to `db`"""
+    original = app.database.get_supabase
+    for module in list(sys.modules.values()):
+        if getattr(module, "__name__", "").startswith("app") and getattr(module, "get_supabase", None) is original:
+            monkeypatch.setattr(module, "get_supabase", lambda *args, **kwargs: db)
+    # Cached views of the previous database
+    directory.clear()
+    passes.clear()
+    occupancy.clear()
+    admission.clear()
+    reads.clear()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """One in-memory database behind every `get_supabase()` in the app"""
+    db = FakeSupabase(seed_tables())
+    db.defaults = TABLE_DEFAULTS
+    use_database(monkeypatch, db)
+    return db
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr("app.utils.openai_tools.get_llm_client", lambda: llm)
+    return llm
+
+
+@pytest.fixture
+def client(fake_db, fake_llm):
+    return TestClient(fastapi_app)
+
+
+def token_for(user_id, roles, household_id=None):
+    return create_access_token({"sub": user_id, "roles": roles, "household_id": household_id})
+
+
+@pytest.fixture
+def auth_headers():
+    def headers(role):
+        user = {
+            "resident": (RESIDENT_ID, ["resident"], HOUSEHOLD_A),
+            "guard": (GUARD_ID, ["guard"], None),
+            "admin": (ADMIN_ID, ["admin"], None),
+        }[role]
+        return {"Authorization": f"Bearer {token_for(*user)}"}
+
+    return headers
@@ -0,0 +1,153 @@
+"""Seed data and scripted LLM completions shared by the tests"""
+import itertools
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+HOUSEHOLD_A = "11111111-1111-4111-8111-111111111111"
+HOUSEHOLD_B = "22222222-2222-4222-8222-222222222222"
+RESIDENT_ID = "aaaaaaaa-0000-4000-8000-000000000001"
+RESIDENT_B_ID = "aaaaaaaa-0000-4000-8000-000000000002"
+GUARD_ID = "bbbbbbbb-0000-4000-8000-000000000001"
+ADMIN_ID = "cccccccc-0000-4000-8000-000000000001"
+
+CREATED_AT = "2026-01-01T08:00:00+00:00"
+
+
+def _user(user_id, email, name, roles, household_id=None):
+    return {
+        "id": user_id,
+        "email": email,
+        "display_name": name,
+        "phone": "+15550000000",
+        "household_id": household_id,
+        "roles": roles,
+        "created_at": CREATED_AT,
+    }
+
+
+def _visitor(visitor_id, name, status, household_id, minutes):
+    return {
+        "id": visitor_id,
+        "name": name,
+        "phone": f"+9155500{minutes:05d}",
+        "purpose": "Guest Visit",
+        "host_household_id": household_id,
+        "status": status,
+        "approved_by": RESIDENT_ID if status != "pending" else None,
+        "approved_at": CREATED_AT if status != "pending" else None,
+        "checked_in_at": CREATED_AT if status in ("checked_in", "checked_out") else None,
+        "checked_out_at": CREATED_AT if status == "checked_out" else None,
+        "scheduled_time": None,
+        "created_at": f"2026-01-01T09:{minutes:02d}:00+00:00",
+        "updated_at": f"2026-01-01T09:{minutes:02d}:00+00:00",
+    }
+
+
+PENDING_VISITOR = "dddddddd-0000-4000-8000-000000000001"
+APPROVED_VISITOR = "dddddddd-0000-4000-8000-000000000002"
+CHECKED_IN_VISITOR = "dddddddd-0000-4000-8000-000000000003"
+OTHER_HOUSEHOLD_VISITOR = "dddddddd-0000-4000-8000-000000000004"
+
+# Maid for household A: Monday to Saturday, 07:00-10:00
+MAID_PASS = "ffffffff-0000-4000-8000-000000000001"
+MAID_PHONE = "+91 90000 11111"
+
+
+def seed_tables():
+    return {
+        "households": [
+            {"id": HOUSEHOLD_A, "flat_no": "A101", "name": "The Johnson Family", "created_at": CREATED_AT},
+            {"id": HOUSEHOLD_B, "flat_no": "B201", "name": "The Singh Family", "created_at": CREATED_AT},
+        ],
+        "users": [
+            _user(RESIDENT_ID, "john@example.com", "John Johnson", ["resident"], HOUSEHOLD_A),
+            _user(RESIDENT_B_ID, "emma@example.com", "Emma Johnson", ["resident"], HOUSEHOLD_A),
+            _user(GUARD_ID, "guard@example.com", "Mike Guard", ["guard"]),
+            _user(ADMIN_ID, "admin@example.com", "Sara Admin", ["admin"]),
+        ],
+        "visitors": [
+            _visitor(PENDING_VISITOR, "Ramesh Kumar", "pending", HOUSEHOLD_A, 1),
+            _visitor(APPROVED_VISITOR, "Suresh Reddy", "approved", HOUSEHOLD_A, 2),
+            _visitor(CHECKED_IN_VISITOR, "Anil Verma", "checked_in", HOUSEHOLD_A, 3),
+            _visitor(OTHER_HOUSEHOLD_VISITOR, "Lisa Park", "approved", HOUSEHOLD_B, 4),
+        ],
+        "visitor_passes": [
+            {
+                "id": MAID_PASS, "host_household_id": HOUSEHOLD_A, "name": "Lakshmi", "phone": MAID_PHONE,
+                "purpose": "Housekeeping", "days_of_week": [0, 1, 2, 3, 4, 5], "start_time": "07:00:00",
+                "end_time": "10:00:00", "valid_from": None, "valid_until": None, "active": True,
+                "created_by": RESIDENT_ID, "created_at": CREATED_AT,
+            },
+        ],
+        "events": [],
+        "device_tokens": [
+            {"id": "eeeeeeee-0000-4000-8000-000000000001", "user_id": RESIDENT_ID, "token": "fcm_token_resident"},
+            {"id": "eeeeeeee-0000-4000-8000-000000000002", "user_id": GUARD_ID, "token": "fcm_token_guard"},
+        ],
+        "visitor_tombstones": [],
+    }
+
+
+class FakeLLM:
+    """Stands in for the OpenAI client; replays scripted completions and counts calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.script = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.script:
+            return self.script.pop(0)
+        return text_completion("How can I help with your visitors?")
+
+
+def _completion(message):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message)],
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20),
+    )
+
+
+def text_completion(content):
+    return _completion(SimpleNamespace(content=content, tool_calls=None))
+
+
+def tool_completion(name, arguments):
+    tool_call = SimpleNamespace(
+        id="call_1",
+        type="function",
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments)),
+    )
+    return _completion(SimpleNamespace(content=None, tool_calls=[tool_call]))
+
+
+# Columns Postgres fills in on insert that the app reads back
+TABLE_DEFAULTS = {
+    "visitors": {
+        "approved_by": None,
+        "approved_at": None,
+        "checked_in_at": None,
+        "checked_out_at": None,
+        "scheduled_time": None,
+        "purpose": None,
+        "pass_id": None,
+    },
+    "visitor_passes": {
+        "purpose": None,
+        "valid_from": None,
+        "valid_until": None,
+    },
+    "events": {
+        # BIGSERIAL
+        "seq": itertools.count(1).__next__,
+        "inserted_at": lambda: datetime.now(timezone.utc).isoformat(),
+    },
+    "users": {
+        "phone": None,
+        "household_id": None,
+        "roles": ["resident"],
+    },
+}
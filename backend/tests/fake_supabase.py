@@ -0,0 +1,305 @@
+"""
+In-memory stand-in for the Supabase client
+
+Implements the subset of the supabase-py / postgrest-py query builder the
+app uses (table().select().eq()...execute(), insert/update/upsert/delete,
+or_ filters, ordering and limits) over plain lists of dicts, and records
+every executed call so tests can assert on database round trips.
+"""
+import copy
+import re
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _coerce(value):
+    if isinstance(value, str) and len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _like_to_regex(pattern: str) -> re.Pattern:
+    regex = "".join(".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in pattern)
+    return re.compile(f"^{regex}$", re.IGNORECASE | re.DOTALL)
+
+
+def _compare(op: str, actual, expected) -> bool:
+    if op == "eq":
+        return actual is not None and str(actual) == str(expected)
+    if op == "neq":
+        return actual is None or str(actual) != str(expected)
+    if op in ("gt", "gte", "lt", "lte"):
+        if actual is None:
+            return False
+        actual, expected = str(actual), str(expected)
+        return {
+            "gt": actual > expected,
+            "gte": actual >= expected,
+            "lt": actual < expected,
+            "lte": actual <= expected,
+        }[op]
+    if op in ("like", "ilike"):
+        return actual is not None and bool(_like_to_regex(str(expected)).match(str(actual)))
+    if op == "in":
+        return actual is not None and str(actual) in {str(v) for v in expected}
+    if op == "is":
+        return actual is None if expected in (None, "null") else actual == expected
+    if op == "cs":
+        wanted = expected.strip("{}").split(",") if isinstance(expected, str) else list(expected)
+        return all(item in (actual or []) for item in wanted if item)
+    raise NotImplementedError(f"Filter operator '{op}' is not supported by FakeSupabase")
+
+
+def _split_top_level(expression: str) -> List[str]:
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in expression:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _parse_tree(expression: str, combine) -> Callable[[dict], bool]:
+    """Parse a PostgREST logic tree such as `a.gt.1,and(a.eq.1,b.gt.2)`"""
+    conditions = []
+    for part in _split_top_level(expression):
+        part = part.strip()
+        if part.startswith("and("):
+            conditions.append(_parse_tree(part[4:-1], all))
+        elif part.startswith("or("):
+            conditions.append(_parse_tree(part[3:-1], any))
+        else:
+            column, op, value = part.split(".", 2)
+            conditions.append(lambda row, c=column, o=op, v=_coerce(value): _compare(o, row.get(c), v))
+    return lambda row: combine(condition(row) for condition in conditions)
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = "id"
+        self.filters = []
+        self.orders = []
+        self.limit_count = None
+        self.offset = 0
+
+    # Operations
+    def select(self, columns: str = "*", count=None, head=None):
+        self.operation = "select"
+        self.columns = columns
+        return self
+
+    def insert(self, data, **kwargs):
+        self.operation = "insert"
+        self.payload = data
+        return self
+
+    def upsert(self, data, on_conflict: str = "id", **kwargs):
+        self.operation = "upsert"
+        self.payload = data
+        self.on_conflict = on_conflict or "id"
+        return self
+
+    def update(self, data, **kwargs):
+        self.operation = "update"
+        self.payload = data
+        return self
+
+    def delete(self, **kwargs):
+        self.operation = "delete"
+        return self
+
+    # Filters
+    def _add(self, column, op, value):
+        self.filters.append(lambda row: _compare(op, row.get(column), value))
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._add(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._add(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._add(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._add(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._add(column, "lte", value)
+
+    def like(self, column, pattern):
+        return self._add(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._add(column, "ilike", pattern)
+
+    def in_(self, column, values):
+        return self._add(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._add(column, "is", value)
+
+    def contains(self, column, value):
+        return self._add(column, "cs", value)
+
+    def filter(self, column, operator, criteria):
+        if operator.startswith("not."):
+            inner = operator[4:]
+            self.filters.append(lambda row: not _compare(inner, row.get(column), criteria))
+            return self
+        return self._add(column, operator, criteria)
+
+    def or_(self, filters: str, reference_table: Optional[str] = None):
+        self.filters.append(_parse_tree(filters, any))
+        return self
+
+    # Modifiers
+    def order(self, column, desc: bool = False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size: int, **kwargs):
+        self.limit_count = size
+        return self
+
+    def range(self, start: int, end: int, **kwargs):
+        self.offset = start
+        self.limit_count = end - start + 1
+        return self
+
+    # Execution
+    def _matching(self) -> List[dict]:
+        return [row for row in self.db.rows(self.table_name) if all(f(row) for f in self.filters)]
+
+    def _project(self, rows: List[dict]) -> List[dict]:
+        columns = self.columns.replace(" ", "")
+        if columns in ("*", ""):
+            return [copy.deepcopy(row) for row in rows]
+        if columns == "count":
+            return [{"count": len(rows)}]
+        names = columns.split(",")
+        return [{name: copy.deepcopy(row.get(name)) for name in names} for row in rows]
+
+    def _prepare_new(self, record: dict) -> dict:
+        row = copy.deepcopy(record)
+        row.setdefault("id", str(uuid.uuid4()))
+        now = _now()
+        row.setdefault("created_at", now)
+        row.setdefault("updated_at", now)
+        for column, default in self.db.defaults.get(self.table_name, {}).items():
+            row.setdefault(column, default() if callable(default) else default)
+        return row
+
+    def execute(self):
+        self.db.record(self.table_name, self.operation)
+        if self.db.fail_tables and self.table_name in self.db.fail_tables:
+            raise RuntimeError(f"Simulated failure on table {self.table_name}")
+
+        rows = self.db.rows(self.table_name)
+
+        if self.operation in ("insert", "upsert"):
+            records = self.payload if isinstance(self.payload, list) else [self.payload]
+            written = []
+            for record in records:
+                existing = None
+                if self.operation == "upsert":
+                    keys = self.on_conflict.split(",")
+                    existing = next(
+                        (row for row in rows if all(str(row.get(k)) == str(record.get(k)) for k in keys)),
+                        None
+                    )
+                if existing is not None:
+                    existing.update(copy.deepcopy(record))
+                    existing["updated_at"] = _now()
+                    written.append(existing)
+                else:
+                    row = self._prepare_new(record)
+                    rows.append(row)
+                    written.append(row)
+            return SimpleNamespace(data=copy.deepcopy(written), count=None)
+
+        matching = self._matching()
+
+        if self.operation == "update":
+            for row in matching:
+                row.update(copy.deepcopy(self.payload))
+                row["updated_at"] = _now()
+            return SimpleNamespace(data=copy.deepcopy(matching), count=None)
+
+        if self.operation == "delete":
+            ids = {id(row) for row in matching}
+            self.db.tables[self.table_name] = [row for row in rows if id(row) not in ids]
+            return SimpleNamespace(data=copy.deepcopy(matching), count=None)
+
+        for column, desc in reversed(self.orders):
+            matching.sort(key=lambda row: (row.get(column) is None, str(row.get(column) or "")), reverse=desc)
+        if self.offset:
+            matching = matching[self.offset:]
+        if self.limit_count is not None:
+            matching = matching[:self.limit_count]
+        return SimpleNamespace(data=self._project(matching), count=len(matching))
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.db.record(f"rpc:{self.name}", "rpc")
+        handler = self.db.rpc_handlers.get(self.name)
+        if handler is None:
+            raise NotImplementedError(f"RPC '{self.name}' is not registered on FakeSupabase")
+        return SimpleNamespace(data=handler(self.db, **self.params), count=None)
+
+
+class FakeSupabase:
+    def __init__(self, tables: Optional[Dict[str, List[dict]]] = None):
+        self.tables = {name: [copy.deepcopy(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.calls = []
+        self.defaults = {}
+        self.rpc_handlers = {}
+        self.fail_tables = set()
+
+    def rows(self, table: str) -> List[dict]:
+        return self.tables.setdefault(table, [])
+
+    def record(self, table: str, operation: str):
+        self.calls.append((table, operation))
+
+    def reset_calls(self):
+        self.calls = []
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs) -> FakeRpc:
+        return FakeRpc(self, fn, params or {})
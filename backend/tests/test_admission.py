@@ -0,0 +1,80 @@
+"""
+Admission control: per-user token buckets, shared slots, the gate priority lane and /chat shedding
+"""
+import pytest
+
+from app.config import get_settings
+from app.utils.admission import DEFAULT, LLM, PRIORITY, admission, lane_for
+from tests.factories import APPROVED_VISITOR
+
+
+@pytest.fixture
+def busy(monkeypatch):
+    """Pretend `count` default-lane requests are in flight"""
+    def occupy(count):
+        monkeypatch.setitem(admission.in_flight, DEFAULT, count)
+    return occupy
+
+
+def test_lanes():
+    assert lane_for("POST", "/visitors/checkin") == PRIORITY
+    assert lane_for("POST", "/gate/checkins") == PRIORITY
+    assert lane_for("POST", "/chat/") == LLM
+    assert lane_for("GET", "/visitors/") == DEFAULT
+    assert lane_for("GET", "/health/ready") is None
+
+
+def test_chat_is_rate_limited_per_user(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_llm_user_burst", 2)
+    resident = auth_headers("resident")
+
+    assert [client.post("/chat/", json={"message": "hi"}, headers=resident).status_code for _ in range(3)] == [
+        200, 200, 429
+    ]
+    refused = client.post("/chat/", json={"message": "hi"}, headers=resident)
+    assert int(refused.headers["Retry-After"]) >= 1
+    # Other users have their own bucket, and other lanes are not charged
+    assert client.post("/chat/", json={"message": "hi"}, headers=auth_headers("admin")).status_code == 200
+    assert client.get("/visitors/", headers=resident).status_code == 200
+
+    assert 'admission_shed_total{lane="llm",reason="rate_limited"}' in client.get("/metrics").text
+
+
+def test_chat_is_shed_before_other_requests(client, auth_headers, busy):
+    settings = get_settings()
+    shared = settings.admission_max_concurrent - settings.admission_priority_reserved
+    busy(int(shared * settings.admission_llm_shed_at))
+
+    response = client.post("/chat/", json={"message": "hi"}, headers=auth_headers("resident"))
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+    assert client.get("/visitors/", headers=auth_headers("resident")).status_code == 200
+
+
+def test_gate_keeps_its_reserved_slots(client, auth_headers, busy):
+    settings = get_settings()
+    busy(settings.admission_max_concurrent - settings.admission_priority_reserved)
+
+    assert client.get("/visitors/", headers=auth_headers("resident")).status_code == 429
+    checkin = client.post("/visitors/checkin", json={"visitor_id": APPROVED_VISITOR}, headers=auth_headers("guard"))
+    assert checkin.status_code == 200
+    assert admission.in_flight[PRIORITY] == 0
+
+
+def test_gate_operations_are_not_rate_limited(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "admission_user_burst", 1)
+    guard = auth_headers("guard")
+
+    assert client.get("/visitors/", headers=guard).status_code == 200
+    assert client.get("/visitors/", headers=guard).status_code == 429
+    assert client.post("/visitors/checkin", json={"visitor_id": APPROVED_VISITOR}, headers=guard).status_code == 200
+    assert client.post("/visitors/checkout", json={"visitor_id": APPROVED_VISITOR}, headers=guard).status_code == 200
+
+
+def test_refusals_carry_cors_headers(client, auth_headers, busy):
+    settings = get_settings()
+    busy(settings.admission_max_concurrent - settings.admission_priority_reserved)
+
+    headers = {**auth_headers("resident"), "Origin": "http://localhost:3000"}
+    response = client.get("/visitors/", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] in ("*", "http://localhost:3000")
@@ -0,0 +1,179 @@
+"""
+Visitor analytics: incremental rollup from events, backfill and the /analytics endpoints
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import get_settings
+from app.utils import analytics
+from app.utils.analytics import aggregate_visitors, backfill, read_watermark, roll_up_once
+from tests.factories import CHECKED_IN_VISITOR, HOUSEHOLD_A, HOUSEHOLD_B, MAID_PASS, PENDING_VISITOR, seed_tables
+
+
+@pytest.fixture(autouse=True)
+def rpc_available(monkeypatch):
+    # A failed RPC switches the module to the client-side path for a while
+    monkeypatch.setattr(analytics, "_rpc_unavailable_until", 0.0)
+
+
+@pytest.fixture(autouse=True)
+def no_lag(monkeypatch):
+    # Events are rolled up as soon as they are inserted
+    monkeypatch.setattr(get_settings(), "analytics_rollup_lag_seconds", 0.0)
+
+
+def stats(db, household_id=HOUSEHOLD_A):
+    totals = dict.fromkeys(analytics.COUNTERS + ("dwell_seconds",), 0)
+    for row in db.rows("visitor_stats_hourly"):
+        if row["host_household_id"] == household_id:
+            for column in totals:
+                totals[column] += row[column]
+    return totals
+
+
+def test_rollup_counts_each_transition_once(client, fake_db, auth_headers):
+    resident, guard = auth_headers("resident"), auth_headers("guard")
+    visitor = client.post("/visitors/", json={"name": "Deepak Rao", "phone": "+919800000001"}, headers=resident).json()
+    client.post("/visitors/approve", json={"visitor_id": visitor["id"]}, headers=resident)
+    client.post("/visitors/deny", json={"visitor_id": PENDING_VISITOR}, headers=resident)
+    client.post("/visitors/checkin", json={"visitor_id": visitor["id"]}, headers=guard)
+
+    assert roll_up_once(fake_db, 1000) == 4
+    assert stats(fake_db) == {
+        "created": 1, "approved": 1, "denied": 1, "checked_in": 1, "checked_out": 0, "dwell_seconds": 0
+    }
+
+    # Caught up: nothing is counted twice
+    assert roll_up_once(fake_db, 1000) == 0
+    client.post("/visitors/checkout", json={"visitor_id": visitor["id"]}, headers=guard)
+    assert roll_up_once(fake_db, 1000) == 1
+    assert stats(fake_db)["checked_out"] == 1
+    assert read_watermark(fake_db)["last_seq"] == max(event["seq"] for event in fake_db.rows("events"))
+
+
+def test_rollup_in_batches(client, fake_db, auth_headers):
+    resident = auth_headers("resident")
+    for n in range(5):
+        client.post("/visitors/", json={"name": f"Guest {n}", "phone": f"+91980000010{n}"}, headers=resident)
+
+    assert [roll_up_once(fake_db, 2) for _ in range(4)] == [2, 2, 1, 0]
+    assert stats(fake_db)["created"] == 5
+
+
+def test_recent_events_wait_for_the_next_run(client, fake_db, auth_headers):
+    resident = auth_headers("resident")
+    for n in range(3):
+        client.post("/visitors/", json={"name": f"Guest {n}", "phone": f"+91980000010{n}"}, headers=resident)
+    events = fake_db.rows("events")
+    for event in events[:2]:
+        event["inserted_at"] = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+
+    # The third event may have a slower transaction in front of it
+    assert roll_up_once(fake_db, 1000, lag_seconds=30) == 2
+    assert read_watermark(fake_db)["last_seq"] == events[1]["seq"]
+    assert roll_up_once(fake_db, 1000, lag_seconds=0) == 1
+
+
+def test_only_the_lease_holder_rolls_up(client, fake_db, auth_headers, monkeypatch):
+    fake_db.rows("job_leases").append({
+        "name": "visitor_stats", "holder": None, "expires_at": "1970-01-01T00:00:00+00:00"
+    })
+    client.post("/visitors/", json={"name": "Deepak Rao", "phone": "+919800000001"}, headers=auth_headers("resident"))
+
+    assert analytics.rollup.run_if_leader() == 1
+    # Another worker finds the lease taken
+    monkeypatch.setattr("app.utils.leases.HOLDER", "other-worker")
+    client.post("/visitors/", json={"name": "Ravi Rao", "phone": "+919800000002"}, headers=auth_headers("resident"))
+    assert analytics.rollup.run_if_leader() == 0
+    assert stats(fake_db)["created"] == 1
+
+
+def test_dwell_time_from_checkin_to_checkout(client, fake_db, auth_headers):
+    visitor = next(row for row in fake_db.rows("visitors") if row["id"] == CHECKED_IN_VISITOR)
+    visitor["checked_in_at"] = (datetime.now(timezone.utc) - timedelta(minutes=90)).isoformat()
+    client.post("/visitors/checkout", json={"visitor_id": CHECKED_IN_VISITOR}, headers=auth_headers("guard"))
+
+    roll_up_once(fake_db, 1000)
+    assert 5390 <= stats(fake_db)["dwell_seconds"] <= 5410
+
+
+def test_pass_checkin_counts_as_created_and_approved(client, fake_db, auth_headers, monkeypatch):
+    monkeypatch.setattr(
+        "app.routers.passes.community_now",
+        lambda: datetime(2026, 1, 5, 8, 0, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    )
+    client.post("/passes/checkin", json={"pass_id": MAID_PASS}, headers=auth_headers("guard"))
+
+    roll_up_once(fake_db, 1000)
+    totals = stats(fake_db)
+    assert (totals["created"], totals["approved"], totals["checked_in"]) == (1, 1, 1)
+
+
+def test_rpc_applies_deltas_only_from_the_current_watermark(client, fake_db, auth_headers):
+    applied = []
+
+    def apply_visitor_stats(db, deltas, previous_seq, next_seq):
+        applied.append((deltas, previous_seq, next_seq))
+        # Another worker got there first
+        return False
+
+    fake_db.rpc_handlers["apply_visitor_stats"] = apply_visitor_stats
+    client.post("/visitors/", json={"name": "Deepak Rao", "phone": "+919800000001"}, headers=auth_headers("resident"))
+
+    assert roll_up_once(fake_db, 1000) == 0
+    deltas, previous_seq, next_seq = applied[0]
+    assert previous_seq == 0 and next_seq > 0
+    assert [row["created"] for row in deltas] == [1]
+    assert fake_db.rows("visitor_stats_hourly") == []
+
+
+def test_backfill_matches_visitor_timestamps(fake_db):
+    backfill(fake_db)
+
+    assert stats(fake_db) == {
+        "created": 3, "approved": 2, "denied": 0, "checked_in": 1, "checked_out": 0, "dwell_seconds": 0
+    }
+    assert stats(fake_db, HOUSEHOLD_B)["created"] == 1
+    # Seeded visitors were created in the 09:00 hour and approved at 08:00
+    assert {row["bucket"] for row in fake_db.rows("visitor_stats_hourly")} == {
+        "2026-01-01T08:00:00+00:00", "2026-01-01T09:00:00+00:00"
+    }
+
+
+def test_backfill_counts_revoked_passes_as_approved():
+    visitors = [{**row, "status": "denied"} for row in seed_tables()["visitors"] if row["status"] == "approved"]
+    rows = aggregate_visitors(visitors, revoked=[visitors[0]["id"]])
+    assert sum(row["approved"] for row in rows) == 1
+    assert sum(row["denied"] for row in rows) == 1
+
+
+def test_endpoints_read_the_rollup(client, fake_db, auth_headers):
+    backfill(fake_db)
+    fake_db.reset_calls()
+    params = {"start": "2026-01-01T00:00:00Z", "end": "2026-01-02T00:00:00Z"}
+
+    hourly = client.get("/analytics/hourly", params=params, headers=auth_headers("admin")).json()
+    assert [(item["bucket"][:13], item["created"]) for item in hourly["items"]] == [
+        ("2026-01-01T08", 0), ("2026-01-01T09", 4)
+    ]
+
+    households = client.get("/analytics/households", params=params, headers=auth_headers("admin")).json()
+    assert [(item["flat_no"], item["created"]) for item in households["items"]] == [("A101", 3), ("B201", 1)]
+
+    summary = client.get("/analytics/summary", params=params, headers=auth_headers("admin")).json()
+    assert summary["totals"]["approved"] == 3
+    assert "visitors" not in {table for table, _ in fake_db.calls}
+
+
+def test_endpoints_validate_access_and_range(client, auth_headers, monkeypatch):
+    assert client.get("/analytics/summary", headers=auth_headers("resident")).status_code == 403
+
+    too_long = {"start": "2026-01-01T00:00:00Z", "end": "2026-06-01T00:00:00Z"}
+    assert client.get("/analytics/hourly", params=too_long, headers=auth_headers("admin")).status_code == 400
+
+    monkeypatch.setattr(
+        "app.routers.analytics.get_settings", lambda: SimpleNamespace(storage_backend="sqlite")
+    )
+    assert client.get("/analytics/summary", headers=auth_headers("admin")).status_code == 503
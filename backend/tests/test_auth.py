@@ -0,0 +1,19 @@
+"""
+The signed-in user: GET /auth/me and its ETag
+"""
+from tests.factories import RESIDENT_ID
+
+
+def test_me_etag_follows_the_user_row(client, fake_db, auth_headers):
+    resident = auth_headers("resident")
+    first = client.get("/auth/me", headers=resident)
+    etag = first.headers["etag"]
+
+    assert client.get("/auth/me", headers={**resident, "If-None-Match": etag}).status_code == 304
+
+    # Edited outside this API (another worker, the Supabase dashboard)
+    next(user for user in fake_db.rows("users") if user["id"] == RESIDENT_ID)["display_name"] = "John D."
+    changed = client.get("/auth/me", headers={**resident, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["display_name"] == "John D."
+    assert changed.headers["etag"] != etag
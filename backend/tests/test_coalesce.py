@@ -0,0 +1,98 @@
+"""
+Read coalescing: shared in-flight reads, the micro-cache window and invalidation by writes
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.coalesce import SingleFlight
+from app.utils.metrics import render_metrics
+from tests.factories import APPROVED_VISITOR
+
+
+class SlowRead:
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.05)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def run_concurrently(flight, count, shape, key, read):
+    async def main():
+        return await asyncio.gather(*(flight.run(shape, key, read) for _ in range(count)), return_exceptions=True)
+    return asyncio.run(main())
+
+
+def test_concurrent_identical_reads_share_one_call():
+    flight, read = SingleFlight(), SlowRead(result=["row"])
+
+    results = run_concurrently(flight, 10, "test_shape", ("all", 1), read)
+
+    assert read.calls == 1
+    assert all(result is results[0] for result in results)
+    assert 'coalesce_requests_total{shape="test_shape",outcome="shared"} 9' in render_metrics()
+
+    # Within the window the result is reused; another key is its own read
+    assert asyncio.run(flight.run("test_shape", ("all", 1), read)) == ["row"]
+    assert asyncio.run(flight.run("test_shape", ("all", 2), read)) == ["row"]
+    assert read.calls == 2
+
+
+def test_failures_are_shared_but_not_cached():
+    flight, read = SingleFlight(), SlowRead(error=RuntimeError("database down"))
+
+    results = run_concurrently(flight, 5, "test_failure", "key", read)
+
+    assert read.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        asyncio.run(flight.run("test_failure", "key", read))
+    assert read.calls == 2
+
+
+def test_a_cancelled_leader_does_not_fail_the_others():
+    flight, read = SingleFlight(), SlowRead(result=["row"])
+
+    async def main():
+        leader = asyncio.ensure_future(flight.run("test_cancel", "key", read))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.run("test_cancel", "key", read))
+        await asyncio.sleep(0)
+        # The leader's client disconnects while the read is in flight
+        leader.cancel()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader, follower = asyncio.run(main())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert follower == ["row"]
+    assert read.calls == 1
+    # The finished read is still cached for the next caller
+    assert asyncio.run(flight.run("test_cancel", "key", read)) == ["row"]
+    assert read.calls == 1
+
+
+def test_guard_screens_share_the_visitor_list(client, fake_db, auth_headers):
+    guard = auth_headers("guard")
+    first = client.get("/visitors/", headers=guard).json()
+    assert client.get("/visitors/", headers=auth_headers("admin")).json() == first
+    assert fake_db.calls.count(("visitors", "select")) == 1
+
+    # Residents have their own scope
+    resident = client.get("/visitors/", headers=auth_headers("resident")).json()
+    assert len(resident) < len(first)
+
+    # A write on this worker is visible to the next read
+    client.post("/visitors/checkin", json={"visitor_id": APPROVED_VISITOR}, headers=guard)
+    after = {visitor["id"]: visitor["status"] for visitor in client.get("/visitors/", headers=guard).json()}
+    assert after[APPROVED_VISITOR] == "checked_in"
@@ -0,0 +1,106 @@
+"""
+Visitor retention compaction: bounded batches, archive fallback and intact counts
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils import compaction
+from app.utils.analytics import backfill
+from app.utils.compaction import compact_visitors
+from tests.factories import APPROVED_VISITOR, HOUSEHOLD_A, HOUSEHOLD_B, OTHER_HOUSEHOLD_VISITOR, PENDING_VISITOR
+
+CUTOFF = datetime(2026, 4, 1, tzinfo=timezone.utc)
+OLD = "2026-01-01T10:00:00+00:00"
+
+
+@pytest.fixture(autouse=True)
+def client_side(monkeypatch):
+    monkeypatch.setattr(compaction, "_rpc_unavailable_until", 0.0)
+
+
+def terminal(db, visitor_id, status="checked_out", updated_at=OLD):
+    visitor = next(row for row in db.rows("visitors") if row["id"] == visitor_id)
+    visitor.update({"status": status, "updated_at": updated_at})
+    if status == "checked_out":
+        visitor["checked_out_at"] = updated_at
+    return visitor
+
+
+def ids(db, table):
+    return {row["id"] for row in db.rows(table)}
+
+
+def test_moves_only_old_terminal_visitors(fake_db):
+    terminal(fake_db, PENDING_VISITOR, "denied")
+    terminal(fake_db, OTHER_HOUSEHOLD_VISITOR, updated_at="2026-05-01T10:00:00+00:00")
+
+    assert compact_visitors(fake_db, CUTOFF, batch_size=100, pause=0) == 1
+    assert ids(fake_db, "visitors_archive") == {PENDING_VISITOR}
+    assert PENDING_VISITOR not in ids(fake_db, "visitors")
+    assert OTHER_HOUSEHOLD_VISITOR in ids(fake_db, "visitors")
+    assert fake_db.rows("visitors_archive")[0]["archived_at"]
+
+
+def test_moves_in_bounded_batches(fake_db):
+    for visitor_id in (PENDING_VISITOR, APPROVED_VISITOR, OTHER_HOUSEHOLD_VISITOR):
+        terminal(fake_db, visitor_id)
+
+    assert compact_visitors(fake_db, CUTOFF, batch_size=2, pause=0) == 3
+    assert fake_db.calls.count(("visitors", "delete")) == 2
+    assert len(fake_db.rows("visitors_archive")) == 3
+
+
+def test_uses_the_rpc_when_available(fake_db):
+    calls = []
+    fake_db.rpc_handlers["compact_visitors"] = lambda db, cutoff, batch_size: calls.append(cutoff) or [
+        {"host_household_id": HOUSEHOLD_A, "moved": 2}
+    ]
+
+    assert compact_visitors(fake_db, CUTOFF, batch_size=100, pause=0) == 2
+    assert calls == [CUTOFF.isoformat()]
+
+
+def test_moved_batches_invalidate_visitor_reads(client, fake_db, auth_headers):
+    resident = auth_headers("resident")
+    before = client.get("/visitors/", headers=resident)
+    etags = [before.headers["etag"], client.get("/visitors/", headers=auth_headers("guard")).headers["etag"]]
+
+    terminal(fake_db, PENDING_VISITOR)
+    compact_visitors(fake_db, CUTOFF, batch_size=100, pause=0)
+
+    after = client.get("/visitors/", headers={**resident, "If-None-Match": etags[0]})
+    assert after.status_code == 200
+    assert PENDING_VISITOR not in {visitor["id"] for visitor in after.json()}
+    assert client.get("/visitors/", headers=auth_headers("guard")).headers["etag"] != etags[1]
+
+
+def test_get_visitor_falls_back_to_the_archive(client, fake_db, auth_headers):
+    terminal(fake_db, PENDING_VISITOR)
+    terminal(fake_db, OTHER_HOUSEHOLD_VISITOR)
+    compact_visitors(fake_db, CUTOFF, batch_size=100, pause=0)
+
+    response = client.get(f"/visitors/{PENDING_VISITOR}", headers=auth_headers("resident"))
+    assert response.status_code == 200
+    assert response.json()["status"] == "checked_out"
+    # Still scoped to the host household
+    assert client.get(f"/visitors/{OTHER_HOUSEHOLD_VISITOR}", headers=auth_headers("resident")).status_code == 403
+    assert client.get("/visitors/00000000-0000-4000-8000-000000000000",
+                      headers=auth_headers("admin")).status_code == 404
+
+
+def created_per_hour(db):
+    return sorted((row["bucket"], row["host_household_id"], row["created"]) for row in db.rows("visitor_stats_hourly"))
+
+
+def test_backfill_still_counts_compacted_visitors(fake_db):
+    backfill(fake_db)
+    before = created_per_hour(fake_db)
+
+    terminal(fake_db, PENDING_VISITOR, "denied")
+    terminal(fake_db, OTHER_HOUSEHOLD_VISITOR)
+    compact_visitors(fake_db, CUTOFF, batch_size=100, pause=0)
+    backfill(fake_db)
+
+    assert created_per_hour(fake_db) == before
+    assert {row["host_household_id"] for row in fake_db.rows("visitor_stats_hourly")} == {HOUSEHOLD_A, HOUSEHOLD_B}
@@ -0,0 +1,104 @@
+"""
+Event archival: monthly gzip files, checksums, bounded deletes and the archive reader
+"""
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import get_settings
+from app.utils.event_archive import (
+    ArchiveError, archive_events, read_archive, read_manifest, verify_file,
+)
+from tests.factories import APPROVED_VISITOR, PENDING_VISITOR
+
+CUTOFF = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def event(occurred_at, subject_id=PENDING_VISITOR, event_type="visitor_created"):
+    return {
+        "id": str(uuid.uuid4()), "type": event_type, "actor_user_id": None,
+        "subject_id": subject_id, "payload": {"visitor_name": "Ramesh Kumar"}, "occurred_at": occurred_at,
+    }
+
+
+@pytest.fixture
+def events(fake_db):
+    rows = [
+        event("2026-01-05T10:00:00+00:00"),
+        event("2026-01-20T10:00:00+00:00", APPROVED_VISITOR, "visitor_approved"),
+        event("2026-01-20T10:00:00+00:00", APPROVED_VISITOR, "visitor_checked_in"),
+        event("2026-02-11T10:00:00+00:00"),
+        event("2026-02-28T23:59:59+00:00", APPROVED_VISITOR, "visitor_checked_out"),
+        event("2026-03-02T10:00:00+00:00"),
+    ]
+    fake_db.rows("events").extend(rows)
+    return rows
+
+
+def test_archives_by_month_and_deletes_archived_rows(fake_db, events, tmp_path):
+    written = archive_events(fake_db, tmp_path, CUTOFF, batch_size=2)
+
+    assert [(entry["month"], entry["rows"]) for entry in written] == [("2026-01", 3), ("2026-02", 2)]
+    assert read_manifest(tmp_path) == written
+    assert [row["occurred_at"] for row in fake_db.rows("events")] == ["2026-03-02T10:00:00+00:00"]
+    # Deletes are bounded by the batch size
+    assert max(len(ids) for ids in [verify_file(tmp_path, entry) for entry in written]) == 3
+    assert fake_db.calls.count(("events", "delete")) == 3
+
+
+def test_reader_filters_newest_first(fake_db, events, tmp_path):
+    archive_events(fake_db, tmp_path, CUTOFF)
+
+    assert [e["occurred_at"][:10] for e in read_archive(tmp_path, limit=3)] == [
+        "2026-02-28", "2026-02-11", "2026-01-20"
+    ]
+    approved = read_archive(tmp_path, subject_id=APPROVED_VISITOR, event_type="visitor_approved")
+    assert [e["id"] for e in approved] == [events[1]["id"]]
+    january = read_archive(tmp_path, start=datetime(2026, 1, 10, tzinfo=timezone.utc),
+                           end=datetime(2026, 2, 1, tzinfo=timezone.utc))
+    assert {e["id"] for e in january} == {events[1]["id"], events[2]["id"]}
+    assert january[0]["payload"] == {"visitor_name": "Ramesh Kumar"}
+
+
+def test_naive_times_are_utc(fake_db, events, tmp_path, monkeypatch):
+    archive_events(fake_db, tmp_path, CUTOFF)
+    # Not the server's local time
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        before_noon = read_archive(tmp_path, start=datetime(2026, 2, 11), end=datetime(2026, 2, 11, 12, 0))
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+    assert [e["id"] for e in before_noon] == [events[3]["id"]]
+
+
+def test_interrupted_run_duplicates_are_dropped_by_the_reader(fake_db, events, tmp_path):
+    archive_events(fake_db, tmp_path, CUTOFF)
+    # As if the previous run died before deleting
+    fake_db.rows("events").extend(events[:2])
+    archive_events(fake_db, tmp_path, CUTOFF)
+
+    assert len(read_manifest(tmp_path)) == 3
+    assert len(read_archive(tmp_path, limit=100)) == 5
+
+
+def test_corrupted_file_fails_verification(fake_db, events, tmp_path):
+    entry = archive_events(fake_db, tmp_path, CUTOFF)[0]
+    with open(tmp_path / entry["file"], "ab") as f:
+        f.write(b"\0")
+
+    with pytest.raises(ArchiveError):
+        verify_file(tmp_path, entry)
+
+
+def test_admin_reads_the_archive(client, fake_db, events, tmp_path, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "event_archive_dir", str(tmp_path))
+    archive_events(fake_db, tmp_path, CUTOFF)
+
+    response = client.get("/admin/events/archive", params={"type": "visitor_created"}, headers=auth_headers("admin"))
+    assert response.status_code == 200
+    assert [e["id"] for e in response.json()["events"]] == [events[3]["id"], events[0]["id"]]
+    assert client.get("/admin/events/archive", headers=auth_headers("guard")).status_code == 403
@@ -0,0 +1,130 @@
+"""
+Committee exports: keyset-paged CSV/XLSX streams, filters and background jobs
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import get_settings
+from app.utils import compaction
+from app.utils.compaction import compact_visitors
+from tests.factories import (
+    APPROVED_VISITOR, CHECKED_IN_VISITOR, HOUSEHOLD_A, HOUSEHOLD_B, OTHER_HOUSEHOLD_VISITOR, PENDING_VISITOR
+)
+
+ALL_VISITORS = [PENDING_VISITOR, APPROVED_VISITOR, CHECKED_IN_VISITOR, OTHER_HOUSEHOLD_VISITOR]
+
+
+@pytest.fixture(autouse=True)
+def export_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_settings(), "export_page_size", 2)
+    monkeypatch.setattr(get_settings(), "export_dir", str(tmp_path))
+
+
+def read_csv(response):
+    assert response.status_code == 200
+    return list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+
+
+def sheet_rows(content):
+    with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+        assert {"[Content_Types].xml", "xl/workbook.xml"} <= set(workbook.namelist())
+        sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+    return [re.findall(r"<t xml:space=\"preserve\">(.*?)</t>", row) for row in re.findall(r"<row>(.*?)</row>", sheet)]
+
+
+def test_visitors_csv_is_read_page_by_page(client, fake_db, auth_headers):
+    response = client.get("/exports/visitors", headers=auth_headers("admin"))
+    rows = read_csv(response)
+
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    assert [row["id"] for row in rows] == ALL_VISITORS
+    assert rows[0]["flat_no"] == "A101"
+    # Two rows per query: 2 + 2 + an empty page
+    assert fake_db.calls.count(("visitors", "select")) == 3
+
+
+def test_visitor_filters(client, auth_headers):
+    rows = read_csv(client.get(
+        "/exports/visitors",
+        params={"household_id": HOUSEHOLD_A, "start": "2026-01-01T09:01:00+00:00", "end": "2026-01-01T09:03:00+00:00"},
+        headers=auth_headers("admin")
+    ))
+    assert {row["host_household_id"] for row in rows} == {HOUSEHOLD_A}
+    assert all("09:01" <= row["created_at"][11:16] < "09:03" for row in rows)
+
+    response = client.get("/exports/visitors", params={"start": "2026-02-01", "end": "2026-01-01"},
+                          headers=auth_headers("admin"))
+    assert response.status_code == 400
+
+
+def test_cells_are_not_run_as_formulas(client, fake_db, auth_headers):
+    visitor = next(row for row in fake_db.rows("visitors") if row["id"] == PENDING_VISITOR)
+    visitor.update({"name": "=HYPERLINK(\"http://x\")", "phone": "+91 98000 00001"})
+
+    row = read_csv(client.get("/exports/visitors", headers=auth_headers("admin")))[0]
+    assert row["name"] == "'=HYPERLINK(\"http://x\")"
+    assert row["phone"] == "+91 98000 00001"
+
+
+def test_visitors_xlsx(client, auth_headers):
+    response = client.get("/exports/visitors", params={"format": "xlsx"}, headers=auth_headers("admin"))
+
+    assert response.headers["content-type"].startswith("application/vnd.openxmlformats")
+    rows = sheet_rows(response.content)
+    assert rows[0][:2] == ["id", "name"]
+    assert [row[0] for row in rows[1:]] == ALL_VISITORS
+
+
+def test_archived_visitors_follow_active_ones(client, fake_db, auth_headers, monkeypatch):
+    monkeypatch.setattr(compaction, "_rpc_unavailable_until", float("inf"))
+    visitor = next(row for row in fake_db.rows("visitors") if row["id"] == PENDING_VISITOR)
+    visitor.update({"status": "denied", "updated_at": "2026-01-01T10:00:00+00:00"})
+    compact_visitors(fake_db, datetime(2026, 4, 1, tzinfo=timezone.utc), batch_size=100, pause=0)
+
+    ids = [row["id"] for row in read_csv(client.get("/exports/visitors", headers=auth_headers("admin")))]
+    assert ids[-1] == PENDING_VISITOR and len(ids) == 4
+
+    active = read_csv(client.get("/exports/visitors", params={"include_archived": "false"},
+                                 headers=auth_headers("admin")))
+    assert PENDING_VISITOR not in {row["id"] for row in active}
+
+
+def test_events_by_household(client, auth_headers):
+    resident, guard = auth_headers("resident"), auth_headers("guard")
+    client.post("/visitors/approve", json={"visitor_id": PENDING_VISITOR}, headers=resident)
+    client.post("/visitors/checkin", json={"visitor_id": OTHER_HOUSEHOLD_VISITOR}, headers=guard)
+
+    household_a = read_csv(client.get("/exports/events", params={"household_id": HOUSEHOLD_A},
+                                      headers=auth_headers("admin")))
+    assert [(row["type"], row["subject_id"]) for row in household_a] == [("visitor_approved", PENDING_VISITOR)]
+
+    household_b = read_csv(client.get("/exports/events", params={"household_id": HOUSEHOLD_B},
+                                      headers=auth_headers("admin")))
+    assert [row["subject_id"] for row in household_b] == [OTHER_HOUSEHOLD_VISITOR]
+
+
+def test_exports_are_for_the_committee(client, auth_headers):
+    assert client.get("/exports/visitors", headers=auth_headers("resident")).status_code == 403
+    assert client.post("/exports/jobs", json={"kind": "events"}, headers=auth_headers("guard")).status_code == 403
+
+
+def test_background_job_writes_the_same_file(client, auth_headers):
+    admin = auth_headers("admin")
+    job = client.post("/exports/jobs", json={"kind": "visitors", "household_id": HOUSEHOLD_A}, headers=admin)
+    assert job.status_code == 202
+
+    # The test client runs background tasks before returning
+    status = client.get(f"/exports/jobs/{job.json()['id']}", headers=admin).json()
+    assert status["status"] == "done" and status["size_bytes"] > 0
+
+    download = client.get(f"/exports/jobs/{status['id']}/download", headers=admin)
+    streamed = client.get("/exports/visitors", params={"household_id": HOUSEHOLD_A}, headers=admin)
+    assert read_csv(download) == read_csv(streamed)
+
+    assert client.get("/exports/jobs/not-a-job", headers=admin).status_code == 404
@@ -0,0 +1,145 @@
+"""
+Signed gate passes: offline verification, revocation and batch check-in commits
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.routers import gate
+from app.utils.gate_pass import GatePassError, mint_gate_pass, public_keys, verify_gate_pass
+from tests.factories import APPROVED_VISITOR, HOUSEHOLD_A, PENDING_VISITOR
+
+APPROVED_AT = datetime(2026, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def test_pass_round_trip_and_size():
+    token = mint_gate_pass(APPROVED_VISITOR, HOUSEHOLD_A, APPROVED_AT, APPROVED_AT + timedelta(hours=24))
+    assert len(token) < 160
+
+    gate_pass = verify_gate_pass(token, public_keys())
+    assert gate_pass.visitor_id == APPROVED_VISITOR
+    assert gate_pass.household_id == HOUSEHOLD_A
+    assert gate_pass.valid_at(APPROVED_AT + timedelta(hours=3))
+    assert not gate_pass.valid_at(APPROVED_AT + timedelta(hours=25))
+
+
+def test_tampered_or_foreign_pass_is_rejected():
+    token = mint_gate_pass(APPROVED_VISITOR, HOUSEHOLD_A, APPROVED_AT, APPROVED_AT + timedelta(hours=24))
+    tampered = token[:10] + ("A" if token[10] != "A" else "B") + token[11:]
+
+    with pytest.raises(GatePassError):
+        verify_gate_pass(tampered)
+    with pytest.raises(GatePassError):
+        verify_gate_pass(token, {})
+    with pytest.raises(GatePassError):
+        verify_gate_pass("not-a-pass")
+
+
+def test_approval_returns_a_verifiable_pass(client, auth_headers):
+    response = client.post("/visitors/approve", json={"visitor_id": PENDING_VISITOR}, headers=auth_headers("resident"))
+    assert verify_gate_pass(response.json()["gate_pass"]).visitor_id == PENDING_VISITOR
+
+    keys = client.get("/gate/keys", headers=auth_headers("guard")).json()["keys"]
+    assert verify_gate_pass(response.json()["gate_pass"], keys).visitor_id == PENDING_VISITOR
+
+
+def gate_pass(client, headers, visitor_id=APPROVED_VISITOR):
+    return client.get(f"/visitors/{visitor_id}/gate-pass", headers=headers).json()["gate_pass"]
+
+
+def commit(client, headers, *checkins):
+    response = client.post("/gate/checkins", json={"checkins": [
+        {"gate_pass": token, "checked_in_at": at} for token, at in checkins
+    ]}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_commit_is_idempotent(client, fake_db, auth_headers):
+    guard = auth_headers("guard")
+    token = gate_pass(client, auth_headers("resident"))
+
+    first = commit(client, guard, (token, "2026-01-01T09:30:00+00:00"))
+    assert first["committed"] == 1
+    visitor = next(v for v in fake_db.rows("visitors") if v["id"] == APPROVED_VISITOR)
+    assert visitor["status"] == "checked_in"
+    assert visitor["checked_in_at"].startswith("2026-01-01T09:30:00")
+
+    retry = commit(client, guard, (token, "2026-01-01T09:30:00+00:00"))
+    assert retry["committed"] == 0
+    assert retry["results"][0]["result"] == "duplicate"
+
+
+def test_commit_reports_each_failure(client, auth_headers):
+    token = gate_pass(client, auth_headers("resident"))
+
+    body = commit(
+        client, auth_headers("guard"),
+        ("garbage", "2026-01-01T09:30:00+00:00"),
+        (token, "2026-01-03T09:30:00+00:00"),
+    )
+    assert [r["result"] for r in body["results"]] == ["invalid", "expired"]
+
+
+def test_revoked_pass_is_listed_and_rejected(client, auth_headers):
+    resident = auth_headers("resident")
+    token = client.post("/visitors/approve", json={"visitor_id": PENDING_VISITOR}, headers=resident).json()["gate_pass"]
+    before = client.get("/gate/revocations", headers=auth_headers("guard"))
+    assert before.json()["revoked"] == []
+
+    revoke = client.post("/gate/revoke", json={"visitor_id": PENDING_VISITOR, "reason": "Plans changed"}, headers=resident)
+    assert revoke.status_code == 200
+
+    after = client.get("/gate/revocations", headers=auth_headers("guard"))
+    assert [r["visitor_id"] for r in after.json()["revoked"]] == [PENDING_VISITOR]
+    assert after.headers["etag"] != before.headers["etag"]
+
+    checked_in_at = datetime.now(timezone.utc).isoformat()
+    body = commit(client, auth_headers("guard"), (token, checked_in_at))
+    assert body["results"][0] == {"visitor_id": PENDING_VISITOR, "result": "rejected", "detail": "denied"}
+
+
+
+def test_revoke_loses_to_a_concurrent_check_in(client, fake_db, auth_headers, monkeypatch):
+    record = fake_db.record
+
+    def checked_in_first(table, operation):
+        record(table, operation)
+        if (table, operation) == ("visitors", "update"):
+            # A guard checks the visitor in between the revoke's read and its update
+            next(row for row in fake_db.rows("visitors") if row["id"] == APPROVED_VISITOR)["status"] = "checked_in"
+    monkeypatch.setattr(fake_db, "record", checked_in_first)
+
+    revoke = client.post("/gate/revoke", json={"visitor_id": APPROVED_VISITOR}, headers=auth_headers("resident"))
+    assert revoke.status_code == 409
+    assert next(row for row in fake_db.rows("visitors") if row["id"] == APPROVED_VISITOR)["status"] == "checked_in"
+    assert fake_db.rows("gate_pass_revocations") == []
+    assert ("events", "insert") not in fake_db.calls
+
+
+def test_only_approved_visitors_get_a_pass(client, auth_headers):
+    response = client.get(f"/visitors/{PENDING_VISITOR}/gate-pass", headers=auth_headers("resident"))
+    assert response.status_code == 400
+
+
+def test_revocation_during_commit_wins(client, fake_db, auth_headers, monkeypatch):
+    token = gate_pass(client, auth_headers("resident"))
+    monkeypatch.setattr(gate, "_rpc_unavailable_until", 0.0)
+
+    def revoked_first(db, checkins):
+        # The resident's revocation commits just before the batch's update runs
+        next(row for row in db.rows("visitors") if row["id"] == APPROVED_VISITOR)["status"] = "denied"
+        return []
+    fake_db.rpc_handlers["commit_gate_checkins"] = revoked_first
+
+    body = commit(client, auth_headers("guard"), (token, "2026-01-01T09:30:00+00:00"))
+    assert body["committed"] == 0
+    assert body["results"][0] == {"visitor_id": APPROVED_VISITOR, "result": "rejected", "detail": "denied"}
+
+
+def test_fallback_only_updates_approved_visitors(fake_db):
+    fake_db.rows("visitors")[0]["status"] = "denied"
+    denied = fake_db.rows("visitors")[0]["id"]
+
+    committed = gate.check_in_approved(fake_db, {denied: "2026-01-01T09:30:00+00:00"})
+    assert committed == [] and fake_db.rows("visitors")[0]["status"] == "denied"
@@ -0,0 +1,61 @@
+"""
+Health endpoints serve the background probe's cached results
+"""
+import asyncio
+
+import pytest
+
+from app.utils import health
+from app.utils.health import HealthMonitor
+
+
+@pytest.fixture
+def monitor(fake_db, monkeypatch):
+    monkeypatch.setattr(health, "_probe_llm", lambda timeout: None)
+    monitor = HealthMonitor()
+    monkeypatch.setattr(health, "monitor", monitor)
+    monkeypatch.setattr("app.main.health_monitor", monitor)
+    return monitor
+
+
+def test_not_ready_before_first_probe(client, monitor):
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unknown"
+    assert client.get("/health/live").status_code == 200
+
+
+def test_ready_after_probe(client, monitor, fake_db):
+    asyncio.run(monitor.probe())
+    fake_db.reset_calls()
+
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    body = client.get("/health").json()
+    assert body["status"] == "healthy"
+    assert body["database"] == "connected"
+    assert fake_db.calls == []
+
+
+def test_database_down_after_consecutive_failures(client, monitor, fake_db):
+    fake_db.fail_tables = {"users"}
+    for _ in range(monitor.settings.health_failure_threshold - 1):
+        asyncio.run(monitor.probe())
+    # A single failure degrades but keeps the worker in rotation
+    assert monitor.checks["database"].status == "degraded"
+    assert client.get("/health/ready").status_code == 200
+
+    asyncio.run(monitor.probe())
+    assert monitor.checks["database"].status == "down"
+    assert client.get("/health/ready").status_code == 503
+    assert client.get("/health").json()["database"] == "disconnected"
+
+    fake_db.fail_tables = set()
+    asyncio.run(monitor.probe())
+    assert client.get("/health/ready").status_code == 200
+
+
+def test_stale_probe_is_not_ready(client, monitor):
+    asyncio.run(monitor.probe())
+    monitor.last_probe_at -= monitor.settings.health_stale_after_seconds + 1
+    assert client.get("/health/ready").status_code == 503
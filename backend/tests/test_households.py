@@ -0,0 +1,39 @@
+"""
+Household directory: flat lookups, pagination and membership from one cached load
+"""
+from app.utils.directory import directory, normalize_flat_no
+from tests.factories import HOUSEHOLD_A, HOUSEHOLD_B, RESIDENT_B_ID, RESIDENT_ID
+
+
+def test_normalize_flat_no():
+    assert normalize_flat_no("a-101") == normalize_flat_no("A 101") == "A101"
+
+
+def test_lookups_share_one_load(client, fake_db, auth_headers):
+    headers = auth_headers("guard")
+    assert client.get("/households/by-flat/b-201", headers=headers).json()["id"] == HOUSEHOLD_B
+    household = client.get(f"/households/{HOUSEHOLD_A}", headers=headers).json()
+    assert sorted(household["members"]) == sorted([RESIDENT_ID, RESIDENT_B_ID])
+
+    # One directory load serves both lookups
+    assert fake_db.calls.count(("households", "select")) == 1
+
+
+def test_pagination_in_flat_order(client, auth_headers):
+    body = client.get("/households/", params={"limit": 1, "offset": 1}, headers=auth_headers("guard")).json()
+    assert body["total"] == 2
+    assert [household["flat_no"] for household in body["items"]] == ["B201"]
+
+
+def test_create_rejects_duplicate_flat(client, auth_headers):
+    headers = auth_headers("admin")
+    assert client.post("/households/", json={"flat_no": "a-101"}, headers=headers).status_code == 400
+
+    created = client.post("/households/", json={"flat_no": "C301", "name": "The Iyer Family"}, headers=headers)
+    assert created.status_code == 200
+    assert directory.by_flat("c-301")["id"] == created.json()["id"]
+
+
+def test_unknown_household_is_404(client, auth_headers):
+    response = client.get("/households/00000000-0000-4000-8000-000000000000", headers=auth_headers("guard"))
+    assert response.status_code == 404
@@ -0,0 +1,104 @@
+"""
+Cross-worker invalidation bus: applying messages, gaps, reconnects and the fallback TTL
+"""
+import asyncio
+import json
+import queue
+import time
+
+from app.utils.directory import directory
+from app.utils.invalidation import MESSAGE_VERSION, InvalidationBus, bus
+from app.utils.passes import passes
+from app.utils.versions import VISITORS_SCOPE, EVENTS_SCOPE, get_version
+
+
+class FakeBroker:
+    """In-memory pub/sub channel shared by several buses"""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def backend(self):
+        return FakeBackend(self)
+
+
+class FakeBackend:
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, channel, payload):
+        for subscriber in self.broker.subscribers:
+            subscriber.put(payload)
+
+    def listen(self, channel, stop):
+        messages = queue.SimpleQueue()
+        self.broker.subscribers.append(messages)
+        while not stop.is_set():
+            try:
+                yield messages.get(timeout=0.01)
+            except queue.Empty:
+                yield None
+
+
+def message(seq, name, keys=None, origin="other-worker"):
+    return json.dumps({"v": MESSAGE_VERSION, "origin": origin, "seq": seq, "name": name, "keys": keys})
+
+
+def test_applies_other_workers_invalidations(fake_db, monkeypatch):
+    monkeypatch.setattr(bus, "_last_seen", {})
+    directory.refresh()
+    visitors, events = get_version(VISITORS_SCOPE), get_version(EVENTS_SCOPE)
+
+    bus.receive(message(1, "versions", [VISITORS_SCOPE]))
+    bus.receive(message(2, "directory"))
+    # Our own messages come back on the channel too
+    bus.receive(message(1, "versions", [EVENTS_SCOPE], origin=bus.worker_id))
+
+    assert get_version(VISITORS_SCOPE) == visitors + 1
+    assert get_version(EVENTS_SCOPE) == events
+    assert directory._loaded_at is None
+
+
+def test_a_missed_message_drops_everything(fake_db, monkeypatch):
+    monkeypatch.setattr(bus, "_last_seen", {})
+    passes.refresh()
+    events = get_version(EVENTS_SCOPE)
+
+    bus.receive(message(1, "directory"))
+    bus.receive(message(3, "directory"))
+
+    assert get_version(EVENTS_SCOPE) == events + 1
+    assert passes._loaded_at is None
+
+
+def test_workers_hear_each_other():
+    broker = FakeBroker()
+    first, second = InvalidationBus(), InvalidationBus()
+    heard = []
+    second.register("versions", heard.append)
+
+    async def main():
+        first.start_with(broker.backend())
+        second.start_with(broker.backend())
+        while not (first.connected and second.connected):
+            await asyncio.sleep(0.01)
+        first.publish("versions", [VISITORS_SCOPE])
+        deadline = time.monotonic() + 2
+        while len(heard) < 2 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        first.stop()
+        second.stop()
+
+    asyncio.run(main())
+    # Everything is dropped on connecting, then the message is applied
+    assert heard == [None, [VISITORS_SCOPE]]
+
+
+def test_caches_expire_sooner_while_disconnected():
+    worker = InvalidationBus()
+    assert worker.ttl(300) == 300
+
+    worker.backend = FakeBroker().backend()
+    assert worker.ttl(300) == worker.settings.invalidation_fallback_ttl_seconds
+    worker.connected = True
+    assert worker.ttl(300) == 300
@@ -0,0 +1,56 @@
+"""
+Metrics: per-thread shards, and folding the shards of exited threads into one total
+"""
+import threading
+
+from app.utils.metrics import Counter, Histogram
+
+
+def run_threads(count, fn):
+    for _ in range(count):
+        thread = threading.Thread(target=fn)
+        thread.start()
+        thread.join()
+
+
+def test_exited_threads_do_not_pile_up_shards():
+    requests = Counter("test_thread_requests_total", "Test counter", ("route",))
+    latency = Histogram("test_thread_latency_seconds", "Test histogram", buckets=(0.1, 1.0))
+
+    def handle():
+        requests.inc("/visitors/")
+        latency.observe(0.5)
+
+    # Like threadpool workers retiring and being replaced
+    for _ in range(5):
+        run_threads(20, handle)
+        requests.render()
+        assert len(requests._shards) <= 1 and len(latency._shards) <= 1
+
+    assert 'test_thread_requests_total{route="/visitors/"} 100' in requests.render()
+    rendered = latency.render()
+    assert 'test_thread_latency_seconds_bucket{le="0.1"} 0' in rendered
+    assert 'test_thread_latency_seconds_bucket{le="1.0"} 100' in rendered
+    assert "test_thread_latency_seconds_count 100" in rendered
+
+
+def test_live_threads_keep_their_shards():
+    requests = Counter("test_live_requests_total", "Test counter")
+    recorded, done = threading.Event(), threading.Event()
+
+    def worker():
+        requests.inc()
+        recorded.set()
+        done.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    recorded.wait()
+    requests.inc()
+    assert "test_live_requests_total 2" in requests.render()
+    assert len(requests._shards) == 2
+
+    done.set()
+    thread.join()
+    assert "test_live_requests_total 2" in requests.render()
+    assert len(requests._shards) == 1
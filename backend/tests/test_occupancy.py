@@ -0,0 +1,84 @@
+"""
+Live occupancy: counter maintained by transitions, reconciliation and the stream
+"""
+import json
+
+import pytest
+
+from app.config import get_settings
+from app.utils.occupancy import occupancy, tower_of
+from tests.factories import (
+    APPROVED_VISITOR, CHECKED_IN_VISITOR, HOUSEHOLD_A, HOUSEHOLD_B, OTHER_HOUSEHOLD_VISITOR,
+    text_completion, tool_completion,
+)
+
+
+def current(client, headers):
+    return client.get("/visitors/occupancy", headers=headers).json()
+
+
+@pytest.mark.parametrize("flat_no, tower", [("A101", "A"), ("T03-1204", "T03"), ("b-201", "B"), ("101", "101")])
+def test_tower_of(flat_no, tower):
+    assert tower_of(flat_no) == tower
+
+
+def test_starts_from_checked_in_visitors(client, auth_headers):
+    body = current(client, auth_headers("guard"))
+    assert body["total"] == 1
+    assert body["by_household"] == {HOUSEHOLD_A: 1}
+    assert body["by_tower"] == {"A": 1}
+    assert body["reconciled_at"] is not None
+
+
+def test_transitions_update_the_count_without_queries(client, fake_db, auth_headers):
+    guard = auth_headers("guard")
+    current(client, guard)
+
+    client.post("/visitors/checkin", json={"visitor_id": OTHER_HOUSEHOLD_VISITOR}, headers=guard)
+    client.post("/visitors/checkout", json={"visitor_id": CHECKED_IN_VISITOR}, headers=guard)
+    fake_db.reset_calls()
+
+    assert current(client, guard)["by_tower"] == {"B": 1}
+    assert ("visitors", "select") not in fake_db.calls
+
+
+def test_chat_checkin_counts(client, fake_llm, auth_headers):
+    guard = auth_headers("guard")
+    current(client, guard)
+    fake_llm.script = [
+        tool_completion("checkin_visitor", {"visitor_name": "Suresh"}),
+        text_completion("Checked in Suresh."),
+    ]
+    client.post("/chat/", json={"message": "check in Suresh"}, headers=guard)
+
+    assert current(client, guard)["by_household"] == {HOUSEHOLD_A: 2}
+
+
+def test_reconcile_corrects_drift(client, fake_db, auth_headers):
+    guard = auth_headers("guard")
+    current(client, guard)
+
+    # Checked in by another worker
+    visitor = next(row for row in fake_db.rows("visitors") if row["id"] == APPROVED_VISITOR)
+    visitor["status"] = "checked_in"
+    assert current(client, guard)["total"] == 1
+
+    occupancy.reconcile()
+    assert current(client, guard)["total"] == 2
+
+
+def test_residents_see_their_household(client, auth_headers):
+    client.post("/visitors/checkin", json={"visitor_id": OTHER_HOUSEHOLD_VISITOR}, headers=auth_headers("guard"))
+    body = current(client, auth_headers("resident"))
+    assert body["by_household"] == {HOUSEHOLD_A: 1}
+    assert HOUSEHOLD_B not in body["by_household"]
+
+
+def test_stream_sends_the_current_counts(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_settings(), "occupancy_stream_max_seconds", 0)
+    response = client.get("/visitors/occupancy/stream", headers=auth_headers("guard"))
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    event, data = response.text.strip().split("\n")
+    assert event == "event: occupancy"
+    assert json.loads(data[len("data: "):])["total"] == 1
@@ -0,0 +1,114 @@
+"""
+Recurring visitor passes: schedule rules, gate check-in and scoping
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app as fastapi_app
+from app.storage.sqlite import SQLiteClient
+from app.utils.passes import pass_allows
+from tests.conftest import use_database
+from tests.factories import HOUSEHOLD_A, HOUSEHOLD_B, MAID_PASS, MAID_PHONE, seed_tables
+
+TZ = ZoneInfo("Asia/Kolkata")
+MAID = seed_tables()["visitor_passes"][0]
+
+
+def local(day, hour, minute=0):
+    # January 2026: the 5th is a Monday
+    return datetime(2026, 1, day, hour, minute, tzinfo=TZ)
+
+
+@pytest.mark.parametrize("at, allowed", [
+    (local(5, 8), True),
+    (local(5, 6, 50), True),     # early arrival
+    (local(5, 6, 40), False),
+    (local(5, 10, 1), False),
+    (local(10, 8), True),        # Saturday
+    (local(11, 8), False),       # Sunday
+])
+def test_pass_allows_days_and_window(at, allowed):
+    assert pass_allows(MAID, at) is allowed
+
+
+def test_pass_allows_validity_dates():
+    assert not pass_allows({**MAID, "valid_until": "2026-01-04"}, local(5, 8))
+    assert not pass_allows({**MAID, "valid_from": "2026-01-06"}, local(5, 8))
+    assert not pass_allows({**MAID, "active": False}, local(5, 8))
+
+
+@pytest.fixture
+def at_gate(monkeypatch):
+    def set_time(at):
+        monkeypatch.setattr("app.routers.passes.community_now", lambda: at)
+    set_time(local(5, 8))
+    return set_time
+
+
+def test_checkin_creates_checked_in_visitor(client, fake_db, auth_headers, at_gate):
+    response = client.post("/passes/checkin", json={"pass_id": MAID_PASS}, headers=auth_headers("guard"))
+    assert response.status_code == 200
+    visitor = response.json()["visitor"]
+    assert visitor["status"] == "checked_in"
+    assert visitor["pass_id"] == MAID_PASS
+    assert visitor["host_household_id"] == HOUSEHOLD_A
+
+    # The visit ends with the regular checkout
+    checkout = client.post("/visitors/checkout", json={"visitor_id": visitor["id"]}, headers=auth_headers("guard"))
+    assert checkout.status_code == 200
+
+
+def test_checkin_outside_window_is_refused(client, auth_headers, at_gate):
+    at_gate(local(11, 8))
+    response = client.post("/passes/checkin", json={"phone": MAID_PHONE}, headers=auth_headers("guard"))
+    assert response.status_code == 403
+
+
+def test_phone_with_passes_in_two_households_needs_pass_id(client, fake_db, auth_headers, at_gate):
+    fake_db.rows("visitor_passes").append({**MAID, "id": "second-pass", "host_household_id": HOUSEHOLD_B})
+
+    response = client.post("/passes/checkin", json={"phone": "9000011111"}, headers=auth_headers("guard"))
+    assert response.status_code == 409
+    assert sorted(response.json()["detail"]["pass_ids"]) == sorted([MAID_PASS, "second-pass"])
+
+
+def test_new_pass_is_usable_immediately(client, auth_headers, at_gate):
+    created = client.post("/passes/", json={
+        "name": "Raju", "phone": "+91 90000 22222", "days_of_week": [0], "start_time": "07:30", "end_time": "09:00"
+    }, headers=auth_headers("resident"))
+    assert created.status_code == 200
+
+    response = client.post("/passes/checkin", json={"phone": "90000 22222"}, headers=auth_headers("guard"))
+    assert response.status_code == 200
+
+
+def test_invalid_rule_is_rejected(client, auth_headers):
+    response = client.post("/passes/", json={
+        "name": "Raju", "phone": "1", "days_of_week": [7], "start_time": "09:00", "end_time": "08:00"
+    }, headers=auth_headers("resident"))
+    assert response.status_code == 422
+
+
+def test_only_the_household_can_revoke(client, fake_db, auth_headers):
+    fake_db.rows("visitor_passes").append({**MAID, "id": "other-pass", "host_household_id": HOUSEHOLD_B})
+
+    assert client.delete("/passes/other-pass", headers=auth_headers("resident")).status_code == 403
+    assert client.delete(f"/passes/{MAID_PASS}", headers=auth_headers("resident")).status_code == 200
+    assert [p["id"] for p in client.get("/passes/", headers=auth_headers("guard")).json()] == ["other-pass"]
+
+
+def test_second_checkin_while_inside_is_rejected(tmp_path, monkeypatch, fake_llm, auth_headers, at_gate):
+    db = SQLiteClient(str(tmp_path / "gate.db"))
+    for table, rows in seed_tables().items():
+        if rows:
+            db.table(table).insert(rows).execute(replicate=False)
+    use_database(monkeypatch, db)
+    client = TestClient(fastapi_app)
+
+    first = client.post("/passes/checkin", json={"pass_id": MAID_PASS}, headers=auth_headers("guard"))
+    assert first.status_code == 200
+    second = client.post("/passes/checkin", json={"pass_id": MAID_PASS}, headers=auth_headers("guard"))
+    assert second.status_code == 409
@@ -0,0 +1,22 @@
+"""
+On-demand request profiler: picking requests and downloading their profiles
+"""
+from app.utils import profiler
+
+
+def test_profiles_a_matching_request(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(profiler, "profiles", profiler.deque(maxlen=profiler.MAX_STORED_PROFILES))
+    for field, value in {"enabled": True, "route": "/visitors", "interval_ms": 1}.items():
+        monkeypatch.setattr(profiler.config, field, value)
+    admin = auth_headers("admin")
+
+    assert client.get("/visitors/", headers=auth_headers("guard")).status_code == 200
+    monkeypatch.setattr(profiler.config, "enabled", False)
+
+    [summary] = client.get("/admin/profiles", headers=admin).json()["profiles"]
+    assert summary["path"] == "/visitors/" and summary["status"] == 200
+    assert summary["thread"] == "event_loop"
+    assert not profiler._active.is_set()
+
+    collapsed = client.get(f"/admin/profiles/{summary['id']}", params={"format": "collapsed"}, headers=admin)
+    assert collapsed.status_code == 200
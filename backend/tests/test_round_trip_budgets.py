@@ -0,0 +1,604 @@
+"""
+Database / LLM round-trip budgets per endpoint
+
+Each scenario makes one request against the app, backed by the in-memory
+FakeSupabase and FakeLLM, and checks the number of database and LLM calls
+against tests/round_trip_budgets.json. A change that adds a round trip fails
+with the per-table breakdown of the calls. If the extra call is intended,
+update the budget file by hand or regenerate it with
+
+    UPDATE_ROUND_TRIP_BUDGETS=1 python -m pytest tests/test_round_trip_budgets.py
+
+Every route of app.main.app must have at least one scenario.
+"""
+import asyncio
+import io
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app.main import app as fastapi_app
+from app.routers import gate
+from app.utils import visitor_search
+from app.utils.analytics import backfill
+from app.config import get_settings
+from app.utils.directory import directory
+from app.utils.gate_pass import gate_pass_for
+from app.utils.occupancy import occupancy
+from app.utils.passes import passes
+from app.utils.health import monitor as health_monitor
+from tests.factories import (
+    APPROVED_VISITOR, CHECKED_IN_VISITOR, HOUSEHOLD_A, MAID_PASS, MAID_PHONE, PENDING_VISITOR,
+    text_completion, tool_completion,
+)
+
+BUDGET_FILE = Path(__file__).with_name("round_trip_budgets.json")
+UPDATE_BUDGETS = os.environ.get("UPDATE_ROUND_TRIP_BUDGETS") == "1"
+
+SCENARIOS = {}
+
+
+def scenario(endpoint):
+    """Register a scenario exercising `endpoint` ("METHOD /route/template")"""
+    def register(fn):
+        SCENARIOS[fn.__name__] = (endpoint, fn)
+        return fn
+    return register
+
+
+# Root / health / observability
+
+@scenario("GET /")
+def root(ctx):
+    return ctx.client.get("/")
+
+
+@scenario("GET /health")
+def health(ctx):
+    return ctx.client.get("/health")
+
+
+@scenario("GET /health/live")
+def health_live(ctx):
+    return ctx.client.get("/health/live")
+
+
+@scenario("GET /health/ready")
+def health_ready(ctx):
+    ctx.monkeypatch.setattr("app.utils.health._probe_llm", lambda timeout: None)
+    ctx.unmeasured(lambda: asyncio.run(health_monitor.probe()))
+    return ctx.client.get("/health/ready")
+
+
+@scenario("GET /metrics")
+def metrics(ctx):
+    return ctx.client.get("/metrics")
+
+
+@scenario("GET /events")
+def events(ctx):
+    return ctx.client.get("/events", headers=ctx.headers("admin"))
+
+
+# Auth
+
+@scenario("POST /auth/register")
+def auth_register(ctx):
+    return ctx.client.post("/auth/register", json={
+        "email": "new.resident@example.com",
+        "display_name": "New Resident",
+        "password": "password123",
+    })
+
+
+@scenario("POST /auth/login")
+def auth_login(ctx):
+    return ctx.client.post("/auth/login", json={"email": "john@example.com", "password": "password123"})
+
+
+@scenario("GET /auth/me")
+def auth_me(ctx):
+    return ctx.client.get("/auth/me", headers=ctx.headers("resident"))
+
+
+@scenario("GET /auth/me")
+def auth_me_not_modified(ctx):
+    first = ctx.unmeasured(lambda: ctx.client.get("/auth/me", headers=ctx.headers("resident")))
+    return ctx.client.get(
+        "/auth/me",
+        headers={**ctx.headers("resident"), "If-None-Match": first.headers["etag"]},
+    )
+
+
+# Visitors
+
+@scenario("POST /visitors/")
+def visitor_create(ctx):
+    return ctx.client.post("/visitors/", json={"name": "Priya Shah", "phone": "+915550001111"},
+                           headers=ctx.headers("resident"))
+
+
+@scenario("POST /visitors/import")
+def visitor_import_250_rows(ctx):
+    rows = "".join(f"Guest {i},+9155500{i:05d},Wedding,\n" for i in range(250))
+    upload = io.BytesIO(f"name,phone,purpose,scheduled_time\n{rows}".encode())
+    return ctx.client.post("/visitors/import", files={"file": ("guests.csv", upload, "text/csv")},
+                           headers=ctx.headers("resident"))
+
+
+@scenario("GET /visitors/")
+def visitor_list_guard(ctx):
+    return ctx.client.get("/visitors/", headers=ctx.headers("guard"))
+
+
+@scenario("GET /visitors/")
+def visitor_list_resident(ctx):
+    return ctx.client.get("/visitors/", headers=ctx.headers("resident"))
+
+
+@scenario("GET /visitors/")
+def visitor_list_not_modified(ctx):
+    first = ctx.unmeasured(lambda: ctx.client.get("/visitors/", headers=ctx.headers("guard")))
+    return ctx.client.get(
+        "/visitors/",
+        headers={**ctx.headers("guard"), "If-None-Match": first.headers["etag"]},
+    )
+
+
+@scenario("GET /visitors/sync")
+def visitor_sync_full(ctx):
+    return ctx.client.get("/visitors/sync", headers=ctx.headers("guard"))
+
+
+@scenario("GET /visitors/sync")
+def visitor_sync_delta(ctx):
+    first = ctx.unmeasured(lambda: ctx.client.get("/visitors/sync", headers=ctx.headers("guard")))
+    return ctx.client.get(f"/visitors/sync?since={first.json()['cursor']}", headers=ctx.headers("guard"))
+
+
+def search_rpc(db, query, household, max_results):
+    # Stands in for the search_visitors function from migrations/002_visitor_search.sql
+    phone_q = visitor_search.normalize_phone(query)
+    return [
+        row for row in db.rows("visitors")
+        if (household is None or row["host_household_id"] == household)
+        and visitor_search.match_rank(row, query, phone_q) is not None
+    ][:max_results]
+
+
+@scenario("GET /visitors/search")
+def visitor_search_guard(ctx):
+    ctx.monkeypatch.setattr(visitor_search, "_rpc_unavailable_until", 0.0)
+    ctx.db.rpc_handlers["search_visitors"] = search_rpc
+    return ctx.client.get("/visitors/search", params={"q": "kumar"}, headers=ctx.headers("guard"))
+
+
+@scenario("GET /visitors/search")
+def visitor_search_fallback(ctx):
+    # No search_visitors RPC (SQLite backend / migration not applied)
+    ctx.monkeypatch.setattr(visitor_search, "_rpc_unavailable_until", float("inf"))
+    return ctx.client.get("/visitors/search", params={"q": "0003"}, headers=ctx.headers("resident"))
+
+
+@scenario("GET /visitors/occupancy")
+def visitors_occupancy(ctx):
+    ctx.unmeasured(occupancy.reconcile)
+    return ctx.client.get("/visitors/occupancy", headers=ctx.headers("guard"))
+
+
+@scenario("GET /visitors/occupancy/stream")
+def visitors_occupancy_stream(ctx):
+    ctx.unmeasured(occupancy.reconcile)
+    ctx.monkeypatch.setattr(get_settings(), "occupancy_stream_max_seconds", 0)
+    return ctx.client.get("/visitors/occupancy/stream", headers=ctx.headers("guard"))
+
+
+@scenario("GET /visitors/{visitor_id}")
+def visitor_get(ctx):
+    return ctx.client.get(f"/visitors/{APPROVED_VISITOR}", headers=ctx.headers("resident"))
+
+
+@scenario("GET /visitors/{visitor_id}")
+def visitor_get_archived(ctx):
+    # Moved to visitors_archive by the retention compaction
+    visitor = next(row for row in ctx.db.rows("visitors") if row["id"] == APPROVED_VISITOR)
+    ctx.db.rows("visitors").remove(visitor)
+    ctx.db.rows("visitors_archive").append({**visitor, "status": "checked_out"})
+    return ctx.client.get(f"/visitors/{APPROVED_VISITOR}", headers=ctx.headers("resident"))
+
+
+@scenario("POST /visitors/approve")
+def visitor_approve(ctx):
+    return ctx.client.post("/visitors/approve", json={"visitor_id": PENDING_VISITOR},
+                           headers=ctx.headers("resident"))
+
+
+@scenario("POST /visitors/deny")
+def visitor_deny(ctx):
+    return ctx.client.post("/visitors/deny", json={"visitor_id": PENDING_VISITOR, "reason": "Unknown"},
+                           headers=ctx.headers("resident"))
+
+
+@scenario("POST /visitors/checkin")
+def visitor_checkin(ctx):
+    return ctx.client.post("/visitors/checkin", json={"visitor_id": APPROVED_VISITOR},
+                           headers=ctx.headers("guard"))
+
+
+@scenario("POST /visitors/checkout")
+def visitor_checkout(ctx):
+    return ctx.client.post("/visitors/checkout", json={"visitor_id": CHECKED_IN_VISITOR},
+                           headers=ctx.headers("guard"))
+
+
+# Chat
+
+@scenario("POST /chat/")
+def chat_small_talk(ctx):
+    ctx.llm.script = [text_completion("Hello!")]
+    return ctx.client.post("/chat/", json={"message": "hi"}, headers=ctx.headers("resident"))
+
+
+@scenario("POST /chat/")
+def chat_approve(ctx):
+    ctx.llm.script = [
+        tool_completion("approve_visitor", {"visitor_name": "Ramesh"}),
+        text_completion("Approved Ramesh."),
+    ]
+    return ctx.client.post("/chat/", json={"message": "approve Ramesh"}, headers=ctx.headers("resident"))
+
+
+@scenario("POST /chat/")
+def chat_checkin(ctx):
+    ctx.llm.script = [
+        tool_completion("checkin_visitor", {"visitor_name": "Suresh"}),
+        text_completion("Checked in Suresh."),
+    ]
+    return ctx.client.post("/chat/", json={"message": "check in Suresh"}, headers=ctx.headers("guard"))
+
+
+@scenario("POST /chat/")
+def chat_list_pending(ctx):
+    ctx.llm.script = [
+        tool_completion("list_visitors", {"status": "pending"}),
+        text_completion("One visitor is pending."),
+    ]
+    return ctx.client.post("/chat/", json={"message": "show pending visitors"}, headers=ctx.headers("resident"))
+
+
+# Notifications
+
+@scenario("POST /notifications/register-token")
+def notifications_register_new_token(ctx):
+    return ctx.client.post("/notifications/register-token", json={"token": "fcm_token_new_device"},
+                           headers=ctx.headers("resident"))
+
+
+@scenario("POST /notifications/register-token")
+def notifications_register_existing_token(ctx):
+    return ctx.client.post("/notifications/register-token", json={"token": "fcm_token_resident"},
+                           headers=ctx.headers("resident"))
+
+
+@scenario("DELETE /notifications/unregister-token/{token}")
+def notifications_unregister_token(ctx):
+    return ctx.client.delete("/notifications/unregister-token/fcm_token_resident", headers=ctx.headers("resident"))
+
+
+@scenario("GET /notifications/tokens")
+def notifications_tokens(ctx):
+    return ctx.client.get("/notifications/tokens", headers=ctx.headers("resident"))
+
+
+@scenario("POST /notifications/test-notification")
+def notifications_test(ctx):
+    return ctx.client.post("/notifications/test-notification", headers=ctx.headers("resident"))
+
+
+@scenario("DELETE /notifications/tokens/all")
+def notifications_unregister_all(ctx):
+    return ctx.client.delete("/notifications/tokens/all", headers=ctx.headers("resident"))
+
+
+# Admin
+
+@scenario("GET /admin/profiler")
+def admin_profiler_config(ctx):
+    return ctx.client.get("/admin/profiler", headers=ctx.headers("admin"))
+
+
+@scenario("PUT /admin/profiler")
+def admin_profiler_update(ctx):
+    return ctx.client.put("/admin/profiler", json={"max_per_minute": 5}, headers=ctx.headers("admin"))
+
+
+@scenario("GET /admin/profiles")
+def admin_profiles(ctx):
+    return ctx.client.get("/admin/profiles", headers=ctx.headers("admin"))
+
+
+@scenario("GET /admin/profiles/{profile_id}")
+def admin_profile_missing(ctx):
+    return ctx.client.get("/admin/profiles/does-not-exist", headers=ctx.headers("admin"))
+
+
+@scenario("GET /admin/events/archive")
+def admin_events_archive(ctx):
+    # Served from files; the only database call is the caller lookup
+    return ctx.client.get("/admin/events/archive", params={"type": "visitor_created"}, headers=ctx.headers("admin"))
+
+
+# Gate passes
+
+@scenario("GET /visitors/{visitor_id}/gate-pass")
+def visitor_gate_pass(ctx):
+    return ctx.client.get(f"/visitors/{APPROVED_VISITOR}/gate-pass", headers=ctx.headers("resident"))
+
+
+@scenario("GET /gate/keys")
+def gate_keys(ctx):
+    return ctx.client.get("/gate/keys", headers=ctx.headers("guard"))
+
+
+@scenario("GET /gate/revocations")
+def gate_revocations(ctx):
+    return ctx.client.get("/gate/revocations", headers=ctx.headers("guard"))
+
+
+@scenario("POST /gate/revoke")
+def gate_revoke(ctx):
+    return ctx.client.post("/gate/revoke", json={"visitor_id": APPROVED_VISITOR}, headers=ctx.headers("resident"))
+
+
+def checkins_rpc(db, checkins):
+    # Stands in for the commit_gate_checkins function from migrations/004_gate_passes.sql
+    at = {checkin["id"]: checkin["checked_in_at"] for checkin in checkins}
+    committed = []
+    for row in db.rows("visitors"):
+        if row["id"] in at and row["status"] == "approved":
+            row.update({"status": "checked_in", "checked_in_at": at[row["id"]]})
+            committed.append(dict(row))
+    return committed
+
+
+def offline_checkins(ctx, count):
+    visitors = ctx.unmeasured(lambda: ctx.db.table("visitors").insert([{
+        "name": f"Guest {index}", "phone": "+915550009999", "host_household_id": HOUSEHOLD_A,
+        "status": "approved", "approved_at": "2026-01-01T08:00:00+00:00"
+    } for index in range(count)]).execute().data)
+    checkins = [
+        {"gate_pass": gate_pass_for(visitor), "checked_in_at": "2026-01-01T09:30:00+00:00"} for visitor in visitors
+    ]
+    return ctx.client.post("/gate/checkins", json={"checkins": checkins}, headers=ctx.headers("guard"))
+
+
+@scenario("POST /gate/checkins")
+def gate_checkins_batch_of_50(ctx):
+    ctx.monkeypatch.setattr(gate, "_rpc_unavailable_until", 0.0)
+    ctx.db.rpc_handlers["commit_gate_checkins"] = checkins_rpc
+    return offline_checkins(ctx, 50)
+
+
+@scenario("POST /gate/checkins")
+def gate_checkins_fallback_batch_of_5(ctx):
+    # No commit_gate_checkins RPC (SQLite backend / migration not applied): one update per visitor
+    ctx.monkeypatch.setattr(gate, "_rpc_unavailable_until", float("inf"))
+    return offline_checkins(ctx, 5)
+
+
+# Passes
+
+# A Monday 08:00 in the community's time zone, inside the maid's window
+PASS_WINDOW_NOW = datetime(2026, 1, 5, 8, 0, tzinfo=ZoneInfo("Asia/Kolkata"))
+
+
+@scenario("GET /passes/")
+def passes_list(ctx):
+    return ctx.client.get("/passes/", headers=ctx.headers("guard"))
+
+
+@scenario("POST /passes/")
+def passes_create(ctx):
+    return ctx.client.post("/passes/", json={
+        "name": "Raju", "phone": "+91 90000 22222", "purpose": "Driver",
+        "days_of_week": [0, 1, 2, 3, 4], "start_time": "08:30", "end_time": "19:00"
+    }, headers=ctx.headers("resident"))
+
+
+@scenario("DELETE /passes/{pass_id}")
+def passes_revoke(ctx):
+    return ctx.client.delete(f"/passes/{MAID_PASS}", headers=ctx.headers("resident"))
+
+
+@scenario("POST /passes/checkin")
+def passes_checkin_by_phone(ctx):
+    ctx.monkeypatch.setattr("app.routers.passes.community_now", lambda: PASS_WINDOW_NOW)
+    return ctx.client.post("/passes/checkin", json={"phone": MAID_PHONE}, headers=ctx.headers("guard"))
+
+
+# Households
+
+@scenario("GET /households/")
+def households_list(ctx):
+    return ctx.client.get("/households/", params={"limit": 10}, headers=ctx.headers("guard"))
+
+
+@scenario("GET /households/by-flat/{flat_no}")
+def households_by_flat(ctx):
+    return ctx.client.get("/households/by-flat/a-101", headers=ctx.headers("guard"))
+
+
+@scenario("GET /households/{household_id}")
+def households_get(ctx):
+    return ctx.client.get(f"/households/{HOUSEHOLD_A}", headers=ctx.headers("resident"))
+
+
+@scenario("POST /households/")
+def households_create(ctx):
+    return ctx.client.post(
+        "/households/", json={"flat_no": "C-301", "name": "The Iyer Family"}, headers=ctx.headers("admin")
+    )
+
+
+# Analytics
+
+@scenario("GET /analytics/hourly")
+def analytics_hourly(ctx):
+    ctx.unmeasured(lambda: backfill(ctx.db))
+    return ctx.client.get(
+        "/analytics/hourly", params={"start": "2026-01-01T00:00:00Z", "end": "2026-01-02T00:00:00Z"},
+        headers=ctx.headers("admin")
+    )
+
+
+@scenario("GET /analytics/households")
+def analytics_households(ctx):
+    ctx.unmeasured(lambda: backfill(ctx.db))
+    return ctx.client.get(
+        "/analytics/households", params={"start": "2026-01-01T00:00:00Z", "end": "2026-01-02T00:00:00Z"},
+        headers=ctx.headers("admin")
+    )
+
+
+@scenario("GET /analytics/summary")
+def analytics_summary(ctx):
+    ctx.unmeasured(lambda: backfill(ctx.db))
+    return ctx.client.get(
+        "/analytics/summary", params={"start": "2026-01-01T00:00:00Z", "end": "2026-01-02T00:00:00Z"},
+        headers=ctx.headers("admin")
+    )
+
+
+# Exports
+
+@scenario("GET /exports/visitors")
+def exports_visitors(ctx):
+    # One keyset page per table; more rows mean more pages, not more calls per row
+    return ctx.client.get("/exports/visitors", params={"format": "xlsx"}, headers=ctx.headers("admin"))
+
+
+@scenario("GET /exports/events")
+def exports_events(ctx):
+    ctx.unmeasured(lambda: ctx.client.post(
+        "/visitors/approve", json={"visitor_id": PENDING_VISITOR}, headers=ctx.headers("resident")
+    ))
+    return ctx.client.get("/exports/events", params={"household_id": HOUSEHOLD_A}, headers=ctx.headers("admin"))
+
+
+def export_job(ctx):
+    ctx.monkeypatch.setattr(get_settings(), "export_dir", str(ctx.tmp_path))
+    return ctx.client.post("/exports/jobs", json={"kind": "events"}, headers=ctx.headers("admin"))
+
+
+@scenario("POST /exports/jobs")
+def exports_job_create(ctx):
+    # Includes the export itself, which the test client runs before returning
+    return export_job(ctx)
+
+
+@scenario("GET /exports/jobs/{job_id}")
+def exports_job_status(ctx):
+    job = ctx.unmeasured(lambda: export_job(ctx))
+    return ctx.client.get(f"/exports/jobs/{job.json()['id']}", headers=ctx.headers("admin"))
+
+
+@scenario("GET /exports/jobs/{job_id}/download")
+def exports_job_download(ctx):
+    job = ctx.unmeasured(lambda: export_job(ctx))
+    return ctx.client.get(f"/exports/jobs/{job.json()['id']}/download", headers=ctx.headers("admin"))
+
+
+class ScenarioContext:
+    def __init__(self, client, db, llm, headers, monkeypatch, tmp_path):
+        self.client = client
+        self.db = db
+        self.llm = llm
+        self.headers = headers
+        self.monkeypatch = monkeypatch
+        self.tmp_path = tmp_path
+
+    def unmeasured(self, fn):
+        """Run setup requests without counting their round trips"""
+        result = fn()
+        self.db.reset_calls()
+        self.llm.calls = 0
+        return result
+
+
+def load_budgets():
+    if not BUDGET_FILE.exists():
+        return {}
+    return json.loads(BUDGET_FILE.read_text())
+
+
+_recorded = {}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def write_budgets_when_updating():
+    yield
+    if UPDATE_BUDGETS and _recorded:
+        budgets = load_budgets()
+        budgets.update(_recorded)
+        BUDGET_FILE.write_text(json.dumps(dict(sorted(budgets.items())), indent=2) + "\n")
+
+
+def format_calls(calls):
+    counts = Counter(f"{operation} {table}" for table, operation in calls)
+    return "\n".join(f"    {count} x {call}" for call, count in sorted(counts.items())) or "    (none)"
+
+
+@pytest.mark.parametrize("name", sorted(SCENARIOS))
+def test_round_trip_budget(name, client, fake_db, fake_llm, auth_headers, monkeypatch, tmp_path):
+    endpoint, run = SCENARIOS[name]
+    ctx = ScenarioContext(client, fake_db, fake_llm, auth_headers, monkeypatch, tmp_path)
+    # Budgets are for a warm worker: the household directory and pass index are loaded
+    directory.refresh()
+    passes.refresh()
+    fake_db.reset_calls()
+    fake_llm.calls = 0
+
+    response = run(ctx)
+    assert response.status_code < 500, f"{endpoint} failed: {response.status_code} {response.text}"
+
+    actual = {"db": len(fake_db.calls), "llm": fake_llm.calls}
+    if UPDATE_BUDGETS:
+        _recorded[name] = actual
+        return
+
+    budget = load_budgets().get(name)
+    assert budget is not None, (
+        f"No round-trip budget for scenario '{name}' ({endpoint}); "
+        f"add it to {BUDGET_FILE.name}: \"{name}\": {json.dumps(actual)}"
+    )
+
+    over = {kind: (budget.get(kind, 0), actual[kind]) for kind in actual if actual[kind] > budget.get(kind, 0)}
+    assert not over, (
+        f"{name} ({endpoint}) exceeds its round-trip budget:\n"
+        + "".join(f"  {kind}: budget {limit}, actual {count} (+{count - limit})\n" for kind, (limit, count) in over.items())
+        + f"  database calls made:\n{format_calls(fake_db.calls)}"
+    )
+
+
+def test_every_route_has_a_scenario():
+    routes = {
+        f"{method} {route.path}"
+        for route in fastapi_app.routes
+        if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    covered = {endpoint for endpoint, _ in SCENARIOS.values()}
+    missing = sorted(routes - covered)
+    assert not missing, "Routes without a round-trip scenario:\n  " + "\n  ".join(missing)
+
+
+def test_budget_file_has_no_stale_entries():
+    stale = sorted(set(load_budgets()) - set(SCENARIOS))
+    assert not stale, f"Budgets for unknown scenarios in {BUDGET_FILE.name}: {', '.join(stale)}"
@@ -0,0 +1,204 @@
+"""
+The embedded SQLite backend runs the app unchanged and replicates to Supabase
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import app as fastapi_app
+from app.storage.replication import pending, pull_changes, pull_snapshot, push_once
+from app.storage.sqlite import SQLiteClient
+from tests.conftest import use_database
+from tests.factories import (
+    APPROVED_VISITOR, CHECKED_IN_VISITOR, HOUSEHOLD_A, PENDING_VISITOR, seed_tables, text_completion, tool_completion,
+)
+from tests.fake_supabase import FakeSupabase
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    db = SQLiteClient(str(tmp_path / "gate.db"))
+    for table, rows in seed_tables().items():
+        if rows:
+            db.table(table).insert(rows).execute(replicate=False)
+    use_database(monkeypatch, db)
+    return db
+
+
+@pytest.fixture
+def sqlite_client(sqlite_db, fake_llm):
+    return TestClient(fastapi_app)
+
+
+def test_visitor_lifecycle(sqlite_client, sqlite_db, auth_headers):
+    resident, guard = auth_headers("resident"), auth_headers("guard")
+
+    created = sqlite_client.post("/visitors/", json={"name": "Priya Shah", "phone": "+915550001111"},
+                                 headers=resident)
+    assert created.status_code == 200, created.text
+    visitor_id = created.json()["id"]
+
+    for path, headers, status in (
+        ("/visitors/approve", resident, "approved"),
+        ("/visitors/checkin", guard, "checked_in"),
+        ("/visitors/checkout", guard, "checked_out"),
+    ):
+        response = sqlite_client.post(path, json={"visitor_id": visitor_id}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    visitor = sqlite_client.get(f"/visitors/{visitor_id}", headers=resident).json()
+    assert visitor["status"] == "checked_out"
+    assert visitor["checked_out_at"]
+
+    listed = sqlite_client.get("/visitors/", headers=resident).json()
+    assert [v["id"] for v in listed][0] == visitor_id
+    assert all(v["host_household_id"] == HOUSEHOLD_A for v in listed)
+
+    events = sqlite_client.get("/events", headers=auth_headers("admin")).json()["events"]
+    assert {e["type"] for e in events} >= {"visitor_created", "visitor_approved", "visitor_checked_out"}
+
+
+def test_delta_sync(sqlite_client, auth_headers, monkeypatch):
+    guard = auth_headers("guard")
+    full = sqlite_client.get("/visitors/sync", headers=guard).json()
+    assert full["full"] and {v["id"] for v in full["upserts"]} >= {APPROVED_VISITOR}
+
+    sqlite_client.post("/visitors/checkin", json={"visitor_id": APPROVED_VISITOR}, headers=guard)
+    # Too recent: its transaction may not be the last one to commit with that timestamp
+    held_back = sqlite_client.get(f"/visitors/sync?since={full['cursor']}", headers=guard).json()
+    assert held_back["upserts"] == [] and held_back["cursor"] == full["cursor"]
+
+    monkeypatch.setattr(get_settings(), "sync_safety_lag_seconds", 0.0)
+    delta = sqlite_client.get(f"/visitors/sync?since={full['cursor']}", headers=guard).json()
+    assert [v["id"] for v in delta["upserts"]] == [APPROVED_VISITOR]
+
+
+def test_chat_tools(sqlite_client, fake_llm, auth_headers):
+    fake_llm.script = [
+        tool_completion("approve_visitor", {"visitor_name": "ramesh"}),
+        text_completion("Approved Ramesh."),
+    ]
+    response = sqlite_client.post("/chat/", json={"message": "approve ramesh"}, headers=auth_headers("resident"))
+    assert response.status_code == 200, response.text
+    visitor = sqlite_client.get(f"/visitors/{PENDING_VISITOR}", headers=auth_headers("resident")).json()
+    assert visitor["status"] == "approved"
+
+
+def test_role_filter_on_json_array(sqlite_db):
+    guards = sqlite_db.table("users").select("id").filter("roles", "cs", "{guard}").execute().data
+    assert len(guards) == 1
+
+
+def test_outbox_replicates_writes(sqlite_client, sqlite_db, auth_headers):
+    created = sqlite_client.post("/visitors/", json={"name": "Priya Shah", "phone": "+915550001111"},
+                                 headers=auth_headers("resident")).json()
+    sqlite_client.post("/visitors/approve", json={"visitor_id": created["id"]}, headers=auth_headers("resident"))
+    assert pending(sqlite_db) > 0
+
+    remote = FakeSupabase()
+    push_once(sqlite_db, remote, batch_size=500)
+
+    assert pending(sqlite_db) == 0
+    [visitor] = remote.tables["visitors"]
+    assert visitor["id"] == created["id"] and visitor["status"] == "approved"
+    assert {e["type"] for e in remote.tables["events"]} == {"visitor_created", "visitor_approved"}
+    # Both versions of the visitor went out in one upsert
+    assert remote.calls == [("visitors", "upsert"), ("events", "upsert")]
+
+
+def test_outbox_survives_uplink_failure(sqlite_client, sqlite_db, auth_headers):
+    sqlite_client.post("/visitors/", json={"name": "Priya Shah", "phone": "+915550001111"},
+                       headers=auth_headers("resident"))
+    queued = pending(sqlite_db)
+
+    remote = FakeSupabase()
+    remote.fail_tables = {"visitors"}
+    with pytest.raises(RuntimeError):
+        push_once(sqlite_db, remote, batch_size=500)
+    assert pending(sqlite_db) == queued
+
+    remote.fail_tables = set()
+    push_once(sqlite_db, remote, batch_size=500)
+    assert pending(sqlite_db) == 0
+
+
+def test_pull_snapshot(tmp_path):
+    local = SQLiteClient(str(tmp_path / "fresh.db"))
+    counts = pull_snapshot(local, FakeSupabase(seed_tables()))
+    assert counts["visitors"] == 4 and counts["users"] == 4
+    assert pending(local) == 0
+    [user] = local.table("users").select("*").eq("email", "guard@example.com").execute().data
+    assert user["roles"] == ["guard"]
+
+
+def test_like_matches_glob_metacharacters_literally(sqlite_db):
+    sqlite_db.table("visitors").insert({
+        "name": "Ramesh [driver]", "phone": "+915550002222", "host_household_id": HOUSEHOLD_A, "status": "pending"
+    }).execute()
+
+    def names(pattern):
+        return [row["name"] for row in sqlite_db.table("visitors").select("name").like("name", pattern).execute().data]
+
+    assert names("%[driver]%") == ["Ramesh [driver]"]
+    assert sorted(names("Ramesh%")) == ["Ramesh Kumar", "Ramesh [driver]"]
+    assert names("R*") == [] and names("Rames?%") == []
+
+
+def test_push_sends_only_the_columns_an_update_set(sqlite_client, sqlite_db, auth_headers):
+    remote = FakeSupabase()
+    sqlite_client.post("/visitors/checkin", json={"visitor_id": APPROVED_VISITOR}, headers=auth_headers("guard"))
+    remote.rows("visitors").append({"id": APPROVED_VISITOR, "name": "Suresh", "status": "approved",
+                                    "purpose": "Changed centrally", "updated_at": "2026-01-01T09:00:00+00:00"})
+
+    push_once(sqlite_db, remote, batch_size=500)
+
+    [visitor] = remote.rows("visitors")
+    assert visitor["status"] == "checked_in" and visitor["checked_in_at"]
+    assert visitor["purpose"] == "Changed centrally"
+    assert ("visitors", "update") in remote.calls and ("visitors", "upsert") not in remote.calls
+
+
+def test_pull_changes_applies_central_writes(tmp_path):
+    local = SQLiteClient(str(tmp_path / "gate.db"))
+    remote = FakeSupabase(seed_tables())
+    pull_snapshot(local, remote)
+
+    a_minute_ago = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    for row in remote.rows("visitors"):
+        if row["id"] in (PENDING_VISITOR, APPROVED_VISITOR):
+            row.update({"status": "denied", "updated_at": a_minute_ago})
+    # A check-in at this gate that has not been pushed yet
+    local.table("visitors").update({"status": "checked_in"}).eq("id", APPROVED_VISITOR).execute()
+    remote.rows("visitor_tombstones").append({"visitor_id": CHECKED_IN_VISITOR, "deleted_at": a_minute_ago})
+
+    assert pull_changes(local, remote, batch_size=500) == 2
+    statuses = {row["id"]: row["status"] for row in local.table("visitors").select("id, status").execute().data}
+    assert statuses[PENDING_VISITOR] == "denied"
+    assert statuses[APPROVED_VISITOR] == "checked_in"
+    assert CHECKED_IN_VISITOR not in statuses
+    # Nothing pulled is queued to go back up
+    assert pending(local) == 1
+
+    assert pull_changes(local, remote, batch_size=500) == 0
+
+
+def test_pulled_changes_invalidate_cached_reads(sqlite_client, sqlite_db, auth_headers):
+    guard = auth_headers("guard")
+    etag = sqlite_client.get("/visitors/", headers=guard).headers["etag"]
+    assert sqlite_client.get("/visitors/", headers={**guard, "If-None-Match": etag}).status_code == 304
+    inside = sqlite_client.get("/visitors/occupancy", headers=guard).json()["total"]
+
+    # Checked in at another gate
+    remote = FakeSupabase(seed_tables())
+    a_minute_ago = (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+    for row in remote.rows("visitors"):
+        if row["id"] == APPROVED_VISITOR:
+            row.update({"status": "checked_in", "updated_at": a_minute_ago})
+    pull_changes(sqlite_db, remote, batch_size=500)
+
+    response = sqlite_client.get("/visitors/", headers={**guard, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert {v["id"]: v["status"] for v in response.json()}[APPROVED_VISITOR] == "checked_in"
+    assert sqlite_client.get("/visitors/occupancy", headers=guard).json()["total"] == inside + 1
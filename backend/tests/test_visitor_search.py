@@ -0,0 +1,79 @@
+"""
+Visitor search: ranking, phone matching, role scoping and the RPC fallback
+"""
+import pytest
+
+from app.utils import visitor_search
+from tests.factories import (
+    CHECKED_IN_VISITOR, HOUSEHOLD_A, OTHER_HOUSEHOLD_VISITOR, PENDING_VISITOR,
+)
+
+
+@pytest.fixture(autouse=True)
+def fallback_search(monkeypatch):
+    # The in-memory database has no search_visitors RPC
+    monkeypatch.setattr(visitor_search, "_rpc_unavailable_until", float("inf"))
+
+
+def add_visitor(db, visitor_id, name, phone, status="approved", household_id=HOUSEHOLD_A):
+    db.rows("visitors").append({
+        **db.defaults["visitors"], "id": visitor_id, "name": name, "phone": phone, "status": status,
+        "host_household_id": household_id, "purpose": None, "created_at": "2026-01-02T10:00:00+00:00",
+    })
+
+
+def search(client, headers, q, **params):
+    response = client.get("/visitors/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [visitor["id"] for visitor in response.json()]
+
+
+def test_name_prefix_ranks_before_word_prefix_and_substring(client, fake_db, auth_headers):
+    add_visitor(fake_db, "v-substring", "Chandraman Rao", "+911111111111")
+    add_visitor(fake_db, "v-word", "Ravi Raman", "+912222222222")
+    add_visitor(fake_db, "v-prefix", "Raman Pillai", "+913333333333")
+
+    assert search(client, auth_headers("guard"), "raman") == ["v-prefix", "v-word", "v-substring"]
+
+
+def test_phone_matches_digits_ignoring_formatting(client, fake_db, auth_headers):
+    add_visitor(fake_db, "v-phone", "Meera Das", "+91 98450-12345")
+
+    assert search(client, auth_headers("guard"), "2345") == ["v-phone"]
+    assert search(client, auth_headers("guard"), "98450 123") == ["v-phone"]
+
+
+def test_active_visitors_rank_before_closed(client, fake_db, auth_headers):
+    add_visitor(fake_db, "v-closed", "Anil Verma", "+914444444444", status="checked_out")
+
+    assert search(client, auth_headers("guard"), "anil") == [CHECKED_IN_VISITOR, "v-closed"]
+
+
+def test_residents_only_search_their_household(client, auth_headers):
+    assert OTHER_HOUSEHOLD_VISITOR in search(client, auth_headers("guard"), "lisa")
+    assert search(client, auth_headers("resident"), "lisa") == []
+    assert search(client, auth_headers("resident"), "ramesh") == [PENDING_VISITOR]
+
+
+def test_query_is_validated(client, auth_headers):
+    assert client.get("/visitors/search", params={"q": "r"}, headers=auth_headers("guard")).status_code == 422
+
+
+def test_rpc_results_are_used_when_available(client, fake_db, auth_headers, monkeypatch):
+    monkeypatch.setattr(visitor_search, "_rpc_unavailable_until", 0.0)
+    received = {}
+
+    def rpc(db, query, household, max_results):
+        received.update(query=query, household=household, max_results=max_results)
+        return [{**db.rows("visitors")[0], "updated_at": "2026-01-01T09:00:00+00:00"}]
+
+    fake_db.rpc_handlers["search_visitors"] = rpc
+    assert search(client, auth_headers("resident"), "  RAMESH ", limit=5) == [PENDING_VISITOR]
+    assert received == {"query": "ramesh", "household": HOUSEHOLD_A, "max_results": 5}
+
+
+def test_rpc_failure_falls_back(client, fake_db, auth_headers, monkeypatch):
+    monkeypatch.setattr(visitor_search, "_rpc_unavailable_until", 0.0)
+
+    assert search(client, auth_headers("guard"), "ramesh") == [PENDING_VISITOR]
+    assert visitor_search._rpc_unavailable_until > 0
@@ -0,0 +1,16 @@
+import api from './api'
+
+export const getHourlyStats = async ({ start, end, householdId } = {}) => {
+    const response = await api.get('/analytics/hourly', { params: { start, end, household_id: householdId } })
+    return response.data
+}
+
+export const getHouseholdStats = async ({ start, end } = {}) => {
+    const response = await api.get('/analytics/households', { params: { start, end } })
+    return response.data
+}
+
+export const getStatsSummary = async ({ start, end } = {}) => {
+    const response = await api.get('/analytics/summary', { params: { start, end } })
+    return response.data
+}
@@ -0,0 +1,25 @@
+import api from './api'
+
+// Downloads an export as a Blob; kind is 'visitors' or 'events', format 'csv' or 'xlsx'
+export const downloadExport = async (kind, { format = 'csv', start, end, householdId, type } = {}) => {
+    const response = await api.get(`/exports/${kind}`, {
+        params: { format, start, end, household_id: householdId, type },
+        responseType: 'blob',
+    })
+    return response.data
+}
+
+export const createExportJob = async (kind, { format = 'csv', start, end, householdId, type } = {}) => {
+    const response = await api.post('/exports/jobs', { kind, format, start, end, household_id: householdId, type })
+    return response.data
+}
+
+export const getExportJob = async (jobId) => {
+    const response = await api.get(`/exports/jobs/${jobId}`)
+    return response.data
+}
+
+export const downloadExportJob = async (jobId) => {
+    const response = await api.get(`/exports/jobs/${jobId}/download`, { responseType: 'blob' })
+    return response.data
+}
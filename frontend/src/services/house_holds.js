@@ -1,6 +1,11 @@
 import api from './api'
 
-export const getAllHouses = async (message) => {
-    const response = await api.post('/households/')
+export const getAllHouses = async (params) => {
+    const response = await api.get('/households/', { params })
     return response.data
-}
\ No newline at end of file
+}
+
+export const getHouseholdByFlat = async (flatNo) => {
+    const response = await api.get(`/households/by-flat/${encodeURIComponent(flatNo)}`)
+    return response.data
+}
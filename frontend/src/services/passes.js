@@ -0,0 +1,21 @@
+import api from './api'
+
+export const getPasses = async () => {
+    const response = await api.get('/passes/')
+    return response.data
+}
+
+export const createPass = async (passData) => {
+    const response = await api.post('/passes/', passData)
+    return response.data
+}
+
+export const revokePass = async (passId) => {
+    const response = await api.delete(`/passes/${passId}`)
+    return response.data
+}
+
+export const checkinPass = async ({ passId, phone }) => {
+    const response = await api.post('/passes/checkin', { pass_id: passId, phone })
+    return response.data
+}
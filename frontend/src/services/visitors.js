@@ -5,6 +5,11 @@ export const getVisitors = async () => {
     return response.data
 }
 
+export const searchVisitors = async (q, limit) => {
+    const response = await api.get('/visitors/search', { params: { q, limit } })
+    return response.data
+}
+
 export const createVisitor = async (visitorData) => {
     const response = await api.post('/visitors/', visitorData)
     return response.data
@@ -15,6 +20,11 @@ export const approveVisitor = async (visitorId) => {
     return response.data
 }
 
+export const getGatePass = async (visitorId) => {
+    const response = await api.get(`/visitors/${visitorId}/gate-pass`)
+    return response.data
+}
+
 export const denyVisitor = async (visitorId, reason) => {
     const response = await api.post('/visitors/deny', { visitor_id: visitorId, reason })
     return response.data
@@ -29,3 +39,48 @@ export const checkoutVisitor = async (visitorId) => {
     const response = await api.post('/visitors/checkout', { visitor_id: visitorId })
     return response.data
 }
+
+export const getOccupancy = async () => {
+    const response = await api.get('/visitors/occupancy')
+    return response.data
+}
+
+// Calls onUpdate with the occupancy counts whenever they change; returns a function that stops watching
+export const watchOccupancy = (onUpdate) => {
+    const controller = new AbortController()
+
+    const connect = async () => {
+        const response = await fetch(`${api.defaults.baseURL}/visitors/occupancy/stream`, {
+            headers: { Authorization: `Bearer ${localStorage.getItem('access_token')}` },
+            signal: controller.signal
+        })
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+        let buffer = ''
+        for (;;) {
+            const { value, done } = await reader.read()
+            if (done) break
+            buffer += value
+            const messages = buffer.split('\n\n')
+            buffer = messages.pop()
+            for (const message of messages) {
+                const data = message.split('\n').find((line) => line.startsWith('data: '))
+                if (data) onUpdate(JSON.parse(data.slice('data: '.length)))
+            }
+        }
+    }
+
+    // The server closes the stream every few minutes; reconnect until stopped
+    const run = async () => {
+        while (!controller.signal.aborted) {
+            try {
+                await connect()
+            } catch (error) {
+                if (controller.signal.aborted) return
+                await new Promise((resolve) => setTimeout(resolve, 5000))
+            }
+        }
+    }
+    run()
+
+    return () => controller.abort()
+}